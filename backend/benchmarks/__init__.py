@@ -0,0 +1,2 @@
+# This file makes the benchmarks folder a Python package
+# Run a benchmark from the backend folder like: python -m benchmarks.bench_estimators
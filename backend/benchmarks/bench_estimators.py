@@ -0,0 +1,89 @@
+"""
+================================================================================
+BENCHMARK - bench_estimators.py
+
+Compares the two PricePredictionModel engines (see modules/estimators.py):
+- numpy:   closed-form least squares
+- sklearn: StandardScaler + LinearRegression + sklearn metrics
+
+For many random price histories it measures the time of the work done per
+/api/predict-price request (train + evaluate + predict) and checks that
+both engines give the same numbers.
+
+Run from the backend folder:
+    python -m benchmarks.bench_estimators --series 500 --points 120
+
+================================================================================
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.ml_predictor import PricePredictionModel
+
+
+def make_series(rng, points):
+    # Random price history: trend + noise, one price every few days
+    days = np.sort(rng.choice(np.arange(points * 3), size=points, replace=False))
+    prices = rng.uniform(5000, 100000) + rng.normal(0, 50) * days + rng.normal(0, 500, points)
+    return days.reshape(-1, 1), prices
+
+
+def run_backend(backend, series):
+    # Time train + evaluate + one prediction per series, keep the answers
+    results = []
+    start = time.perf_counter()
+    for X, Y in series:
+        model = PricePredictionModel(backend=backend)
+        model.dates = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(X.reshape(-1), unit="D"))
+        model.train(X, Y)
+        evaluation = model.get_model_evaluation(X, Y)
+        prediction = model.predict_future_price(30)
+        results.append((prediction["predicted_price"], evaluation["MAE"], evaluation["RMSE"], evaluation["R2_Score"]))
+    seconds = time.perf_counter() - start
+    return seconds, np.array(results)
+
+
+def import_time(module):
+    # Time a fresh interpreter importing a module
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    return float(output.stdout.strip() or "nan")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare numpy and sklearn model engines")
+    parser.add_argument("--series", type=int, default=500, help="Number of price histories")
+    parser.add_argument("--points", type=int, default=120, help="Prices per history")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    series = [make_series(rng, args.points) for _ in range(args.series)]
+
+    # Warm up both engines (imports, first-call overhead)
+    run_backend("numpy", series[:5])
+    run_backend("sklearn", series[:5])
+
+    numpy_seconds, numpy_results = run_backend("numpy", series)
+    sklearn_seconds, sklearn_results = run_backend("sklearn", series)
+
+    difference = np.abs(numpy_results - sklearn_results).max(axis=0)
+
+    print("=" * 60)
+    print(f"{args.series} series x {args.points} points (train + evaluate + predict)")
+    print("=" * 60)
+    print(f"numpy   : {numpy_seconds * 1000 / args.series:8.3f} ms per series")
+    print(f"sklearn : {sklearn_seconds * 1000 / args.series:8.3f} ms per series")
+    print(f"speedup : {sklearn_seconds / numpy_seconds:8.1f}x")
+    print("-" * 60)
+    print("Largest difference between engines (after rounding):")
+    for name, value in zip(["predicted_price", "MAE", "RMSE", "R2_Score"], difference):
+        print(f"  {name:16s} {value:.6f}")
+    print("-" * 60)
+    print(f"import sklearn.linear_model: {import_time('sklearn.linear_model'):.3f}s")
+    print(f"import numpy               : {import_time('numpy'):.3f}s")
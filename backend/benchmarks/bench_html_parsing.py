@@ -0,0 +1,182 @@
+"""
+================================================================================
+BENCHMARK - bench_html_parsing.py
+
+Compares two ways of reading the result cards of saved search pages:
+- soup:     BeautifulSoup(page, "lxml") + find_all()/find() per selector
+            (how the scraper used to work)
+- compiled: the compiled XPath specs of modules/extraction.py
+and checks that both read exactly the same fields.
+
+It then pushes all pages through the parse worker pool with 1, 2, ...
+processes and prints pages per second.
+
+Fixture pages:
+- Put saved search pages into the fixtures folder, named after the
+  retailer: amazon*.html, flipkart*.html, snapdeal*.html
+- Missing retailers get a synthetic page (result cards in the real
+  markup, padded with scripts and navigation to --size-kb)
+
+Run from the backend folder:
+    python -m benchmarks.bench_html_parsing --fixtures benchmarks/fixtures
+
+================================================================================
+"""
+
+import argparse
+import glob
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from bs4 import BeautifulSoup
+
+from modules.extraction import extract
+from modules.scraper import RETAILERS
+
+
+CARD_TEMPLATES = {
+    "amazon": (
+        '<div data-component-type="s-search-result" data-asin="B0{i:08d}" class="s-result-item">'
+        '<div class="a-section"><span class="a-declarative"><a class="a-link-normal s-no-outline" '
+        'href="/dp/B0{i:08d}"><img src="https://m.media-amazon.com/images/{i}.jpg"></a></span>'
+        '<h2 class="a-size-mini a-spacing-none"><span class="a-size-medium a-color-base">'
+        'Apple iPhone 15 ({gb} GB) - Black {i}</span></h2>'
+        '<span class="a-price"><span class="a-offscreen">&#8377;{price:,}</span>'
+        '<span class="a-price-whole">{price:,}</span><span class="a-price-fraction">00</span></span>'
+        '</div></div>'
+    ),
+    "flipkart": (
+        '<div class="_1AtVbE col-12-12"><div class="_13oc-S"><a class="_1fQZEK" href="/apple-iphone-15/p/itm{i}">'
+        '<div class="_4rR01T">Apple iPhone 15 (Black, {gb} GB) {i}</div>'
+        '<div class="_30jeq3 _1_WHN1">&#8377;{price:,}</div></a></div></div>'
+    ),
+    "snapdeal": (
+        '<div class="col-xs-6 favDp product-tuple-listing js-tuple" id="{i}">'
+        '<a class="dp-widget-link" href="https://www.snapdeal.com/product/apple-iphone-15/{i}">'
+        '<p class="product-title" title="Apple iPhone 15">Apple iPhone 15 {gb}GB {i}</p></a>'
+        '<span class="lfloat product-price" display-price="{price}">Rs. {price:,}</span></div>'
+    ),
+}
+
+ADAPTERS = {"amazon": "Amazon", "flipkart": "Flipkart", "snapdeal": "Snapdeal"}
+
+
+def make_page(retailer, cards, size_kb, rng):
+    # Head and footer full of scripts/navigation, result cards in between
+    filler = [
+        f'<script>window.__state_{n}={{"k":"{"x" * 200}","n":{n}}};</script>'
+        f'<li class="nav-item"><a href="/c/{n}">Category {n}</a></li>'
+        for n in range(size_kb * 3)
+    ]
+    half = len(filler) // 2
+    body = "".join(
+        CARD_TEMPLATES[retailer].format(i=i, gb=rng.choice([128, 256]), price=rng.randint(50000, 90000))
+        for i in range(cards)
+    )
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{retailer}</title>{"".join(filler[:half])}</head>'
+        f'<body><div id="search">{body}</div><footer>{"".join(filler[half:])}</footer></body></html>'
+    ).encode()
+
+
+def load_fixtures(folder, cards, size_kb):
+    # {retailer: [page bytes, ...]}; synthetic pages are saved for next time
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(42)
+    pages = {}
+    for retailer in ADAPTERS:
+        paths = sorted(glob.glob(os.path.join(folder, f"{retailer}*.html")))
+        if not paths:
+            path = os.path.join(folder, f"{retailer}_synthetic.html")
+            with open(path, "wb") as file:
+                file.write(make_page(retailer, cards, size_kb, rng))
+            paths = [path]
+        pages[retailer] = []
+        for path in paths:
+            with open(path, "rb") as file:
+                pages[retailer].append(file.read())
+    return pages
+
+
+def soup_extract(spec, content, limit):
+    # The old way: full BeautifulSoup tree + find_all()/find() per selector
+    soup = BeautifulSoup(content, "lxml")
+    cards = []
+    for selector in spec["results"]:
+        cards = soup.find_all(selector.tag, _soup_attrs(selector))
+        if cards:
+            break
+
+    items = []
+    for card in cards[:limit]:
+        item = {}
+        for name, selectors in spec["fields"].items():
+            value = None
+            for selector in selectors:
+                element = card.find(selector.tag, _soup_attrs(selector))
+                if element is not None:
+                    value = element.get(selector.attribute) if selector.attribute else element.text
+                    break
+            item[name] = value
+        items.append(item)
+    return items
+
+
+def _soup_attrs(selector):
+    attrs = dict(selector.attrs or {})
+    if selector.classes:
+        attrs["class"] = selector.classes
+    return attrs
+
+
+def best_of(repeat, function, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BeautifulSoup vs compiled XPath extraction")
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures"),
+                        help="Folder with saved search pages")
+    parser.add_argument("--cards", type=int, default=48, help="Result cards per synthetic page")
+    parser.add_argument("--size-kb", type=int, default=1500, help="Approximate size of a synthetic page")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is shown)")
+    parser.add_argument("--max-workers", type=int, default=4, help="Most parse processes to try")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures, args.cards, args.size_kb)
+
+    print("=" * 72)
+    print(f"{'page':<24} {'KB':>6} {'soup ms':>9} {'compiled ms':>12} {'speedup':>8} {'same':>5}")
+    print("=" * 72)
+
+    jobs = []
+    for retailer, pages in fixtures.items():
+        adapter = RETAILERS[ADAPTERS[retailer]]
+        for n, content in enumerate(pages):
+            soup_seconds, expected = best_of(args.repeat, soup_extract, adapter.spec, content, adapter.max_results)
+            fast_seconds, items = best_of(args.repeat, extract, adapter.compiled, content, None, adapter.max_results)
+            same = items == expected
+            print(f"{retailer + '#' + str(n):<24} {len(content) // 1024:>6} {soup_seconds * 1000:>9.1f} "
+                  f"{fast_seconds * 1000:>12.1f} {soup_seconds / fast_seconds:>7.1f}x {'yes' if same else 'NO':>5}")
+            jobs.append((adapter.compiled, content, None, adapter.max_results))
+
+    print("-" * 72)
+    print("Parse worker pool (all pages, 8 rounds):")
+    rounds = jobs * 8
+    workers = 1
+    while workers <= args.max_workers:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(extract, *zip(*jobs)))  # warm up the processes
+            start = time.perf_counter()
+            list(pool.map(extract, *zip(*rounds)))
+            seconds = time.perf_counter() - start
+        print(f"  {workers} processes: {len(rounds) / seconds:8.1f} pages/s")
+        workers *= 2
@@ -0,0 +1,149 @@
+"""
+================================================================================
+BENCHMARK - bench_outbound_scheduler.py
+
+Sends a crowd of searches through the outbound scheduler
+(modules/rate_limiter.py) to a local FAKE retailer and shows that:
+- the retailer never gets more than its token-bucket rate, however many
+  users search at the same time
+- user searches (interactive lane) wait less than background refreshes
+- requests that do not fit in the queues are shed right away
+- no thread sleeps while waiting: the number of threads stays at the
+  worker pool + one dispatcher, whatever the number of waiting requests
+
+--users threads each run --searches interactive searches, while
+--background refreshes are queued at the same time. The fake retailer
+counts the requests it gets every second.
+
+Run from the backend folder:
+    python -m benchmarks.bench_outbound_scheduler --rate 5 --users 20
+================================================================================
+"""
+
+import argparse
+import http.server
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from modules import extraction, rate_limiter, scraper
+from modules.rate_limiter import INTERACTIVE, BACKGROUND
+
+
+PAGE = (
+    '<html><body><div data-component-type="s-search-result">'
+    '<h2 class="a-size-mini">Apple iPhone 15 (128 GB) - Black</h2>'
+    '<span class="a-price-whole">69,999</span><a class="a-link-normal" href="/dp/X">x</a>'
+    '</div></body></html>'
+).encode()
+
+
+class FakeRetailer(http.server.ThreadingHTTPServer):
+    # Counts the requests it gets per second
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(("127.0.0.1", 0), FakeRetailerHandler)
+        self.latency = latency
+        self.started = time.monotonic()
+        self.per_second = Counter()
+        self.lock = threading.Lock()
+
+
+class FakeRetailerHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.per_second[int(time.monotonic() - self.server.started)] += 1
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+def user(searches, waits, priority):
+    # One user searching again and again; records seconds per search
+    for n in range(searches):
+        start = time.perf_counter()
+        entry = scraper.scrape_retailer("Amazon", f"iPhone 15 {n}", priority)
+        waits.append((time.perf_counter() - start, entry.get("skipped", False)))
+
+
+def summary(name, results):
+    seconds = np.array([s for s, skipped in results if not skipped])
+    shed = sum(1 for _, skipped in results if skipped)
+    if not len(seconds):
+        return f"{name:<12} {0:>6} {shed:>6}"
+    return (f"{name:<12} {len(seconds):>6} {shed:>6} {np.percentile(seconds, 50):>8.2f} "
+            f"{np.percentile(seconds, 95):>8.2f} {seconds.max():>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Token-bucket scheduler under many concurrent searches")
+    parser.add_argument("--rate", type=float, default=5, help="Requests per second allowed to the retailer")
+    parser.add_argument("--burst", type=float, default=2, help="Token-bucket burst")
+    parser.add_argument("--users", type=int, default=20, help="Users searching at the same time")
+    parser.add_argument("--searches", type=int, default=3, help="Searches per user")
+    parser.add_argument("--background", type=int, default=40, help="Background refreshes queued")
+    parser.add_argument("--latency", type=float, default=0.05, help="Answer time of the fake retailer")
+    args = parser.parse_args()
+
+    extraction.PARSE_WORKERS = 0
+    scheduler = rate_limiter.outbound_scheduler
+
+    server = FakeRetailer(args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    adapter = scraper.AmazonAdapter()
+    adapter.search_url = f"http://127.0.0.1:{server.server_address[1]}/s?k={{query}}"
+    scraper.RETAILER_RATE, scraper.RETAILER_BURST = args.rate, args.burst
+    scraper.register_retailer(adapter)
+    scheduler.configure_global(0, 1)  # only the retailer's own limit applies here
+
+    interactive, background = [], []
+    threads = [threading.Thread(target=user, args=(args.searches, interactive, INTERACTIVE))
+               for _ in range(args.users)]
+    threads += [threading.Thread(target=user, args=(1, background, BACKGROUND))
+                for _ in range(args.background)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    # Sample thread count and queue depth while the crowd is waiting
+    peak_queued = 0
+    peak_scheduler_threads = 0
+    while any(thread.is_alive() for thread in threads):
+        stats = scheduler.stats()
+        peak_queued = max(peak_queued, stats["queued"])
+        names = [t.name for t in threading.enumerate()]
+        peak_scheduler_threads = max(peak_scheduler_threads,
+                                     sum(1 for n in names if n.startswith("outbound")))
+        time.sleep(0.05)
+    seconds = time.perf_counter() - start
+
+    stats = scheduler.stats()["hosts"]["Amazon"]
+    print("=" * 60)
+    print(f"{'lane':<12} {'done':>6} {'shed':>6} {'p50 s':>8} {'p95 s':>8} {'max s':>8}")
+    print("=" * 60)
+    print(summary("interactive", interactive))
+    print(summary("background", background))
+    print("-" * 60)
+    sent = sum(server.per_second.values())
+    print(f"requests sent: {sent} in {seconds:.1f}s = {sent / seconds:.2f}/s "
+          f"(limit {args.rate}/s, burst {args.burst:g})")
+    print(f"busiest second: {max(server.per_second.values())} requests")
+    print(f"most requests waiting at once: {peak_queued}")
+    print(f"scheduler threads (workers + dispatcher), most at once: {peak_scheduler_threads}")
+    print(f"shed: {stats['shed']}  queue wait: {stats['queue_wait']}")
+
+    scheduler.stop()
+    server.shutdown()
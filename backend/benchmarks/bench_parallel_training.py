@@ -0,0 +1,74 @@
+"""
+================================================================================
+BENCHMARK - bench_parallel_training.py
+
+Measures how training one PricePredictionModel per product scales with
+the number of worker processes (see modules/parallel_training.py).
+
+A synthetic catalogue (many products, random price histories) is trained
+with 1, 2, 4, ... processes up to the number of CPU cores. For every run
+it prints the time, products per second and the speedup over 1 process,
+and checks that all runs give the same coefficients.
+
+Run from the backend folder:
+    python -m benchmarks.bench_parallel_training --products 20000 --points 60
+
+================================================================================
+"""
+
+import argparse
+
+import numpy as np
+
+from modules.parallel_training import train_all_products, default_workers
+
+
+def make_catalogue(rng, products, points):
+    # Every product: trend + noise, prices on random days of one year
+    product_ids = np.repeat(np.arange(products), points)
+    days = rng.integers(0, 365, products * points)
+    base = np.repeat(rng.uniform(500, 100000, products), points)
+    trend = np.repeat(rng.normal(0, 20, products), points)
+    prices = base + trend * days + rng.normal(0, 300, products * points)
+    dates = np.datetime64("2024-01-01") + days
+    return product_ids, dates, prices
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling of multi-process model training")
+    parser.add_argument("--products", type=int, default=20000, help="Products in the catalogue")
+    parser.add_argument("--points", type=int, default=60, help="Prices per product")
+    parser.add_argument("--max-workers", type=int, default=default_workers(), help="Most processes to try")
+    parser.add_argument("--backend", default=None, help="Model engine (numpy or sklearn)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    catalogue = make_catalogue(rng, args.products, args.points)
+
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    print("=" * 60)
+    print(f"{args.products} products x {args.points} prices, {default_workers()} CPU cores")
+    print("=" * 60)
+    print(f"{'workers':>8} {'seconds':>9} {'products/s':>12} {'speedup':>8}")
+
+    baseline = None
+    reference = None
+    for workers in counts:
+        result = train_all_products(*catalogue, workers=workers, backend=args.backend)
+        seconds = result["timings"]["total_seconds"]
+        baseline = baseline or seconds
+        print(f"{workers:>8} {seconds:>9.3f} {args.products / seconds:>12.0f} {baseline / seconds:>7.2f}x")
+
+        coefficients = np.column_stack([result["slope"], result["intercept"], result["r2"]])
+        if reference is None:
+            reference = coefficients
+        elif not np.allclose(coefficients, reference):
+            print("  [-] Results differ from the 1-process run!")
+
+    print("-" * 60)
+    print("Ideal speedup = number of workers (up to the number of cores)")
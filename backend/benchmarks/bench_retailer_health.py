@@ -0,0 +1,118 @@
+"""
+================================================================================
+BENCHMARK - bench_retailer_health.py
+
+Runs searches against a local FAKE retailer whose behaviour changes over
+time, and shows how the health tracker (modules/retailer_health.py)
+reacts: adaptive timeout, circuit opening, half-open probes, recovery.
+
+Scenario (one phase after another; before each phase the cool-down is
+allowed to pass, so the first search of a phase may be a probe):
+- healthy: answers in --latency seconds
+- hanging: waits --hang seconds before answering
+- errors:  answers 503 Service Unavailable
+- healthy: answers normally again
+
+For every search it prints the time it took, the circuit state and the
+timeout used. Without the tracker, every search in the "hanging" phase
+would take the full fixed timeout.
+
+Run from the backend folder:
+    python -m benchmarks.bench_retailer_health --cooldown 2
+
+================================================================================
+"""
+
+import argparse
+import http.server
+import threading
+import time
+
+from modules import extraction, rate_limiter, retailer_health, scraper
+
+
+PAGE = (
+    '<html><body><div data-component-type="s-search-result">'
+    '<h2 class="a-size-mini">Apple iPhone 15 (128 GB) - Black</h2>'
+    '<span class="a-price-whole">69,999</span><a class="a-link-normal" href="/dp/X">x</a>'
+    '</div></body></html>'
+).encode()
+
+
+class FakeRetailer(http.server.ThreadingHTTPServer):
+    # A retailer whose behaviour is set through .mode
+    daemon_threads = True
+
+    def __init__(self, latency, hang):
+        super().__init__(("127.0.0.1", 0), FakeRetailerHandler)
+        self.mode = "healthy"
+        self.latency = latency
+        self.hang = hang
+
+
+class FakeRetailerHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        mode = self.server.mode
+        if mode == "errors":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        time.sleep(self.server.hang if mode == "hanging" else self.server.latency)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Circuit breaker and adaptive timeouts against a fake retailer")
+    parser.add_argument("--latency", type=float, default=0.05, help="Normal answer time (seconds)")
+    parser.add_argument("--hang", type=float, default=8, help="Answer time while hanging (seconds)")
+    parser.add_argument("--searches", type=int, default=8, help="Searches per phase")
+    parser.add_argument("--cooldown", type=float, default=2, help="Circuit cool-down (seconds)")
+    args = parser.parse_args()
+
+    extraction.PARSE_WORKERS = 0
+    retailer_health.COOLDOWN = args.cooldown
+    scraper.RETAILER_RATE = 0
+    rate_limiter.outbound_scheduler.configure_global(0, 1)
+
+    server = FakeRetailer(args.latency, args.hang)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    adapter = scraper.AmazonAdapter(timeout=10)
+    adapter.search_url = f"http://127.0.0.1:{server.server_address[1]}/s?k={{query}}"
+    scraper.register_retailer(adapter)
+
+    print("=" * 70)
+    print(f"{'phase':<9} {'#':>3} {'seconds':>8} {'found':>6} {'state':>10} {'timeout':>8}")
+    print("=" * 70)
+
+    for phase in ("healthy", "hanging", "errors", "healthy"):
+        server.mode = phase
+        if adapter.health.state != "closed":
+            time.sleep(adapter.health.cooldown + 0.1)  # let the cool-down pass so a probe goes out
+        for n in range(args.searches):
+            start = time.perf_counter()
+            entry = scraper.scrape_retailer("Amazon", "iPhone 15")
+            seconds = time.perf_counter() - start
+            stats = adapter.health.stats()
+            found = "skip" if entry.get("skipped") else ("yes" if entry["available"] else "no")
+            print(f"{phase:<9} {n + 1:>3} {seconds:>8.3f} {found:>6} {stats['state']:>10} {stats['timeout']:>8.2f}")
+        print("-" * 70)
+
+    stats = adapter.health.stats()
+    print(f"requests={stats['requests']} failures={stats['failures']} skipped={stats['skipped']} "
+          f"opened={stats['times_opened']} latency={stats['latency']}")
+    server.shutdown()
@@ -0,0 +1,122 @@
+"""
+================================================================================
+BENCHMARK - bench_streaming_scrape.py
+
+Compares the two ways a retailer adapter reads a search page:
+- full:      download the whole page, then parse it
+- streaming: parse while downloading, stop at the first matching product
+
+The fixture pages (see bench_html_parsing.py) are served by a local HTTP
+stand-in that sends them in small chunks at a limited bandwidth, like a
+real website would. For every retailer it prints the time per search,
+the bytes the adapter downloaded, the bytes the server managed to send
+before the connection was closed, and the CPU time of the search.
+
+Run from the backend folder:
+    python -m benchmarks.bench_streaming_scrape --fixtures benchmarks/fixtures --mbps 50
+
+================================================================================
+"""
+
+import argparse
+import http.server
+import os
+import threading
+import time
+
+from modules import extraction
+from modules.scraper import RETAILERS
+from benchmarks.bench_html_parsing import load_fixtures, ADAPTERS
+
+
+class FixtureServer(http.server.ThreadingHTTPServer):
+    # Serves /<retailer>?q=... with the retailer's fixture page
+    daemon_threads = True
+
+    def __init__(self, pages, mbps):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.pages = pages
+        self.mbps = mbps
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    chunk_size = 8 * 1024
+
+    def do_GET(self):
+        retailer = self.path.strip("/").split("?")[0]
+        body = self.server.pages[retailer]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        # Send in chunks at the chosen bandwidth until done or the client hangs up
+        delay = self.chunk_size * 8 / (self.server.mbps * 1e6) if self.server.mbps else 0
+        try:
+            for start in range(0, len(body), self.chunk_size):
+                self.wfile.write(body[start:start + self.chunk_size])
+                with self.server.lock:
+                    self.server.bytes_sent += min(self.chunk_size, len(body) - start)
+                if delay:
+                    time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def run(adapter, query, repeat):
+    # Best wall time, average CPU time and bytes per search
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        item = adapter.search(query)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    return min(walls), sum(cpus) / repeat, item
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full download vs streaming early-exit parse")
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures"),
+                        help="Folder with saved search pages")
+    parser.add_argument("--query", default="Apple iPhone 15", help="Search that the pages should match")
+    parser.add_argument("--mbps", type=float, default=50, help="Bandwidth of the stand-in (0 = unlimited)")
+    parser.add_argument("--repeat", type=int, default=5, help="Searches per measurement")
+    args = parser.parse_args()
+
+    # Parse in this process, so CPU time includes the parsing
+    extraction.PARSE_WORKERS = 0
+
+    fixtures = load_fixtures(args.fixtures, 48, 1500)
+    server = FixtureServer({retailer: pages[0] for retailer, pages in fixtures.items()}, args.mbps)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print("=" * 86)
+    print(f"{'retailer':<10} {'mode':<10} {'ms':>8} {'CPU ms':>8} {'KB read':>9} {'KB sent':>9} {'result'}")
+    print("=" * 86)
+
+    for retailer, name in ADAPTERS.items():
+        for streaming in (False, True):
+            template = RETAILERS[name]
+            adapter = type(template)(streaming=streaming)
+            adapter.search_url = f"{base}/{retailer}?q={{query}}"
+
+            sent_before = server.bytes_sent
+            wall, cpu, item = run(adapter, args.query, args.repeat)
+            time.sleep(0.2)  # let the server notice closed connections
+            sent = (server.bytes_sent - sent_before) / args.repeat
+            read = adapter.transfer_stats()["avg_bytes_per_page"]
+            adapter.close()
+
+            print(f"{retailer:<10} {'streaming' if streaming else 'full':<10} {wall * 1000:>8.1f} "
+                  f"{cpu * 1000:>8.1f} {read / 1024:>9.0f} {sent / 1024:>9.0f} "
+                  f"{item['price'] if item else None}")
+        print("-" * 86)
+
+    server.shutdown()
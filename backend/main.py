@@ -38,18 +38,31 @@ Think of endpoints like destinations in a restaurant menu:
 # Import libraries
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
+from fastapi.responses import StreamingResponse
+import json
 import os
 import sys
+import time
 
 # Import our custom modules
 from modules.database import (
-    initialize_database, add_product, add_price, 
-    get_product_prices, get_prices_for_date, get_all_products, 
-    save_prediction, get_predictions
+    initialize_database, get_product_prices, get_prices_for_date, get_all_products,
+    save_prediction, get_predictions, close_connections, bulk_ingest_csv,
+    get_price_history_version
 )
-from modules.scraper import scrape_all_websites, find_cheapest_option, load_data_from_csv
-from modules.ml_predictor import PricePredictionModel
+from modules.scraper import (
+    find_cheapest_option, load_data_from_csv, close_retailers, get_retailer_health
+)
+from modules.comparison import get_comparison, iter_comparison, get_cache_stats
+from modules.rate_limiter import outbound_scheduler
+from modules.forecasting import (
+    get_trained_model, get_online_prediction, get_model_cache_stats, NotEnoughHistoryError
+)
+from modules.batch_forecast import forecast_all_products
+from modules.forecast_worker import forecast_worker
+from modules.history_store import history_store, EPOCH
+from modules.model_store import get_model_store_stats
+from modules.model_registry import DEFAULT_FORECAST_MODEL, FORECAST_MODELS
 
 
 # ============================================================================
@@ -83,26 +96,49 @@ app.add_middleware(
 # ============================================================================
 # INITIALIZE APPLICATION
 # ============================================================================
+# Seeding runs in the startup hook, not at import time: the parse pool
+# (extraction.py) starts its workers with "spawn", and every spawned worker
+# imports this file again - it must not rebuild the database each time.
 
-# Initialize database when app starts
-initialize_database()
-
-# Load sample data into database
 CSV_PATH = os.path.join(os.path.dirname(__file__), "data", "sample_data.csv")
-if os.path.exists(CSV_PATH):
-    print(f"[+] Loading real product data from {CSV_PATH}")
-    df = pd.read_csv(CSV_PATH)
-    
-    # Add products and prices to database
-    for _, row in df.iterrows():
-        add_product(row['product_id'], row['product_name'], row['category'])
-        add_price(
-            row['product_id'], 
-            row['website'], 
-            row['price'], 
-            row['date'],
-            row.get('website_link')  # Include the website link
-        )
+
+
+def seed_data():
+    """
+    WHAT IT DOES: Creates the tables, loads the sample CSV and builds the history store
+    """
+    # Initialize database when app starts
+    initialize_database()
+
+    # Load sample data into database (one bulk transaction, no per-row inserts)
+    if os.path.exists(CSV_PATH):
+        print(f"[+] Loading real product data from {CSV_PATH}")
+        bulk_ingest_csv(CSV_PATH)
+
+    # Columnar copy of the price history for training (only changed products are re-read)
+    try:
+        history_store.refresh()
+    except Exception as e:
+        print(f"[-] Could not build the history store: {e}")
+
+
+@app.on_event("startup")
+def startup():
+    """
+    Seed the database, then start precomputing forecasts in the background
+    """
+    seed_data()
+    forecast_worker.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """
+    Close the pooled retailer and database connections when the server stops
+    """
+    forecast_worker.stop()
+    close_retailers()
+    close_connections()
 
 
 # ============================================================================
@@ -136,6 +172,40 @@ def read_root():
 # API ENDPOINT 2: SEARCH & COMPARE PRICES
 # ============================================================================
 
+def build_comparison_response(product_name, comparison, age, stale):
+    """
+    The /api/compare-prices answer for a finished comparison
+    """
+    # Find cheapest option (only from available products)
+    cheapest = find_cheapest_option(comparison)
+    
+    # Check if at least one product is available
+    available_count = sum(1 for v in comparison.values() if v.get('available', False))
+    
+    response = {
+        "status": "success",
+        "product": product_name,
+        "comparison": comparison,
+        "cheapest": cheapest,
+        "available_count": available_count,
+        "total_checked": len(comparison),
+        "age": age,      # Seconds since these prices were scraped
+        "stale": stale   # True = refreshing in the background
+    }
+    
+    # Check if we're showing estimated prices
+    has_estimated = any(v.get('estimated', False) for v in comparison.values())
+    
+    # Add note about estimated prices or availability
+    if has_estimated:
+        response["note"] = "⚠️ Showing estimated prices as the product was not found on retailer websites. These are approximate market prices for reference."
+        response["estimated"] = True
+    elif available_count == 0:
+        response["note"] = "Product not available on any website. Try a different search term."
+    
+    return response
+
+
 @app.get("/api/compare-prices")
 def compare_prices(product_name: str = Query(..., description="Product name to search")):
     """
@@ -150,6 +220,7 @@ def compare_prices(product_name: str = Query(..., description="Product name to s
     - All prices from different websites
     - Cheapest option
     - Savings on each website
+    - age: How old (seconds) the prices are, 0 = just scraped
     
     EXAMPLE:
     >>> GET /api/compare-prices?product_name=Samsung
@@ -168,8 +239,8 @@ def compare_prices(product_name: str = Query(..., description="Product name to s
     """
     
     try:
-        # Step 1: Search on all websites
-        comparison = scrape_all_websites(product_name)
+        # Step 1: Search on all websites (recent answers come from the cache)
+        comparison, age, stale = get_comparison(product_name)
         
         if not comparison or len(comparison) == 0:
             raise HTTPException(
@@ -177,32 +248,8 @@ def compare_prices(product_name: str = Query(..., description="Product name to s
                 detail=f"Unable to search for product '{product_name}'"
             )
         
-        # Step 2: Find cheapest option (only from available products)
-        cheapest = find_cheapest_option(comparison)
-        
-        # Check if at least one product is available
-        available_count = sum(1 for v in comparison.values() if v.get('available', False))
-        
-        response = {
-            "status": "success",
-            "product": product_name,
-            "comparison": comparison,
-            "cheapest": cheapest,
-            "available_count": available_count,
-            "total_checked": len(comparison)
-        }
-        
-        # Check if we're showing estimated prices
-        has_estimated = any(v.get('estimated', False) for v in comparison.values())
-        
-        # Add note about estimated prices or availability
-        if has_estimated:
-            response["note"] = "⚠️ Showing estimated prices as the product was not found on retailer websites. These are approximate market prices for reference."
-            response["estimated"] = True
-        elif available_count == 0:
-            response["note"] = "Product not available on any website. Try a different search term."
-        
-        return response
+        # Step 2: Cheapest option, counts and notes
+        return build_comparison_response(product_name, comparison, age, stale)
     
     except HTTPException:
         raise
@@ -218,12 +265,77 @@ def compare_prices(product_name: str = Query(..., description="Product name to s
         )
 
 
+# ============================================================================
+# API ENDPOINT 2B: STREAMED PRICE COMPARISON
+# ============================================================================
+
+@app.get("/api/compare-prices/stream")
+def compare_prices_stream(
+    product_name: str = Query(..., description="Product name to search"),
+    format: str = Query("sse", pattern="^(sse|ndjson)$", description="sse or ndjson")
+):
+    """
+    WHAT IT DOES: Same search as /api/compare-prices, but every retailer's
+    price is sent the moment that retailer has answered
+    
+    ENDPOINT: GET /api/compare-prices/stream?product_name=Samsung&format=ndjson
+    
+    PARAMETERS:
+    - product_name: Name of product to search
+    - format: "sse" (Server-Sent Events, for EventSource) or "ndjson"
+      (one JSON object per line)
+    
+    EVENTS (in this order):
+    - retailer: {"website", "result", "source", "elapsed"} once per retailer;
+      source is "cache" or "live", elapsed = seconds since the request started
+    - summary: exactly the /api/compare-prices answer (cheapest option, savings, notes)
+    - error: {"detail"} if the search failed
+    
+    WHY: The first price shows up after the FASTEST retailer, not the slowest
+    """
+    
+    started = time.perf_counter()
+    
+    def encode(event_type, data):
+        if format == "ndjson":
+            return json.dumps(dict(data, type=event_type)) + "\n"
+        return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+    
+    def events():
+        try:
+            for event in iter_comparison(product_name):
+                if event["type"] == "retailer":
+                    yield encode("retailer", {
+                        "website": event["website"],
+                        "result": event["result"],
+                        "source": event["source"],
+                        "elapsed": round(time.perf_counter() - started, 3)
+                    })
+                else:
+                    yield encode("summary", build_comparison_response(
+                        product_name, event["comparison"], event["age"], event["stale"]
+                    ))
+        except Exception as e:
+            print(f"[-] Error in compare_prices_stream endpoint: {str(e)}")
+            yield encode("error", {"detail": f"Error searching for product: {str(e)}"})
+    
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ============================================================================
 # API ENDPOINT 3: GET PRICE HISTORY
 # ============================================================================
 
 @app.get("/api/price-history")
-def get_price_history(product_id: int = Query(..., description="Product ID")):
+def get_price_history(
+    product_id: int = Query(..., description="Product ID"),
+    format: str = Query("rows", pattern="^(rows|columns)$", description="rows or columns")
+):
     """
     WHAT IT DOES: Retrieves all past prices for a product
     
@@ -231,6 +343,9 @@ def get_price_history(product_id: int = Query(..., description="Product ID")):
     
     PARAMETERS:
     - product_id: ID of the product
+    - format: "rows" (default) = one object per price, with links
+              "columns" = three lists (dates, websites, prices), oldest first,
+              read from the memory-mapped history store when it is up to date
     
     RETURNS: List of prices with dates and websites
     
@@ -238,6 +353,20 @@ def get_price_history(product_id: int = Query(..., description="Product ID")):
     """
     
     try:
+        if format == "columns":
+            history = history_store.get_history(product_id)
+            if history is not None and history["version"] == get_price_history_version(product_id):
+                names = history["website_names"]
+                return {
+                    "status": "success",
+                    "product_id": product_id,
+                    "total_records": len(history["days"]),
+                    "source": "store",
+                    "dates": (EPOCH + history["days"]).astype(str).tolist(),
+                    "websites": [names[code] for code in history["websites"]],
+                    "prices": history["prices"].tolist()
+                }
+
         prices = get_product_prices(product_id)
         
         if not prices:
@@ -246,6 +375,18 @@ def get_price_history(product_id: int = Query(..., description="Product ID")):
                 detail=f"No price history found for product {product_id}"
             )
         
+        if format == "columns":
+            prices = prices[::-1]  # oldest first, like the store
+            return {
+                "status": "success",
+                "product_id": product_id,
+                "total_records": len(prices),
+                "source": "database",
+                "dates": [record["date"] for record in prices],
+                "websites": [record["website"] for record in prices],
+                "prices": [record["price"] for record in prices]
+            }
+        
         return {
             "status": "success",
             "product_id": product_id,
@@ -257,6 +398,21 @@ def get_price_history(product_id: int = Query(..., description="Product ID")):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def parse_interval_levels(levels):
+    """
+    Turns "80,95" into (80.0, 95.0); None keeps the default levels
+    """
+    if levels is None:
+        return None
+    try:
+        parsed = tuple(float(level) for level in levels.split(","))
+    except ValueError:
+        parsed = ()
+    if not parsed or not all(0 < level < 100 for level in parsed):
+        raise HTTPException(status_code=400, detail="levels must be percentages between 0 and 100, e.g. 80,95")
+    return parsed
+
+
 # ============================================================================
 # API ENDPOINT 4: PREDICT FUTURE PRICE
 # ============================================================================
@@ -264,7 +420,11 @@ def get_price_history(product_id: int = Query(..., description="Product ID")):
 @app.get("/api/predict-price")
 def predict_price(
     product_id: int = Query(..., description="Product ID"),
-    days_ahead: int = Query(30, description="Days to predict ahead")
+    days_ahead: int = Query(30, description="Days to predict ahead"),
+    engine: str = Query("full", pattern="^(full|online)$", description="full = trained model, online = running sums"),
+    fresh: bool = Query(False, description="Train now instead of serving the precomputed forecast"),
+    model: str = Query(DEFAULT_FORECAST_MODEL, description="auto, linear, seasonal or holt"),
+    levels: str = Query(None, description="Prediction interval levels in percent, e.g. 80,95")
 ):
     """
     WHAT IT DOES: Uses ML model to predict future price of a product
@@ -274,12 +434,22 @@ def predict_price(
     PARAMETERS:
     - product_id: ID of product to predict
     - days_ahead: How many days in future to predict (default: 30)
+    - engine: "full" (default) trains on the whole history (cached),
+      "online" uses the running sums kept up to date on every new price
+      (no training, same line; MAE is not available)
+    - fresh: With engine "full", the latest forecast precomputed by the
+      background worker is served if there is one. fresh=true trains the
+      model right now instead (and saves the prediction)
+    - model: Forecasting model, "auto" (default) picks per product by backtest
+    - levels: Prediction interval levels in percent (default: 80,95)
     
     RETURNS:
     - Predicted price
     - Predicted date
     - Model confidence (0-100%)
+    - Prediction intervals (price ranges per level)
     - Evaluation metrics
+    - model_info: Which model served the request and how long fitting took (ms)
     
     EXAMPLE:
     >>> GET /api/predict-price?product_id=1&days_ahead=30
@@ -288,7 +458,11 @@ def predict_price(
         "prediction": {
             "predicted_price": 9500,
             "predicted_date": "2024-05-01",
-            "confidence": 85.5
+            "confidence": 85.5,
+            "intervals": {
+                "80": {"lower": 9210.4, "upper": 9789.6},
+                "95": {"lower": 9040.1, "upper": 9959.9}
+            }
         },
         "model_evaluation": {
             "MAE": 50.25,
@@ -298,55 +472,125 @@ def predict_price(
     }
     """
     
+    if model != "auto" and model not in FORECAST_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model '{model}'")
+    interval_levels = parse_interval_levels(levels)
+    
     try:
-        # Step 1: Load price history
-        prices = get_product_prices(product_id)
-        
-        if not prices or len(prices) < 3:
-            raise HTTPException(
-                status_code=400,
-                detail="Not enough historical data to make prediction"
-            )
-        
-        # Step 2: Create DataFrame for ML
-        price_data = []
-        for price_record in prices:
-            price_data.append({
-                "product_id": product_id,
-                "price": price_record["price"],
-                "date": price_record["date"],
-                "website": price_record["website"],
-                "product_name": "Product"
-            })
+        # Precomputed forecast from the background worker, no work in the request
+        if engine == "full" and not fresh and model == DEFAULT_FORECAST_MODEL and levels is None:
+            precomputed = forecast_worker.get_prediction(product_id, days_ahead)
+            if precomputed is not None:
+                prediction, forecast = precomputed
+                
+                # History changed since: serve it anyway, recompute in the background
+                stale = forecast["version"] != get_price_history_version(product_id)
+                if stale:
+                    forecast_worker.enqueue(product_id, "requested")
+                
+                return {
+                    "status": "success",
+                    "product_id": product_id,
+                    "prediction": prediction,
+                    "model_evaluation": forecast["evaluation"],
+                    "model_info": forecast["model_info"],
+                    "model_cached": True,
+                    "engine": engine,
+                    "precomputed": True,
+                    "forecast_age": round(time.time() - forecast["computed_at"], 1),
+                    "stale": stale
+                }
         
-        df = pd.DataFrame(price_data)
+        if engine == "online":
+            # Step 1+2: Prediction straight from the running sums
+            prediction, evaluation = get_online_prediction(product_id, days_ahead, interval_levels)
+            trained = {"cached": False, "source": "online", "model_info": {"model": "online", "fit_ms": 0.0, "selection": {}}}
+        else:
+            # Step 1: Get a trained model (reused from the cache if the
+            # price history has not changed since it was trained)
+            trained = get_trained_model(product_id, model)
+            evaluation = trained["evaluation"]
+            
+            # Step 2: Make prediction
+            prediction = trained["model"].predict_future_price(days_ahead, interval_levels)
         
-        # Step 3: Create and train ML model
-        model = PricePredictionModel()
-        X, Y, dates = model.prepare_data(df, "Product")
-        model.train(X, Y)
-        
-        # Step 4: Make prediction
-        prediction = model.predict_future_price(days_ahead)
-        
-        # Step 5: Get model metrics
-        evaluation = model.get_model_evaluation(X, Y)
-        
-        # Step 6: Save prediction to database
+        # Step 3: Save prediction to database
         save_prediction(
             product_id,
             prediction["predicted_price"],
             prediction["predicted_date"],
-            evaluation["R2_Score"]
+            evaluation["R2_Score"],
+            trained["model_info"]["model"]
         )
         
         return {
             "status": "success",
             "product_id": product_id,
             "prediction": prediction,
-            "model_evaluation": evaluation
+            "model_evaluation": evaluation,
+            "model_info": trained["model_info"],
+            "model_cached": trained["cached"],
+            "model_source": trained["source"],
+            "engine": engine,
+            "precomputed": False
+        }
+    
+    except NotEnoughHistoryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================================================
+# API ENDPOINT 4B: FORECAST CURVE (MANY DAYS AT ONCE)
+# ============================================================================
+
+@app.get("/api/forecast")
+def forecast_curve(
+    product_id: int = Query(..., description="Product ID"),
+    days: int = Query(30, ge=1, le=3650, description="Number of days to forecast"),
+    model: str = Query(DEFAULT_FORECAST_MODEL, description="auto, linear, seasonal or holt"),
+    levels: str = Query(None, description="Prediction interval levels in percent, e.g. 80,95")
+):
+    """
+    WHAT IT DOES: Predicts the price for every day from tomorrow up to `days`
+    
+    ENDPOINT: GET /api/forecast?product_id=1&days=90
+    
+    RETURNS: Columns (equally long lists) for drawing a forecast chart
+    
+    EXAMPLE:
+    >>> GET /api/forecast?product_id=1&days=3
+    {
+        "product_id": 1,
+        "forecast": {
+            "days_ahead": [1, 2, 3],
+            "dates": ["2024-02-02", "2024-02-03", "2024-02-04"],
+            "prices": [16790.5, 16784.1, 16777.7],
+            "confidence": 85.5,
+            "intervals": {"95": {"lower": [...], "upper": [...]}, ...}
         }
+    }
+    """
+    
+    if model != "auto" and model not in FORECAST_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model '{model}'")
+    interval_levels = parse_interval_levels(levels)
     
+    try:
+        trained = get_trained_model(product_id, model)
+        
+        return {
+            "status": "success",
+            "product_id": product_id,
+            "forecast": trained["model"].predict_horizon(days, interval_levels),
+            "model_evaluation": trained["evaluation"],
+            "model_info": trained["model_info"],
+            "model_cached": trained["cached"]
+        }
+    
+    except NotEnoughHistoryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -426,6 +670,150 @@ def health_check():
     }
 
 
+# ============================================================================
+# API ENDPOINT 8: CACHE STATISTICS
+# ============================================================================
+
+@app.get("/api/cache-stats")
+def cache_stats():
+    """
+    WHAT IT DOES: Shows how well the price comparison and model caches
+    (and the model store in the database) are working
+    
+    ENDPOINT: GET /api/cache-stats
+    
+    RETURNS: Hits, misses, evictions and current size of each cache
+    """
+    
+    return {
+        "status": "success",
+        "comparison_cache": get_cache_stats(),
+        "model_cache": get_model_cache_stats(),
+        "model_store": get_model_store_stats(),
+        "history_store": history_store.stats()
+    }
+
+
+# ============================================================================
+# API ENDPOINT 9: BATCH FORECAST FOR ALL PRODUCTS
+# ============================================================================
+
+@app.post("/api/batch-predict")
+def batch_predict(days_ahead: int = Query(30, description="Days to predict ahead")):
+    """
+    WHAT IT DOES: Predicts the future price of EVERY product in one pass
+    
+    ENDPOINT: POST /api/batch-predict?days_ahead=30
+    
+    RETURNS: How many products were forecast and how long each step took
+    
+    USE CASE: Nightly refresh of all predictions (also available from the
+    command line: python -m modules.batch_forecast --days-ahead 30)
+    """
+    
+    try:
+        summary = forecast_all_products(days_ahead)
+        
+        return {
+            "status": "success",
+            **summary
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================================================
+# API ENDPOINT 10: FORECAST WORKER QUEUE
+# ============================================================================
+
+@app.get("/api/forecast-jobs")
+def forecast_jobs(limit: int = Query(100, ge=0, le=10000, description="Most waiting jobs listed")):
+    """
+    WHAT IT DOES: Shows the background forecast worker's queue and metrics
+    
+    ENDPOINT: GET /api/forecast-jobs
+    
+    RETURNS:
+    - stats: queued, in_progress, completed, failed, current_lag (age of the
+      oldest waiting job), avg_lag / max_lag (seconds from queued to started)
+    - jobs: running jobs and the oldest waiting jobs
+    """
+    
+    return {
+        "status": "success",
+        "stats": forecast_worker.stats(),
+        "jobs": forecast_worker.queue_snapshot(limit)
+    }
+
+
+@app.post("/api/forecast-jobs")
+def queue_forecast_job(product_id: int = Query(..., description="Product ID")):
+    """
+    WHAT IT DOES: Queues a product for forecast recomputation
+    
+    ENDPOINT: POST /api/forecast-jobs?product_id=1
+    """
+    
+    return {
+        "status": "success",
+        "product_id": product_id,
+        "queued": forecast_worker.enqueue(product_id, "requested")
+    }
+
+
+# ============================================================================
+# API ENDPOINT 11: RETAILER HEALTH
+# ============================================================================
+
+@app.get("/api/retailer-health")
+def retailer_health():
+    """
+    WHAT IT DOES: Shows how every retailer website is doing
+    
+    ENDPOINT: GET /api/retailer-health
+    
+    RETURNS: Per retailer:
+    - state: "closed" (normal), "open" (skipped for cooldown_remaining
+      seconds after too many failures) or "half_open" (being probed)
+    - timeout: Current adaptive timeout (seconds)
+    - latency: p50 / p95 / p99 response times of recent requests
+    - requests, failures, skipped, times_opened, last_error
+    - transfers: pages fetched, bytes downloaded, early stops
+    """
+    
+    return {
+        "status": "success",
+        "retailers": get_retailer_health()
+    }
+
+
+# ============================================================================
+# API ENDPOINT 12: OUTBOUND REQUEST SCHEDULER
+# ============================================================================
+
+@app.get("/api/outbound-stats")
+def outbound_stats():
+    """
+    WHAT IT DOES: Shows the shared scheduler that rate-limits every request
+    sent to the retailer websites
+    
+    ENDPOINT: GET /api/outbound-stats
+    
+    RETURNS:
+    - global: Rate limit of all retailers together and tokens left
+    - in_flight, queued, sent, shed: Totals over all retailers
+    - hosts: Per retailer: rate, burst, tokens, queued / submitted / sent per
+      lane (interactive, background), shed (queue_full, expired), cancelled
+      and queue_wait percentiles (seconds spent waiting for a turn)
+    """
+    
+    return {
+        "status": "success",
+        "scheduler": outbound_scheduler.stats()
+    }
+
+
 # ============================================================================
 # RUN APPLICATION
 # ============================================================================
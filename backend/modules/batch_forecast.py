@@ -0,0 +1,218 @@
+"""
+================================================================================
+BATCH FORECAST MODULE - batch_forecast.py
+
+EXPLANATION:
+This module predicts prices for EVERY product in one go.
+
+The slow way (one product at a time):
+- 100,000 products = 100,000 database queries + 100,000 model fits
+
+The fast way (this module):
+1. Read all prices with ONE query
+2. Average the prices per product per day (like prepare_data does)
+3. Fit a straight line for every product at the same time with NumPy
+4. Save all predictions with ONE executemany
+
+How can NumPy fit many lines at once?
+For a straight line  price = slope * day + intercept  the best fit has a
+simple formula (least squares):
+- slope     = sum((x - mean_x) * (y - mean_y)) / sum((x - mean_x)^2)
+- intercept = mean_y - slope * mean_x
+Those sums can be computed for all products together with np.add.reduceat,
+which adds up consecutive groups of an array in one fast call.
+The answers are the same as PricePredictionModel (scaling the feature
+does not change the predictions of a linear regression).
+
+For a model per product trained with PricePredictionModel itself, on all
+CPU cores, pass workers=N (see parallel_training.py). Same results.
+
+Which model?
+The batch ALWAYS fits the linear trend, while /api/predict-price and the
+forecast worker use PRICE_FORECAST_MODEL (default "auto", which may pick
+the seasonal or Holt model). Both write to the predictions table, one row
+per product and predicted date (the latest write wins), and every row
+records the model that made it in its "model" column.
+
+Command line:
+    python -m modules.batch_forecast --days-ahead 30 [--workers 8]
+
+================================================================================
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from modules import database
+from modules.database import get_all_price_points, save_predictions_bulk
+from modules.forecasting import MIN_PRICE_RECORDS
+from modules.parallel_training import train_all_products
+
+
+# The batch always fits the straight line (see "Which model?" above)
+BATCH_MODEL = "linear"
+
+
+def _group_starts(*keys):
+    """
+    Index where each run of equal keys starts in sorted arrays
+    """
+    change = np.zeros(len(keys[0]), dtype=bool)
+    change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def fit_all_trends(product_ids, dates, prices):
+    """
+    WHAT IT DOES: Fits one linear price trend per product in a single pass
+
+    PARAMETERS:
+    - product_ids, dates (YYYY-MM-DD), prices: One entry per price record
+
+    RETURNS: Dictionary of arrays, one entry per product:
+    - product_id, records, first_date, last_day, slope, intercept,
+      r2, mae, mse (x = days since the product's first date)
+    """
+
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+
+    # Step 1: Sort by product, then day
+    order = np.lexsort((days, product_ids))
+    product_ids, days, prices = product_ids[order], days[order], prices[order]
+
+    # Step 2: Average price per product per day
+    day_starts = _group_starts(product_ids, days)
+    day_counts = np.diff(np.append(day_starts, len(days)))
+    daily_price = np.add.reduceat(prices, day_starts) / day_counts
+    daily_product = product_ids[day_starts]
+    daily_day = days[day_starts]
+
+    # Step 3: Group the daily points by product
+    starts = _group_starts(daily_product)
+    n = np.diff(np.append(starts, len(daily_product)))
+    records = np.add.reduceat(day_counts, starts)
+
+    first_day = daily_day[starts]
+    x = (daily_day - np.repeat(first_day, n)).astype(np.float64)
+    y = daily_price
+
+    # Step 4: Closed-form least squares for every product at once
+    mean_x = np.add.reduceat(x, starts) / n
+    mean_y = np.add.reduceat(y, starts) / n
+    dx = x - np.repeat(mean_x, n)
+    dy = y - np.repeat(mean_y, n)
+
+    sxx = np.add.reduceat(dx * dx, starts)
+    sxy = np.add.reduceat(dx * dy, starts)
+    syy = np.add.reduceat(dy * dy, starts)
+
+    has_spread = sxx > 0
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=has_spread)
+    intercept = mean_y - slope * mean_x
+
+    # Step 5: Metrics on the training data
+    residual = y - (np.repeat(intercept, n) + np.repeat(slope, n) * x)
+    sse = np.add.reduceat(residual * residual, starts)
+    mae = np.add.reduceat(np.abs(residual), starts) / n
+    mse = sse / n
+
+    # R² = 1 - SSE/SYY (a flat price history that is predicted exactly scores 1)
+    r2 = np.where(
+        syy > 0,
+        1 - np.divide(sse, syy, out=np.zeros_like(sse), where=syy > 0),
+        np.where(sse > 0, 0.0, 1.0)
+    )
+
+    return {
+        "product_id": daily_product[starts],
+        "records": records,
+        "first_date": first_day.astype("datetime64[D]"),
+        "last_day": np.maximum.reduceat(x, starts),
+        "slope": slope,
+        "intercept": intercept,
+        "r2": r2,
+        "mae": mae,
+        "mse": mse,
+    }
+
+
+def forecast_all_products(days_ahead=30, save=True, workers=0):
+    """
+    WHAT IT DOES: Predicts the price days_ahead days after each product's last
+    recorded price, for every product with enough history
+
+    PARAMETERS:
+    - days_ahead: How many days in the future to predict
+    - save: Write the predictions to the predictions table
+    - workers: 0 = vectorized fit in this process, N = train with
+      PricePredictionModel in N worker processes
+
+    RETURNS: Summary with number of products and timings
+    """
+
+    start = time.perf_counter()
+
+    points = get_all_price_points()
+    loaded = time.perf_counter()
+
+    if not points["product_id"]:
+        return {"products": 0, "skipped": 0, "load_seconds": 0.0, "fit_seconds": 0.0, "save_seconds": 0.0}
+
+    if workers:
+        fits = train_all_products(points["product_id"], points["date"], points["price"], workers=workers)
+    else:
+        fits = fit_all_trends(points["product_id"], points["date"], points["price"])
+
+    # Same minimum history as /api/predict-price (forecasting.MIN_PRICE_RECORDS)
+    keep = fits["records"] >= MIN_PRICE_RECORDS
+    future_day = fits["last_day"][keep] + days_ahead
+    predicted_price = np.round(fits["intercept"][keep] + fits["slope"][keep] * future_day, 2)
+    predicted_date = np.datetime_as_string(
+        fits["first_date"][keep] + future_day.astype(np.int64), unit="D"
+    )
+    accuracy = np.round(fits["r2"][keep], 4)
+    fitted = time.perf_counter()
+
+    rows = list(zip(
+        fits["product_id"][keep].tolist(),
+        predicted_price.tolist(),
+        predicted_date.tolist(),
+        accuracy.tolist(),
+        [BATCH_MODEL] * len(predicted_price)
+    ))
+    if save:
+        save_predictions_bulk(rows)
+    saved = time.perf_counter()
+
+    summary = {
+        "products": len(rows),
+        "skipped": int((~keep).sum()),
+        "days_ahead": days_ahead,
+        "workers": workers,
+        "load_seconds": round(loaded - start, 3),
+        "fit_seconds": round(fitted - loaded, 3),
+        "save_seconds": round(saved - fitted, 3),
+    }
+    print(f"[+] Batch forecast: {summary['products']} products in {saved - start:.2f}s")
+
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast prices for every product")
+    parser.add_argument("--days-ahead", type=int, default=30, help="Days to predict ahead")
+    parser.add_argument("--db", default=database.DATABASE_PATH, help="SQLite database file")
+    parser.add_argument("--dry-run", action="store_true", help="Do not save predictions")
+    parser.add_argument("--workers", type=int, default=0, help="Train in N processes (0 = vectorized)")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.db
+    database.initialize_database()
+
+    print(forecast_all_products(args.days_ahead, save=not args.dry_run, workers=args.workers))
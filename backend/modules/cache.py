@@ -0,0 +1,276 @@
+"""
+================================================================================
+CACHE MODULE - cache.py
+
+EXPLANATION:
+This module keeps recent results in memory so we don't redo slow work.
+
+What is a Cache?
+- A small, fast "notebook" of answers we already worked out
+- If someone asks the same question again, we read the answer from the notebook
+- Reading from memory takes microseconds, scraping a website takes seconds
+
+What is TTL (Time To Live)?
+- Prices change, so a saved answer is only trusted for a while
+- After its TTL (e.g. 5 minutes) an entry "expires" and is fetched again
+
+What is LRU (Least Recently Used)?
+- Memory is limited, so the notebook has a maximum size
+- When it is full, we throw away the entry nobody has used for the longest time
+
+What is Stale-While-Revalidate?
+- An expired ("stale") answer is often still good enough to show right away
+- We return the stale answer immediately and refresh it in the background
+- stale_ttl says how long after expiry a stale answer may still be served
+
+What is Single-Flight?
+- If 10 users search "iphone 15" at the same moment, only ONE scrape runs
+- The other 9 requests wait for that scrape and share its result
+
+Counters:
+- hits: answer was in the cache
+- misses: answer was not in the cache (or had expired)
+- evictions: entries thrown away because the cache was full
+
+================================================================================
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def estimate_size(value):
+    """
+    WHAT IT DOES: Rough memory size of a cached value in bytes
+
+    Uses the length of the value written as JSON - good enough to keep
+    the cache under a memory cap without walking Python objects.
+    """
+
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class TTLCache:
+    """
+    WHAT IT DOES: Thread-safe in-memory cache with expiry and LRU eviction
+
+    PARAMETERS:
+    - max_entries: Most entries kept at once
+    - max_bytes: Memory cap (estimated) for all entries together
+    - default_ttl: Seconds an entry stays valid if set() gets no ttl
+    - stale_ttl: Seconds an expired entry is still kept for get_entry(allow_stale=True)
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=8 * 1024 * 1024, default_ttl=300, stale_ttl=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+
+        # key -> (value, stored_at, expires_at, size)
+        # OrderedDict keeps the least recently used entry first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    def get(self, key):
+        """
+        WHAT IT DOES: Returns the cached value, or None if missing/expired
+        """
+
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key, allow_stale=False):
+        """
+        WHAT IT DOES: Looks up a key and also says how old the answer is
+
+        RETURNS: (value, age_in_seconds, is_stale) or None if not usable
+        - With allow_stale=True, an expired entry inside its stale window
+          is returned with is_stale=True (a stale hit)
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at, expires_at, size = entry
+            now = time.monotonic()
+            age = now - stored_at
+
+            if expires_at <= now:
+                # Too old even to be served stale: drop it
+                if expires_at + self.stale_ttl <= now:
+                    self._remove(key)
+                    self.expirations += 1
+                    self.misses += 1
+                    return None
+
+                if not allow_stale:
+                    self.misses += 1
+                    return None
+
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                return value, age, True
+
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, age, False
+
+    def set(self, key, value, ttl=None, age=0):
+        """
+        WHAT IT DOES: Stores a value for ttl seconds (default_ttl if not given)
+
+        age: How old the value already is (e.g. loaded from the database),
+        it counts towards the TTL and is reported by get_entry()
+        """
+
+        ttl = self.default_ttl if ttl is None else ttl
+        size = estimate_size(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # A single value bigger than the whole cache is not worth keeping
+            if size > self.max_bytes:
+                return
+
+            stored_at = time.monotonic() - age
+            self._entries[key] = (value, stored_at, stored_at + ttl, size)
+            self._bytes += size
+
+            # Evict least recently used entries until we are under both caps
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key):
+        """
+        WHAT IT DOES: Removes one entry (no error if it is missing)
+        """
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """
+        WHAT IT DOES: Empties the cache (counters are kept)
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        # Caller must hold the lock
+        value, stored_at, expires_at, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        """
+        WHAT IT DOES: Returns hit/miss/eviction counters and current size
+        """
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class SingleFlight:
+    """
+    WHAT IT DOES: Makes concurrent calls for the same key share ONE execution
+
+    EXAMPLE:
+    >>> flight = SingleFlight()
+    >>> flight.do("iphone 15", scrape, "iphone 15")
+    The first caller runs scrape(); callers arriving while it is still
+    running wait for it and receive the same result (or the same error).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        WHAT IT DOES: Runs fn(*args, **kwargs) unless a call for key is already running
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = Future()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn(*args, **kwargs)
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self, key):
+        """
+        WHAT IT DOES: True if a call for this key is running right now
+        """
+
+        with self._lock:
+            return key in self._calls
+
+    def stats(self):
+        """
+        WHAT IT DOES: Returns how many calls ran and how many were shared
+        """
+
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.leaders,
+                "coalesced": self.shared
+            }
@@ -0,0 +1,340 @@
+"""
+================================================================================
+COMPARISON MODULE - comparison.py
+
+EXPLANATION:
+This module answers "what does this product cost on every website?"
+while scraping as little as possible.
+
+How it works:
+1. The search text is normalized ("The  iPhone 15" -> "iphone 15")
+2. For every retailer we look in the memory cache for a recent answer
+3. Retailers missing there are looked up in the database (scrape_results),
+   which survives restarts and is shared by all server processes
+4. Only retailers without a usable answer in either place are scraped
+5. New answers are cached (each retailer with its own TTL) and saved to
+   the database, which also adds them to the price history
+6. If no retailer has the product, estimated prices are filled in
+
+Streaming (iter_comparison):
+- Every retailer's answer is handed out as soon as it is known (cached
+  answers right away, scraped ones as each website answers), followed by
+  a summary with the full comparison; get_comparison() scrapes in the
+  calling thread and only returns that summary
+
+Two extra tricks for busy searches:
+- Single-flight: identical searches arriving together share ONE scrape
+- Stale-while-revalidate: an expired answer is still served right away
+  (with its age) while a background job fetches a fresh one; its requests
+  go through the scheduler's BACKGROUND lane, behind user searches
+
+Why cache per retailer?
+- Some websites change prices more often than others
+- If one retailer's entry expires, we only re-scrape that one website
+
+================================================================================
+"""
+
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from modules.cache import TTLCache, SingleFlight
+from modules.database import save_scrape_results, get_scrape_results
+from modules.rate_limiter import INTERACTIVE, BACKGROUND
+from modules.scraper import (
+    RETAILERS, SCRAPE_DEADLINE, normalize_query, scrape_retailers, add_fallback_prices
+)
+
+
+# How long (seconds) a scraped price is trusted, per retailer
+RETAILER_CACHE_TTL = {
+    "Amazon": 300,
+    "Flipkart": 300,
+    "Snapdeal": 600,
+}
+DEFAULT_CACHE_TTL = 300
+
+# "Not found" answers are kept for a shorter time, the product may show up soon
+NOT_FOUND_CACHE_TTL = 60
+
+# Serve expired answers for up to this long while they are refreshed
+STALE_WHILE_REVALIDATE = True
+STALE_TTL = 1800
+
+# Shared cache: key = (normalized query, retailer), value = comparison entry
+comparison_cache = TTLCache(max_entries=5000, max_bytes=16 * 1024 * 1024, stale_ttl=STALE_TTL)
+
+# Identical scrapes running at the same time are shared
+scrape_flight = SingleFlight()
+
+# Small pool for background refreshes of stale answers
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="refresh")
+
+# Threads that run the scrape of a streamed comparison
+_stream_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="compare-stream")
+
+# A stream stops waiting for scraped answers this long after SCRAPE_DEADLINE
+# (a scrape stuck behind a full _stream_pool must not hang the response)
+STREAM_DEADLINE_MARGIN = 5
+
+
+def retailer_ttl(website, entry):
+    """
+    WHAT IT DOES: Returns how long a retailer's entry may be cached
+    """
+
+    if not entry.get('available', False):
+        return NOT_FOUND_CACHE_TTL
+    return RETAILER_CACHE_TTL.get(website, DEFAULT_CACHE_TTL)
+
+
+def _scrape_and_store(key, product_name, websites, on_result=None, priority=INTERACTIVE):
+    """
+    WHAT IT DOES: Scrapes the given retailers and saves their answers in the cache
+    (on_result(website, entry) is called as each retailer answers)
+    """
+
+    print(f"[SEARCH] Searching for: {product_name} ({', '.join(websites)})")
+    scraped = scrape_retailers(product_name, list(websites), on_result=on_result, priority=priority)
+
+    # Skipped retailers were not asked, failed or timed out: we do not know
+    # whether they have the product, so nothing is remembered (only a real
+    # "not found" is cached, for NOT_FOUND_CACHE_TTL)
+    answered = {website: entry for website, entry in scraped.items() if not entry.get('skipped')}
+
+    for website, entry in answered.items():
+        comparison_cache.set((key, website), dict(entry), ttl=retailer_ttl(website, entry))
+
+    try:
+        save_scrape_results(key, product_name, answered)
+    except Exception as e:
+        # A database problem must not break the search itself
+        print(f"[-] Could not save scrape results: {e}")
+
+    return scraped
+
+
+def _load_from_store(key, websites, allow_stale):
+    """
+    WHAT IT DOES: Copies usable answers from the database into the memory cache
+
+    RETURNS: Number of retailers loaded
+    """
+
+    try:
+        stored = get_scrape_results(key, websites)
+    except Exception as e:
+        print(f"[-] Could not read stored scrape results: {e}")
+        return 0
+
+    loaded = 0
+    for website, (entry, age) in stored.items():
+        ttl = retailer_ttl(website, entry)
+        usable_for = ttl + (STALE_TTL if allow_stale else 0)
+        if age < usable_for:
+            comparison_cache.set((key, website), entry, ttl=ttl, age=age)
+            loaded += 1
+
+    return loaded
+
+
+def fetch_retailers(key, product_name, websites, on_result=None, priority=INTERACTIVE):
+    """
+    WHAT IT DOES: Scrapes retailers, sharing the work with identical searches in flight
+
+    on_result(website, entry) is called as each retailer answers, but only
+    if this call does the scraping (a call that joins a running scrape
+    just gets the full result at the end). priority is the outbound
+    scheduler lane: INTERACTIVE or BACKGROUND
+    """
+
+    websites = tuple(websites)
+    return scrape_flight.do((key, websites), _scrape_and_store, key, product_name, websites, on_result, priority)
+
+
+def _refresh_in_background(key, product_name, websites):
+    """
+    WHAT IT DOES: Re-scrapes stale retailers without making the user wait
+    """
+
+    websites = tuple(websites)
+    if scrape_flight.in_flight((key, websites)):
+        return  # Someone is already refreshing these
+
+    print(f"[CACHE] Refreshing stale prices in background: {product_name}")
+    _refresh_pool.submit(fetch_retailers, key, product_name, websites, None, BACKGROUND)
+
+
+def _read_cache(key, websites, allow_stale, comparison, stale):
+    """
+    WHAT IT DOES: Copies cached answers for the given retailers into comparison
+
+    RETURNS: (retailers not in the cache, age of the oldest answer found)
+    Retailers served from an expired entry are appended to stale.
+    """
+
+    missing = []
+    age = 0.0
+    for website in websites:
+        cached = comparison_cache.get_entry((key, website), allow_stale=allow_stale)
+        if cached is None:
+            missing.append(website)
+            continue
+
+        entry, entry_age, is_stale = cached
+        comparison[website] = dict(entry)
+        age = max(age, entry_age)
+        if is_stale:
+            stale.append(website)
+
+    return missing, age
+
+
+def _given_up(website, product_name):
+    """
+    Result entry for a retailer whose answer did not arrive before the stream deadline
+    """
+    return {
+        "price": None,
+        "link": RETAILERS[website].search_link(product_name),
+        "available": False,
+        "skipped": True
+    }
+
+
+def _stream_scrape(key, product_name, missing):
+    """
+    WHAT IT DOES: Scrapes the missing retailers on _stream_pool and yields
+    (website, entry) as each one answers
+
+    Gives up SCRAPE_DEADLINE + STREAM_DEADLINE_MARGIN seconds after starting:
+    retailers without an answer by then get a _given_up() entry.
+    """
+
+    answers = queue.Queue()
+    job = _stream_pool.submit(
+        fetch_retailers, key, product_name, missing,
+        lambda website, entry: answers.put((website, dict(entry)))
+    )
+    job.add_done_callback(lambda _: answers.put(None))
+    deadline = time.monotonic() + SCRAPE_DEADLINE + STREAM_DEADLINE_MARGIN
+
+    pending = set(missing)
+    while True:
+        try:
+            answer = answers.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            break
+        if answer is None:
+            break
+        website, entry = answer
+        pending.discard(website)
+        yield website, entry
+
+    # Joined a scrape that was already running: its answers come all at once
+    try:
+        scraped = job.result(timeout=max(deadline - time.monotonic(), 0))
+    except FutureTimeout:
+        print(f"[-] No answer within the stream deadline for: {product_name}")
+        scraped = {}
+
+    for website in missing:
+        if website in pending:
+            yield website, dict(scraped[website]) if website in scraped else _given_up(website, product_name)
+
+
+def iter_comparison(product_name, allow_stale=STALE_WHILE_REVALIDATE, stream=True):
+    """
+    WHAT IT DOES: Builds the price comparison for a product, handing out
+    every retailer's answer as soon as it is known
+
+    PARAMETERS:
+    - product_name: What the user searched for
+    - allow_stale: Serve expired answers right away and refresh them in the background
+    - stream: Hand out scraped answers one by one (scrapes on _stream_pool);
+      False scrapes in the calling thread and hands them out at the end
+
+    YIELDS: Dictionaries, in this order:
+    - {"type": "retailer", "website", "result", "source"} once per retailer;
+      source is "cache" (memory or database) or "live" (just scraped)
+    - {"type": "summary", "comparison", "age", "stale"} at the end, with
+      the same values get_comparison() returns
+    """
+
+    key = normalize_query(product_name)
+
+    # Step 1: Read every retailer from the memory cache,
+    # falling back to the database for the ones it does not have
+    comparison = {}
+    stale = []
+    missing, age = _read_cache(key, list(RETAILERS), allow_stale, comparison, stale)
+
+    if missing and _load_from_store(key, missing, allow_stale):
+        missing, store_age = _read_cache(key, missing, allow_stale, comparison, stale)
+        age = max(age, store_age)
+
+    for website in RETAILERS:
+        if website in comparison:
+            yield {"type": "retailer", "website": website, "result": dict(comparison[website]), "source": "cache"}
+
+    # Step 2: Scrape only the retailers we have no usable answer for,
+    # passing on each answer as it arrives
+    if missing:
+        if stream:
+            scraped = _stream_scrape(key, product_name, missing)
+        else:
+            result = fetch_retailers(key, product_name, missing)
+            scraped = ((website, dict(result[website])) for website in missing)
+
+        for website, entry in scraped:
+            comparison[website] = entry
+            yield {"type": "retailer", "website": website, "result": dict(entry), "source": "live"}
+    else:
+        print(f"[CACHE] Serving cached prices for: {product_name}")
+
+    # Step 3: Stale answers were served as-is, refresh them for the next user
+    if stale:
+        _refresh_in_background(key, product_name, stale)
+
+    # Keep retailer order stable for the frontend
+    comparison = {website: comparison[website] for website in RETAILERS if website in comparison}
+
+    # Step 4: Estimated prices if nothing was found anywhere
+    yield {
+        "type": "summary",
+        "comparison": add_fallback_prices(comparison, product_name),
+        "age": round(age, 1),
+        "stale": bool(stale)
+    }
+
+
+def get_comparison(product_name, allow_stale=STALE_WHILE_REVALIDATE):
+    """
+    WHAT IT DOES: Returns the price comparison for a product, using the cache
+
+    PARAMETERS:
+    - product_name: What the user searched for
+    - allow_stale: Serve expired answers right away and refresh them in the background
+
+    RETURNS: (comparison, age, stale)
+    - comparison: {website: {"price", "link", "available", ...}} in the same
+      shape as scrape_all_websites()
+    - age: Seconds since the OLDEST price in the comparison was scraped
+    - stale: True if at least one price is past its TTL
+    """
+
+    # Nobody reads the answers one by one here: scrape in this thread
+    for event in iter_comparison(product_name, allow_stale, stream=False):
+        if event["type"] == "summary":
+            return event["comparison"], event["age"], event["stale"]
+
+
+def get_cache_stats():
+    """
+    WHAT IT DOES: Returns the comparison cache and single-flight counters
+    """
+
+    stats = comparison_cache.stats()
+    stats["single_flight"] = scrape_flight.stats()
+    return stats
@@ -28,24 +28,117 @@ Why use a database?
 
 import sqlite3
 from datetime import datetime
+import argparse
+import csv
+import hashlib
 import os
+import threading
+import time
+
+import pandas as pd
 
 # Path where the database file will be created
 DATABASE_PATH = "price_comparison.db"
 
 
+# ============================================================================
+# CONNECTION MANAGER
+# ============================================================================
+# Opening a SQLite connection is slow compared to a small query, so we no
+# longer connect and close on every call. Instead every thread (FastAPI runs
+# our sync endpoints in a pool of threads) keeps ONE connection open and
+# reuses it. A connection is only ever used by the thread that opened it.
+#
+# Settings applied to every connection:
+# - WAL journal: readers never wait for a writer (and vice versa)
+# - synchronous=NORMAL: safe with WAL, far fewer disk syncs per commit
+# - cache_size / mmap_size: keep hot pages in memory
+# - cached_statements: SQL text is compiled once per connection and reused
+
+CONNECTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -32000,        # negative = KiB, so about 32 MB per connection
+    "mmap_size": 268435456,      # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,        # wait up to 5 s for a lock instead of failing
+}
+
+# How many compiled SQL statements each connection keeps for reuse
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_open_connections = []
+_open_connections_lock = threading.Lock()
+
+# Bumped by close_connections() so threads know their connection was closed
+_generation = 0
+
+
+def get_connection():
+    """
+    WHAT IT DOES: Returns this thread's database connection (opens it on first use)
+    
+    EXPLANATION:
+    - Each thread gets its own connection, so threads never share one
+    - The same connection is reused for every query the thread runs
+    - Use "with connection:" around writes: it commits, or rolls back on error
+    """
+    
+    connection = getattr(_local, "connection", None)
+    if (connection is not None and _local.path == DATABASE_PATH
+            and _local.generation == _generation):
+        return connection
+    
+    connection = sqlite3.connect(
+        DATABASE_PATH,
+        timeout=30,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False  # Only so close_connections() may close it
+    )
+    for name, value in CONNECTION_PRAGMAS.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    
+    _local.connection = connection
+    _local.path = DATABASE_PATH
+    _local.generation = _generation
+    with _open_connections_lock:
+        _open_connections.append(connection)
+    
+    return connection
+
+
+def close_connections():
+    """
+    WHAT IT DOES: Closes every open connection (call when the app shuts down)
+    """
+    
+    global _generation
+    
+    with _open_connections_lock:
+        _generation += 1
+        for connection in _open_connections:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+        _open_connections.clear()
+    
+    _local.connection = None
+
+
 def initialize_database():
     """
     WHAT IT DOES: Creates database tables when the program first runs
     
     EXPLANATION:
     - Connects to SQLite database (creates it if doesn't exist)
-    - Creates 3 tables: products, prices, and predictions
+    - Creates the tables: products, prices, predictions and scrape_results
     - If tables already exist, this function does nothing
     """
     
     # Connect to database (creates file if it doesn't exist)
-    connection = sqlite3.connect(DATABASE_PATH)
+    connection = get_connection()
     cursor = connection.cursor()
     
     # Table 1: PRODUCTS
@@ -55,7 +148,8 @@ def initialize_database():
             product_id INTEGER PRIMARY KEY,
             product_name TEXT NOT NULL,
             category TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            query_key TEXT
         )
     """)
     
@@ -84,16 +178,276 @@ def initialize_database():
             predicted_date DATE NOT NULL,
             model_accuracy REAL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            model TEXT,
+            FOREIGN KEY (product_id) REFERENCES products(product_id)
+        )
+    """)
+    
+    # Table 4: SCRAPE_RESULTS
+    # Latest scraped answer per (normalized search, website)
+    # Lets every worker process (and a restarted server) reuse recent scrapes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_results (
+            query_key TEXT NOT NULL,
+            website TEXT NOT NULL,
+            price REAL,
+            website_link TEXT,
+            available INTEGER NOT NULL,
+            product_id INTEGER,
+            scraped_at REAL NOT NULL,
+            PRIMARY KEY (query_key, website),
             FOREIGN KEY (product_id) REFERENCES products(product_id)
         )
     """)
     
+    # Table 5: INGEST_LOG
+    # Remembers which data files were already loaded (size + checksum),
+    # so restarting the app does not load the same file again
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_log (
+            source TEXT PRIMARY KEY,
+            file_size INTEGER NOT NULL,
+            checksum TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Table 6: DAILY_PRICE_STATS
+    # Sum and count of prices per product per day (the model trains on the
+    # DAILY AVERAGE price, so we need these to update it incrementally)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_price_stats (
+            product_id INTEGER NOT NULL,
+            recorded_date DATE NOT NULL,
+            price_sum REAL NOT NULL,
+            price_count INTEGER NOT NULL,
+            PRIMARY KEY (product_id, recorded_date)
+        )
+    """)
+    
+    # Table 7: PRICE_MODEL_STATS
+    # Running sums of the linear trend per product (x = day, y = daily average)
+    # Enough to compute slope, intercept, R² and RMSE without reading history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS price_model_stats (
+            product_id INTEGER PRIMARY KEY,
+            origin_day INTEGER NOT NULL,
+            n_records INTEGER NOT NULL,
+            n_days INTEGER NOT NULL,
+            sum_x REAL NOT NULL,
+            sum_y REAL NOT NULL,
+            sum_xx REAL NOT NULL,
+            sum_xy REAL NOT NULL,
+            sum_yy REAL NOT NULL,
+            first_x INTEGER NOT NULL,
+            last_x INTEGER NOT NULL
+        )
+    """)
+    
+    # Table 8: MODEL_ARTIFACTS
+    # Trained model per product and model type (parameters as JSON),
+    # with the price history version it was trained on
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS model_artifacts (
+            product_id INTEGER NOT NULL,
+            model_type TEXT NOT NULL,
+            data_version TEXT NOT NULL,
+            artifact TEXT NOT NULL,
+            trained_at REAL NOT NULL,
+            PRIMARY KEY (product_id, model_type)
+        )
+    """)
+    
     # Save all changes to database
     connection.commit()
-    connection.close()
+    
+    # Older databases may hold the same price many times (it used to be
+    # re-inserted on every restart). Keep one row per product/website/day.
+    migrate_unique_prices()
+    
+    # Same for predictions: one per product and predicted date
+    migrate_unique_predictions()
+    
+    # Columns added after the first release (UNIQUE index on query_key is
+    # created with the other indexes below)
+    add_missing_column("products", "query_key", "TEXT")
+    add_missing_column("predictions", "model", "TEXT")
+    
+    # Indexes for the lookups the API runs most (also added to old databases)
+    migrate_indexes()
+    
+    # Databases from before the running model statistics existed
+    has_stats = connection.execute("SELECT 1 FROM price_model_stats LIMIT 1").fetchone()
+    has_prices = connection.execute("SELECT 1 FROM prices LIMIT 1").fetchone()
+    if has_prices and not has_stats:
+        rebuild_model_stats()
+    
     print("[+] Database initialized successfully!")
 
 
+def migrate_unique_prices():
+    """
+    WHAT IT DOES: Makes (product_id, website, recorded_date) unique in prices
+    
+    EXPLANATION:
+    - Removes duplicate rows, keeping the most recently inserted one
+    - Creates a UNIQUE index so duplicates can never come back
+    - Does nothing if the index already exists
+    """
+    
+    connection = get_connection()
+    
+    exists = connection.execute("""
+        SELECT 1 FROM sqlite_master
+        WHERE type = 'index' AND name = 'idx_prices_unique_day'
+    """).fetchone()
+    if exists:
+        return
+    
+    with connection:
+        removed = connection.execute("""
+            DELETE FROM prices
+            WHERE price_id NOT IN (
+                SELECT MAX(price_id) FROM prices
+                GROUP BY product_id, website, recorded_date
+            )
+        """).rowcount
+        
+        connection.execute("""
+            CREATE UNIQUE INDEX idx_prices_unique_day
+            ON prices (product_id, website, recorded_date)
+        """)
+    
+    if removed:
+        print(f"[+] Removed {removed} duplicate price rows")
+
+
+def migrate_unique_predictions():
+    """
+    WHAT IT DOES: Makes (product_id, predicted_date) unique in predictions
+    
+    EXPLANATION:
+    - Every prediction used to be appended, so recomputing a forecast
+      (API call, forecast worker, nightly batch) added one more row each time
+    - Keeps the most recently inserted prediction per product and date
+    - Creates a UNIQUE index so predictions are upserted from now on
+    - Does nothing if the index already exists
+    """
+    
+    connection = get_connection()
+    
+    exists = connection.execute("""
+        SELECT 1 FROM sqlite_master
+        WHERE type = 'index' AND name = 'idx_predictions_unique_day'
+    """).fetchone()
+    if exists:
+        return
+    
+    with connection:
+        removed = connection.execute("""
+            DELETE FROM predictions
+            WHERE prediction_id NOT IN (
+                SELECT MAX(prediction_id) FROM predictions
+                GROUP BY product_id, predicted_date
+            )
+        """).rowcount
+        
+        connection.execute("""
+            CREATE UNIQUE INDEX idx_predictions_unique_day
+            ON predictions (product_id, predicted_date)
+        """)
+    
+    if removed:
+        print(f"[+] Removed {removed} duplicate predictions")
+
+
+def add_missing_column(table, column, column_type):
+    """
+    WHAT IT DOES: Adds a column to a table of an older database (if missing)
+    """
+    
+    connection = get_connection()
+    
+    columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        with connection:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+# ============================================================================
+# PRODUCTS CREATED BY LIVE SEARCHES
+# ============================================================================
+# A search for a product that is not in the catalogue creates a product,
+# so its scraped prices build up a price history. Those products:
+# - are found by query_key, the normalized search ("The iPhone 15" and
+#   "iphone 15" are the same product), with a UNIQUE index on it
+# - get ids from SEARCHED_PRODUCT_ID_START upwards, far above the ids of
+#   the CSV catalogue, so a CSV loaded later never overwrites them
+
+SEARCHED_PRODUCT_ID_START = 1_000_000_000
+
+
+# ============================================================================
+# INDEXES
+# ============================================================================
+# Without an index, "all prices of product 7" reads EVERY row of the table.
+# An index is a sorted copy of a few columns that lets SQLite jump straight
+# to the matching rows. A "covering" index also contains every column the
+# query returns, so SQLite never has to visit the table itself.
+#
+# - idx_prices_product_date: get_product_prices (filter by product, newest
+#   date first) and get_prices_for_date (filter by product + date)
+# - idx_predictions_product_date: get_predictions (filter by product,
+#   ordered by predicted date)
+# - idx_products_query_key: find_or_create_product (UNIQUE, so one search
+#   can only ever create one product; catalogue products have no key)
+
+INDEXES = {
+    "idx_prices_product_date": """
+        CREATE INDEX IF NOT EXISTS idx_prices_product_date
+        ON prices (product_id, recorded_date, website, price, website_link)
+    """,
+    "idx_predictions_product_date": """
+        CREATE INDEX IF NOT EXISTS idx_predictions_product_date
+        ON predictions (product_id, predicted_date, predicted_price, model_accuracy)
+    """,
+    "idx_products_query_key": """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_products_query_key
+        ON products (query_key)
+    """,
+}
+
+
+def migrate_indexes():
+    """
+    WHAT IT DOES: Creates any missing index (safe to run on every start)
+    
+    EXPLANATION:
+    - New and existing database files get the same indexes
+    - Indexes that already exist are left alone
+    - ANALYZE (via PRAGMA optimize) helps SQLite pick the best index
+    """
+    
+    connection = get_connection()
+    
+    existing = {
+        row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+    missing = [name for name in INDEXES if name not in existing]
+    if not missing:
+        return
+    
+    with connection:
+        for name in missing:
+            connection.execute(INDEXES[name])
+    
+    connection.execute("PRAGMA optimize")
+    print(f"[+] Created indexes: {', '.join(missing)}")
+
+
 def add_product(product_id, product_name, category):
     """
     WHAT IT DOES: Adds a new product to the database
@@ -104,27 +458,56 @@ def add_product(product_id, product_name, category):
     - category: Category of the product (e.g., "Electronics")
     """
     
-    connection = sqlite3.connect(DATABASE_PATH)
-    cursor = connection.cursor()
+    connection = get_connection()
     
     try:
-        cursor.execute("""
-            INSERT INTO products (product_id, product_name, category)
-            VALUES (?, ?, ?)
-        """, (product_id, product_name, category))
+        with connection:
+            connection.execute("""
+                INSERT INTO products (product_id, product_name, category)
+                VALUES (?, ?, ?)
+            """, (product_id, product_name, category))
         
-        connection.commit()
         return True
     except sqlite3.IntegrityError:
         # Product already exists, no problem
         return False
-    finally:
-        connection.close()
+
+
+# One price per product, website and day: inserting the same day again
+# updates the existing row (and does nothing if nothing changed)
+UPSERT_PRICE_SQL = """
+    INSERT INTO prices (product_id, website, price, website_link, recorded_date)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(product_id, website, recorded_date) DO UPDATE SET
+        price = excluded.price,
+        website_link = excluded.website_link
+    WHERE price != excluded.price
+       OR website_link IS NOT excluded.website_link
+"""
+
+
+def upsert_price(cursor, product_id, website, price, website_link, recorded_date):
+    """
+    WHAT IT DOES: Inserts/updates one price AND updates the running model sums
+    
+    Runs inside the caller's transaction, so the price and the statistics
+    are always saved together.
+    """
+    
+    old = cursor.execute("""
+        SELECT price FROM prices
+        WHERE product_id = ? AND website = ? AND recorded_date = ?
+    """, (product_id, website, recorded_date)).fetchone()
+    
+    cursor.execute(UPSERT_PRICE_SQL, (product_id, website, price, website_link, recorded_date))
+    
+    update_model_stats(cursor, product_id, recorded_date, price, old[0] if old else None)
 
 
 def add_price(product_id, website, price, recorded_date, website_link=None):
     """
     WHAT IT DOES: Adds a price record for a product from a website
+    (if that website already has a price for that day, it is updated instead)
     
     PARAMETERS:
     - product_id: Which product this price belongs to
@@ -134,16 +517,206 @@ def add_price(product_id, website, price, recorded_date, website_link=None):
     - website_link: Full URL/link to the product on the website
     """
     
-    connection = sqlite3.connect(DATABASE_PATH)
-    cursor = connection.cursor()
+    connection = get_connection()
     
-    cursor.execute("""
-        INSERT INTO prices (product_id, website, price, website_link, recorded_date)
-        VALUES (?, ?, ?, ?, ?)
-    """, (product_id, website, price, website_link, recorded_date))
+    with connection:
+        upsert_price(connection.cursor(), product_id, website, price, website_link, recorded_date)
+
+
+# ============================================================================
+# RUNNING MODEL STATISTICS
+# ============================================================================
+# A straight-line fit only needs six numbers per product:
+#   n (number of days), Σx, Σy, Σx², Σxy, Σy²
+# where x = day number and y = that day's average price.
+# When one price arrives we can update these sums in O(1): no need to read
+# the product's whole history again. See estimators.OnlineLinearTrend for
+# how slope, intercept, R² and RMSE are computed from them.
+#
+# x is counted from a fixed "origin" day per product (its first day seen),
+# which keeps the numbers small and the sums accurate.
+
+
+def _day_number(cursor, recorded_date):
+    # Whole day number of a YYYY-MM-DD date (same numbering as rebuild_model_stats)
+    return cursor.execute("SELECT CAST(julianday(?) AS INTEGER)", (recorded_date,)).fetchone()[0]
+
+
+def update_model_stats(cursor, product_id, recorded_date, price, old_price=None):
+    """
+    WHAT IT DOES: Updates a product's running sums for one new/changed price
     
-    connection.commit()
-    connection.close()
+    PARAMETERS:
+    - price: The price just saved
+    - old_price: The price it replaced (same product, website and day), or None
+    """
+    
+    if old_price is not None and old_price == price:
+        return
+    
+    new_record = 1 if old_price is None else 0
+    
+    # Step 1: Update the day's sum and count -> old and new daily average
+    daily = cursor.execute("""
+        SELECT price_sum, price_count FROM daily_price_stats
+        WHERE product_id = ? AND recorded_date = ?
+    """, (product_id, recorded_date)).fetchone()
+    
+    if daily:
+        old_mean = daily[0] / daily[1]
+        price_sum = daily[0] + price - (old_price or 0)
+        price_count = daily[1] + new_record
+        cursor.execute("""
+            UPDATE daily_price_stats SET price_sum = ?, price_count = ?
+            WHERE product_id = ? AND recorded_date = ?
+        """, (price_sum, price_count, product_id, recorded_date))
+    else:
+        old_mean = None
+        price_sum, price_count = price, 1
+        cursor.execute("""
+            INSERT INTO daily_price_stats (product_id, recorded_date, price_sum, price_count)
+            VALUES (?, ?, ?, ?)
+        """, (product_id, recorded_date, price_sum, price_count))
+    
+    new_mean = price_sum / price_count
+    
+    # Step 2: Update the product's running sums
+    day = _day_number(cursor, recorded_date)
+    stats = cursor.execute("""
+        SELECT origin_day FROM price_model_stats WHERE product_id = ?
+    """, (product_id,)).fetchone()
+    
+    if not stats:
+        cursor.execute("""
+            INSERT INTO price_model_stats
+                (product_id, origin_day, n_records, n_days, sum_x, sum_y,
+                 sum_xx, sum_xy, sum_yy, first_x, last_x)
+            VALUES (?, ?, 1, 1, 0, ?, 0, 0, ?, 0, 0)
+        """, (product_id, day, new_mean, new_mean * new_mean))
+        return
+    
+    x = day - stats[0]
+    
+    if old_mean is None:
+        # A new day: one more point on the line
+        cursor.execute("""
+            UPDATE price_model_stats SET
+                n_records = n_records + 1,
+                n_days = n_days + 1,
+                sum_x = sum_x + ?,
+                sum_y = sum_y + ?,
+                sum_xx = sum_xx + ?,
+                sum_xy = sum_xy + ?,
+                sum_yy = sum_yy + ?,
+                first_x = MIN(first_x, ?),
+                last_x = MAX(last_x, ?)
+            WHERE product_id = ?
+        """, (x, new_mean, x * x, x * new_mean, new_mean * new_mean, x, x, product_id))
+    else:
+        # An existing day whose average price moved from old_mean to new_mean
+        change = new_mean - old_mean
+        cursor.execute("""
+            UPDATE price_model_stats SET
+                n_records = n_records + ?,
+                sum_y = sum_y + ?,
+                sum_xy = sum_xy + ?,
+                sum_yy = sum_yy + ?
+            WHERE product_id = ?
+        """, (new_record, change, x * change, new_mean * new_mean - old_mean * old_mean, product_id))
+
+
+def rebuild_model_stats():
+    """
+    WHAT IT DOES: Recomputes all running sums from the prices table
+    
+    USE CASE: To upgrade an older database (bulk loads only recompute the
+    products they touched, see recompute_model_stats). Done with a few
+    set-based SQL statements.
+    """
+    
+    connection = get_connection()
+    
+    with connection:
+        recompute_model_stats(connection.cursor())
+
+
+def recompute_model_stats(cursor, product_ids=None):
+    """
+    WHAT IT DOES: Recomputes the running sums of some products (or all)
+    from the prices table
+    
+    PARAMETERS:
+    - cursor: Runs inside the caller's transaction, so the prices and the
+      statistics are always saved together
+    - product_ids: Products to recompute (None = every product)
+    
+    The ids go into a temporary table, so any number of products costs
+    a few SQL statements and only their own rows are read.
+    """
+    
+    if product_ids is None:
+        where = ""
+    else:
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS stats_products (product_id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.stats_products")
+        cursor.executemany("INSERT OR IGNORE INTO temp.stats_products (product_id) VALUES (?)",
+                           ((int(product_id),) for product_id in product_ids))
+        where = "WHERE product_id IN (SELECT product_id FROM temp.stats_products)"
+    
+    cursor.execute(f"DELETE FROM daily_price_stats {where}")
+    cursor.execute(f"""
+        INSERT INTO daily_price_stats (product_id, recorded_date, price_sum, price_count)
+        SELECT product_id, recorded_date, SUM(price), COUNT(*)
+        FROM prices
+        {where}
+        GROUP BY product_id, recorded_date
+    """)
+    
+    cursor.execute(f"DELETE FROM price_model_stats {where}")
+    cursor.execute(f"""
+        INSERT INTO price_model_stats
+            (product_id, origin_day, n_records, n_days, sum_x, sum_y,
+             sum_xx, sum_xy, sum_yy, first_x, last_x)
+        SELECT product_id, origin_day, SUM(price_count), COUNT(*),
+               SUM(x), SUM(y), SUM(x * x), SUM(x * y), SUM(y * y), 0, MAX(x)
+        FROM (
+            SELECT d.product_id AS product_id,
+                   o.origin_day AS origin_day,
+                   d.price_count AS price_count,
+                   CAST(julianday(d.recorded_date) AS INTEGER) - o.origin_day AS x,
+                   d.price_sum / d.price_count AS y
+            FROM daily_price_stats d
+            JOIN (
+                SELECT product_id, MIN(CAST(julianday(recorded_date) AS INTEGER)) AS origin_day
+                FROM daily_price_stats
+                {where}
+                GROUP BY product_id
+            ) o ON o.product_id = d.product_id
+        )
+        GROUP BY product_id
+    """)
+
+
+def get_model_stats(product_id):
+    """
+    WHAT IT DOES: Returns a product's running model sums (or None)
+    """
+    
+    connection = get_connection()
+    
+    row = connection.execute("""
+        SELECT origin_day, n_records, n_days, sum_x, sum_y, sum_xx, sum_xy,
+               sum_yy, first_x, last_x
+        FROM price_model_stats
+        WHERE product_id = ?
+    """, (product_id,)).fetchone()
+    
+    if not row:
+        return None
+    
+    keys = ["origin_day", "n_records", "n_days", "sum_x", "sum_y", "sum_xx",
+            "sum_xy", "sum_yy", "first_x", "last_x"]
+    return dict(zip(keys, row))
 
 
 def get_product_prices(product_id):
@@ -153,7 +726,7 @@ def get_product_prices(product_id):
     RETURNS: List of dictionaries with price information including links
     """
     
-    connection = sqlite3.connect(DATABASE_PATH)
+    connection = get_connection()
     cursor = connection.cursor()
     
     cursor.execute("""
@@ -163,7 +736,6 @@ def get_product_prices(product_id):
     """, (product_id,))
     
     rows = cursor.fetchall()
-    connection.close()
     
     # Convert to list of dictionaries for easier use
     prices = [
@@ -179,6 +751,98 @@ def get_product_prices(product_id):
     return prices
 
 
+def get_price_history_version(product_id):
+    """
+    WHAT IT DOES: Returns a "fingerprint" of a product's price history
+    
+    RETURNS: (number of rows, highest price_id, sum of prices)
+    
+    EXPLANATION:
+    - Any new row changes the count and highest price_id
+    - An updated price (same product, website and day) changes the sum
+    - Read straight from the covering index, much cheaper than loading rows
+    - Used to know whether a cached model is still up to date
+    """
+    
+    connection = get_connection()
+    
+    row = connection.execute("""
+        SELECT COUNT(*), COALESCE(MAX(price_id), 0), TOTAL(price)
+        FROM prices
+        WHERE product_id = ?
+    """, (product_id,)).fetchone()
+    
+    return tuple(row)
+
+
+def get_price_history_versions():
+    """
+    WHAT IT DOES: Returns the history fingerprint of EVERY product at once
+    
+    RETURNS: {product_id: (number of rows, highest price_id, sum of prices)}
+    Same values as get_price_history_version(), in one grouped query.
+    """
+    
+    connection = get_connection()
+    
+    rows = connection.execute("""
+        SELECT product_id, COUNT(*), COALESCE(MAX(price_id), 0), TOTAL(price)
+        FROM prices
+        GROUP BY product_id
+    """).fetchall()
+    
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+
+def get_price_columns(product_ids=None):
+    """
+    WHAT IT DOES: Reads the price rows AND history versions of some products
+    from ONE consistent snapshot of the database
+    
+    PARAMETERS:
+    - product_ids: Products to read (None = all products)
+    
+    RETURNS: (versions, rows)
+    - versions: {product_id: (count, highest price_id, sum of prices)}
+    - rows: List of (product_id, day number since 1970-01-01, website, price)
+    
+    USE CASE: (Re)building the columnar history store (history_store.py).
+    Both queries run in one read transaction, so the versions always
+    describe exactly the rows returned.
+    """
+    
+    connection = get_connection()
+    
+    if product_ids is None:
+        where, chunks = "", [()]
+    else:
+        product_ids = list(product_ids)
+        # SQLite limits the number of ? in one statement
+        chunks = [product_ids[i:i + 500] for i in range(0, len(product_ids), 500)]
+    
+    versions = {}
+    rows = []
+    with connection:
+        connection.execute("BEGIN")
+        for chunk in chunks:
+            if product_ids is not None:
+                where = f"WHERE product_id IN ({', '.join('?' for _ in chunk)})"
+            
+            for row in connection.execute(f"""
+                SELECT product_id, COUNT(*), COALESCE(MAX(price_id), 0), TOTAL(price)
+                FROM prices {where}
+                GROUP BY product_id
+            """, chunk):
+                versions[row[0]] = tuple(row[1:])
+            
+            rows.extend(connection.execute(f"""
+                SELECT product_id, CAST(julianday(recorded_date) AS INTEGER) - 2440587, website, price
+                FROM prices {where}
+            """, chunk))
+    
+    return versions, rows
+
+
 def get_prices_for_date(product_id, date):
     """
     WHAT IT DOES: Gets prices for a specific product on a specific date
@@ -186,7 +850,7 @@ def get_prices_for_date(product_id, date):
     RETURNS: Dictionary with website and prices
     """
     
-    connection = sqlite3.connect(DATABASE_PATH)
+    connection = get_connection()
     cursor = connection.cursor()
     
     cursor.execute("""
@@ -195,7 +859,6 @@ def get_prices_for_date(product_id, date):
     """, (product_id, date))
     
     rows = cursor.fetchall()
-    connection.close()
     
     return {row[0]: row[1] for row in rows}
 
@@ -207,12 +870,11 @@ def get_all_products():
     RETURNS: List of all products
     """
     
-    connection = sqlite3.connect(DATABASE_PATH)
+    connection = get_connection()
     cursor = connection.cursor()
     
     cursor.execute("SELECT product_id, product_name, category FROM products")
     rows = cursor.fetchall()
-    connection.close()
     
     products = [
         {
@@ -226,27 +888,93 @@ def get_all_products():
     return products
 
 
-def save_prediction(product_id, predicted_price, predicted_date, model_accuracy):
+# One prediction per product and predicted date: saving the same date again
+# replaces the earlier prediction (and the model that made it)
+UPSERT_PREDICTION_SQL = """
+    INSERT INTO predictions (product_id, predicted_price, predicted_date, model_accuracy, model)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(product_id, predicted_date) DO UPDATE SET
+        predicted_price = excluded.predicted_price,
+        model_accuracy = excluded.model_accuracy,
+        model = excluded.model,
+        created_at = CURRENT_TIMESTAMP
+"""
+
+
+def save_prediction(product_id, predicted_price, predicted_date, model_accuracy, model=None):
     """
     WHAT IT DOES: Saves ML model's price prediction to database
+    (replaces an earlier prediction of the same product for the same date)
     
     PARAMETERS:
     - product_id: Which product is being predicted
     - predicted_price: What the model predicts the price will be
     - predicted_date: On what date this price is predicted
     - model_accuracy: How accurate the model is (0-100 scale)
+    - model: Name of the model that made it (e.g. "linear", "seasonal", "online")
     """
     
-    connection = sqlite3.connect(DATABASE_PATH)
-    cursor = connection.cursor()
+    connection = get_connection()
     
-    cursor.execute("""
-        INSERT INTO predictions (product_id, predicted_price, predicted_date, model_accuracy)
-        VALUES (?, ?, ?, ?)
-    """, (product_id, predicted_price, predicted_date, model_accuracy))
+    with connection:
+        connection.execute(UPSERT_PREDICTION_SQL,
+                           (product_id, predicted_price, predicted_date, model_accuracy, model))
+
+
+def upsert_prediction(product_id, predicted_price, predicted_date, model_accuracy, model=None):
+    """
+    WHAT IT DOES: Saves a prediction, replacing any earlier prediction of
+    the same product for the same date
     
-    connection.commit()
-    connection.close()
+    USE CASE: Forecasts that are recomputed again and again (see
+    forecast_worker.py) keep one row per product and date instead of
+    adding a row every time
+    """
+    
+    save_prediction(product_id, predicted_price, predicted_date, model_accuracy, model)
+
+
+def save_predictions_bulk(predictions):
+    """
+    WHAT IT DOES: Saves many predictions at once (one executemany, one commit)
+    
+    PARAMETERS:
+    - predictions: List of (product_id, predicted_price, predicted_date,
+      model_accuracy, model)
+    
+    Upserted like save_prediction(): running the batch every night replaces
+    the predictions of the last run for the same dates instead of adding rows.
+    """
+    
+    connection = get_connection()
+    
+    with connection:
+        connection.executemany(UPSERT_PREDICTION_SQL, predictions)
+    
+    return len(predictions)
+
+
+def get_all_price_points():
+    """
+    WHAT IT DOES: Reads EVERY price row in one query, as columns
+    
+    RETURNS: Dictionary of equally long lists:
+    - product_id, date (YYYY-MM-DD) and price
+    
+    USE CASE: Training all products at once (see batch_forecast.py)
+    """
+    
+    connection = get_connection()
+    
+    rows = connection.execute("""
+        SELECT product_id, recorded_date, price FROM prices
+    """).fetchall()
+    
+    if not rows:
+        return {"product_id": [], "date": [], "price": []}
+    
+    product_ids, dates, prices = zip(*rows)
+    return {"product_id": list(product_ids), "date": list(dates), "price": list(prices)}
 
 
 def get_predictions(product_id):
@@ -256,24 +984,24 @@ def get_predictions(product_id):
     RETURNS: List of predictions
     """
     
-    connection = sqlite3.connect(DATABASE_PATH)
+    connection = get_connection()
     cursor = connection.cursor()
     
     cursor.execute("""
-        SELECT predicted_price, predicted_date, model_accuracy
+        SELECT predicted_price, predicted_date, model_accuracy, model
         FROM predictions
         WHERE product_id = ?
         ORDER BY predicted_date DESC
     """, (product_id,))
     
     rows = cursor.fetchall()
-    connection.close()
     
     predictions = [
         {
             "predicted_price": row[0],
             "predicted_date": row[1],
-            "model_accuracy": row[2]
+            "model_accuracy": row[2],
+            "model": row[3]
         }
         for row in rows
     ]
@@ -281,5 +1009,388 @@ def get_predictions(product_id):
     return predictions
 
 
+def find_or_create_product(query_key, product_name, category="Searched"):
+    """
+    WHAT IT DOES: Finds the product of a search, or adds it
+    
+    PARAMETERS:
+    - query_key: Normalized search text (e.g., "iphone 15"), the same key
+      the comparison cache and scrape_results use
+    - product_name: Name as the user typed it (e.g., "The iPhone 15"),
+      saved if the product has to be created
+    - category: Category used if the product has to be created
+    
+    RETURNS: product_id of the existing or new product
+    
+    New products get the next id in the searched product range (see
+    SEARCHED_PRODUCT_ID_START). The id is picked and the row inserted in
+    ONE statement, so two processes creating products at the same time
+    cannot pick the same id.
+    """
+    
+    connection = get_connection()
+    
+    with connection:
+        row = connection.execute("""
+            SELECT product_id FROM products WHERE query_key = ?
+        """, (query_key,)).fetchone()
+        if row:
+            return row[0]
+        
+        connection.execute("""
+            INSERT INTO products (product_id, product_name, category, query_key)
+            SELECT COALESCE(MAX(product_id) + 1, ?), ?, ?, ?
+            FROM products WHERE product_id >= ?
+            ON CONFLICT(query_key) DO NOTHING
+        """, (SEARCHED_PRODUCT_ID_START, product_name.strip(), category, query_key,
+              SEARCHED_PRODUCT_ID_START))
+        
+        return connection.execute("""
+            SELECT product_id FROM products WHERE query_key = ?
+        """, (query_key,)).fetchone()[0]
+
+
+def save_scrape_results(query_key, product_name, results):
+    """
+    WHAT IT DOES: Stores freshly scraped prices so they survive a restart
+    
+    PARAMETERS:
+    - query_key: Normalized search text (e.g., "iphone 15")
+    - product_name: Search text as the user typed it
+    - results: {website: {"price", "link", "available"}} from the scraper
+    
+    EXPLANATION:
+    - Every website's REAL answer is saved in scrape_results (one row per
+      search + website): a price, or "not found" after the page was read
+    - Failures, timeouts and skipped retailers (entries marked "skipped") and
+      estimated prices are never saved: loaded back after a restart they
+      would look like real answers
+    - Real prices that were found are ALSO added to the prices table, so every
+      live search grows the price history used for predictions
+    - Only one price per product, website and day is kept in the history
+    """
+    
+    results = {
+        website: data for website, data in results.items()
+        if not data.get('skipped') and not data.get('estimated')
+    }
+    if not results:
+        return None
+    
+    found = {
+        website: data for website, data in results.items()
+        if data.get('available') and not data.get('estimated') and data.get('price') is not None
+    }
+    product_id = find_or_create_product(query_key, product_name) if found else None
+    
+    scraped_at = time.time()
+    today = datetime.now().strftime("%Y-%m-%d")
+    
+    connection = get_connection()
+    
+    with connection:
+        cursor = connection.cursor()
+        
+        cursor.executemany("""
+            INSERT OR REPLACE INTO scrape_results
+                (query_key, website, price, website_link, available, product_id, scraped_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (query_key, website, data.get('price'), data.get('link'),
+             1 if data.get('available') else 0,
+             product_id if website in found else None, scraped_at)
+            for website, data in results.items()
+        ])
+        
+        # Feed the price history (today's price per website)
+        for website, data in found.items():
+            upsert_price(cursor, product_id, website, data['price'], data['link'], today)
+    
+    return product_id
+
+
+def get_scrape_results(query_key, websites):
+    """
+    WHAT IT DOES: Reads stored scrape answers for a search
+    
+    RETURNS: {website: (entry, age_in_seconds)} for the websites we have stored
+    """
+    
+    if not websites:
+        return {}
+    
+    connection = get_connection()
+    cursor = connection.cursor()
+    
+    placeholders = ", ".join("?" for _ in websites)
+    cursor.execute(f"""
+        SELECT website, price, website_link, available, scraped_at
+        FROM scrape_results
+        WHERE query_key = ? AND website IN ({placeholders})
+    """, (query_key, *websites))
+    
+    rows = cursor.fetchall()
+    
+    now = time.time()
+    return {
+        row[0]: (
+            {"price": row[1], "link": row[2], "available": bool(row[3])},
+            max(0.0, now - row[4])
+        )
+        for row in rows
+    }
+
+
+def save_model_artifact(product_id, model_type, data_version, artifact):
+    """
+    WHAT IT DOES: Stores (or replaces) a product's trained model
+    
+    PARAMETERS:
+    - data_version: Price history version as text (see model_store.py)
+    - artifact: The model as JSON text
+    """
+    
+    connection = get_connection()
+    
+    with connection:
+        connection.execute("""
+            INSERT OR REPLACE INTO model_artifacts
+                (product_id, model_type, data_version, artifact, trained_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (product_id, model_type, data_version, artifact, time.time()))
+
+
+def get_model_artifact(product_id, model_type):
+    """
+    WHAT IT DOES: Reads a stored model
+    
+    RETURNS: (data_version, artifact JSON text, trained_at) or None
+    """
+    
+    connection = get_connection()
+    
+    return connection.execute("""
+        SELECT data_version, artifact, trained_at FROM model_artifacts
+        WHERE product_id = ? AND model_type = ?
+    """, (product_id, model_type)).fetchone()
+
+
+
+# ============================================================================
+# BULK INGESTION
+# ============================================================================
+# Loading a big CSV one row at a time (one INSERT + commit per row) is very
+# slow. Bulk ingestion instead:
+# - reads the CSV in large chunks with pandas (vectorized, no iterrows)
+# - inserts each chunk with ONE executemany call
+# - wraps the whole file in ONE transaction (one commit at the end)
+# - upserts products: new ones are added, existing ones get updated names
+# - upserts prices: one row per product, website and day
+# - skips files that were already loaded, and loads only the new rows of
+#   files that grew (see ingest_log)
+
+INGEST_CHUNK_SIZE = 200_000
+
+CSV_COLUMNS = {
+    "product_id": "int64",
+    "product_name": "string",
+    "category": "string",
+    "website": "string",
+    "price": "float64",
+    "date": "string",
+    "website_link": "string",
+}
+
+
+def _none_if_missing(column):
+    # pandas uses NA for empty cells, SQLite wants None (NULL)
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def _file_checksums(path, prefix_size=None):
+    """
+    WHAT IT DOES: SHA-256 of a whole file, and of its first prefix_size bytes
+    
+    RETURNS: (checksum of the file, checksum of the prefix or None)
+    Both come from ONE read of the file.
+    """
+    
+    digest = hashlib.sha256()
+    prefix_checksum = hashlib.sha256().hexdigest() if prefix_size == 0 else None
+    position = 0
+    
+    with open(path, "rb") as file:
+        while True:
+            block = file.read(1024 * 1024)
+            if not block:
+                break
+            
+            if prefix_checksum is None and prefix_size and position + len(block) >= prefix_size:
+                cut = prefix_size - position
+                digest.update(block[:cut])
+                prefix_checksum = digest.hexdigest()
+                digest.update(block[cut:])
+            else:
+                digest.update(block)
+            position += len(block)
+    
+    return digest.hexdigest(), prefix_checksum
+
+
+def _ends_with_newline(path, size):
+    # True if the first `size` bytes of the file end on a complete line
+    with open(path, "rb") as file:
+        file.seek(size - 1)
+        return file.read(1) == b"\n"
+
+
+def bulk_ingest_csv(csv_path, chunksize=INGEST_CHUNK_SIZE, force=False):
+    """
+    WHAT IT DOES: Loads a price CSV into the database as fast as possible
+    
+    PARAMETERS:
+    - csv_path: CSV with columns product_id, product_name, category,
+      website, price, date and (optional) website_link
+    - chunksize: Rows read and inserted per batch
+    - force: Load the whole file even if it was loaded before
+    
+    EXPLANATION (why restarting is cheap):
+    - The file's size and checksum are remembered in ingest_log
+    - Same file as last time -> nothing to do, skip it
+    - File only grew at the end -> load just the new rows
+    - Anything else -> load the whole file; prices are upserted per
+      (product, website, day), so rows already present are not duplicated
+    
+    RETURNS: Dictionary with mode ("skipped", "append" or "full"),
+    number of rows, products and seconds taken
+    """
+    
+    start = time.perf_counter()
+    connection = get_connection()
+    
+    source = os.path.abspath(csv_path)
+    file_size = os.path.getsize(csv_path)
+    
+    previous = connection.execute("""
+        SELECT file_size, checksum, rows FROM ingest_log WHERE source = ?
+    """, (source,)).fetchone()
+    
+    checksum, prefix_checksum = _file_checksums(csv_path, previous[0] if previous else None)
+    
+    # Decide how much of the file needs loading
+    mode = "full"
+    if previous and not force:
+        previous_size, previous_checksum, previous_rows = previous
+        
+        if previous_size == file_size and previous_checksum == checksum:
+            print(f"[+] {csv_path} unchanged since last load, skipping")
+            return {"mode": "skipped", "rows": 0, "products": 0, "seconds": 0.0}
+        
+        if (file_size > previous_size and prefix_checksum == previous_checksum
+                and _ends_with_newline(csv_path, previous_size)):
+            mode = "append"
+    
+    # Read the header once so appended rows can be read without it
+    with open(csv_path, newline="") as file:
+        columns = next(csv.reader(file))
+    
+    file = open(csv_path, "rb")
+    if mode == "append":
+        file.seek(previous[0])
+        read_options = {"names": columns, "header": None}
+    else:
+        read_options = {}
+    
+    total_rows = 0
+    product_ids = set()
+    
+    try:
+        chunks = pd.read_csv(
+            file,
+            dtype=CSV_COLUMNS,
+            usecols=lambda column: column in CSV_COLUMNS,
+            chunksize=chunksize,
+            **read_options
+        )
+        
+        with connection:
+            for chunk in chunks:
+                # Products: one row per product_id (the last one in the chunk wins)
+                products = chunk.drop_duplicates("product_id", keep="last")
+                connection.executemany("""
+                    INSERT INTO products (product_id, product_name, category)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(product_id) DO UPDATE SET
+                        product_name = excluded.product_name,
+                        category = excluded.category
+                """, zip(
+                    products["product_id"].tolist(),
+                    _none_if_missing(products["product_name"]),
+                    _none_if_missing(products["category"])
+                ))
+                product_ids.update(products["product_id"].tolist())
+                
+                # Prices: every row (upsert, so reloading never duplicates)
+                if "website_link" in chunk:
+                    links = _none_if_missing(chunk["website_link"])
+                else:
+                    links = [None] * len(chunk)
+                
+                connection.executemany(UPSERT_PRICE_SQL, zip(
+                    chunk["product_id"].tolist(),
+                    chunk["website"].tolist(),
+                    chunk["price"].tolist(),
+                    links,
+                    chunk["date"].tolist()
+                ))
+                
+                total_rows += len(chunk)
+            
+            # Bulk inserts skip the per-row bookkeeping: recompute the model
+            # sums of the products in this file only, in the same transaction
+            if total_rows:
+                recompute_model_stats(connection.cursor(), product_ids)
+            
+            # Remember this version of the file (same transaction as the data)
+            known_rows = previous[2] + total_rows if mode == "append" else total_rows
+            connection.execute("""
+                INSERT INTO ingest_log (source, file_size, checksum, rows)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET
+                    file_size = excluded.file_size,
+                    checksum = excluded.checksum,
+                    rows = excluded.rows,
+                    ingested_at = CURRENT_TIMESTAMP
+            """, (source, file_size, checksum, known_rows))
+    finally:
+        file.close()
+    
+    seconds = time.perf_counter() - start
+    print(f"[+] Ingested {total_rows} price rows for {len(product_ids)} products in {seconds:.2f}s ({mode})")
+    
+    return {
+        "mode": mode,
+        "rows": total_rows,
+        "products": len(product_ids),
+        "seconds": round(seconds, 3)
+    }
+
+
 if __name__ == "__main__":
+    # Command line:
+    #   python -m modules.database                      -> create tables
+    #   python -m modules.database --ingest data.csv    -> create tables + bulk load CSV
+    parser = argparse.ArgumentParser(description="Price comparison database tools")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite database file")
+    parser.add_argument("--ingest", metavar="CSV", help="Bulk load a price CSV file")
+    parser.add_argument("--chunksize", type=int, default=INGEST_CHUNK_SIZE,
+                        help="Rows per insert batch")
+    parser.add_argument("--force", action="store_true",
+                        help="Load the whole file even if it was loaded before")
+    args = parser.parse_args()
+    
+    DATABASE_PATH = args.db
     initialize_database()
+    
+    if args.ingest:
+        bulk_ingest_csv(args.ingest, chunksize=args.chunksize, force=args.force)
@@ -0,0 +1,399 @@
+"""
+================================================================================
+ESTIMATORS MODULE - estimators.py
+
+EXPLANATION:
+PricePredictionModel fits a straight line  price = slope * day + intercept.
+This module holds the "engines" (backends) that do the actual fitting.
+
+Why more than one engine?
+- scikit-learn is a big, general ML library. For ONE feature (the day)
+  it does a lot of extra checking and copying, and importing it is slow
+- A straight line has an exact formula (ordinary least squares), which
+  NumPy can compute directly in a few microseconds
+
+Available engines:
+- "numpy"   (default): closed-form least squares, fit + all metrics in one pass
+- "sklearn": StandardScaler + LinearRegression + sklearn metrics (the original)
+
+Both give the same numbers (within floating point rounding). Both expose
+the same attributes as sklearn: coef_ and intercept_ are for the SCALED
+feature, exactly like StandardScaler + LinearRegression.
+
+Choose the engine with PricePredictionModel(backend="sklearn") or the
+PRICE_MODEL_BACKEND environment variable.
+
+Prediction intervals:
+Every engine also remembers, while fitting, what it needs for the
+standard error of a forecast (n, mean day, spread of the days and the
+residual spread). std_error(X) then works for any future days at once
+and interval_bounds() turns it into e.g. 80% and 95% price ranges:
+    price ± t * std_error      (t from Student's t with n - 2 degrees of freedom)
+No refitting and no bootstrapping per request.
+
+================================================================================
+"""
+
+import math
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+
+DEFAULT_BACKEND = os.environ.get("PRICE_MODEL_BACKEND", "numpy")
+
+# Prediction interval levels (percent) returned with every forecast
+DEFAULT_INTERVAL_LEVELS = tuple(
+    float(level) for level in os.environ.get("PREDICTION_INTERVAL_LEVELS", "80,95").split(",")
+)
+
+
+def r2_from_errors(sse, syy):
+    """
+    WHAT IT DOES: R² score from the sum of squared errors and the total variation
+
+    Same rule as sklearn for a flat price history (syy = 0):
+    a perfect fit scores 1, anything else scores 0
+    """
+
+    if syy > 0:
+        return 1 - sse / syy
+    return 1.0 if sse == 0 else 0.0
+
+
+def t_quantile(p, df):
+    """
+    WHAT IT DOES: Quantile of Student's t distribution (no SciPy needed)
+
+    Exact for 1 and 2 degrees of freedom, otherwise the Cornish-Fisher
+    expansion around the normal quantile (error < 0.2% from df = 3 on)
+    """
+
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+
+    z = NormalDist().inv_cdf(p)
+    return (
+        z
+        + (z**3 + z) / 4 / df
+        + (5 * z**5 + 16 * z**3 + 3 * z) / 96 / df**2
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384 / df**3
+        + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160 / df**4
+    )
+
+
+def interval_bounds(predictions, std_errors, df, levels=None):
+    """
+    WHAT IT DOES: Turns point forecasts + standard errors into price ranges
+
+    PARAMETERS:
+    - predictions, std_errors: Arrays, one entry per forecast day
+    - df: Degrees of freedom of the residual spread (n - fitted parameters)
+    - levels: Percentages, e.g. (80, 95)
+
+    RETURNS: {"80": {"lower": array, "upper": array}, ...}
+    Empty if the fit left no degrees of freedom (e.g. only 2 days of prices)
+    """
+
+    if df < 1:
+        return {}
+
+    intervals = {}
+    for level in levels or DEFAULT_INTERVAL_LEVELS:
+        t = t_quantile(0.5 + level / 200, df)
+        intervals[f"{level:g}"] = {
+            "lower": predictions - t * std_errors,
+            "upper": predictions + t * std_errors
+        }
+    return intervals
+
+
+def linear_std_error(x, n, mean_x, sxx, sigma):
+    """
+    WHAT IT DOES: Standard error of a straight-line forecast at days x
+
+    FORMULA: sigma * sqrt(1 + 1/n + (x - mean_x)² / Sxx)
+    - 1: noise of a single future price
+    - 1/n + (x - mean_x)²/Sxx: uncertainty of the line itself, growing
+      the further x is from the middle of the history
+    """
+
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    spread = (x - mean_x) ** 2 / sxx if sxx > 0 else 0.0
+    return sigma * np.sqrt(1 + 1 / n + spread)
+
+
+class NumpyLinearTrend:
+    """
+    WHAT IT DOES: Scaled linear regression on one feature, in closed form
+
+    FORMULAS (x = days, y = prices):
+    - scaling: x_scaled = (x - mean_x) / std_x        (std_x = 1 if all x equal)
+    - slope:   sum(x_scaled * (y - mean_y)) / sum(x_scaled^2)
+    - intercept: mean_y   (x_scaled has mean 0)
+    """
+
+    name = "numpy"
+
+    def __init__(self):
+        self.mean_ = 0.0
+        self.scale_ = 1.0
+        self.coef_ = np.zeros(1)
+        self.intercept_ = 0.0
+        self.n_samples_ = 0
+
+    def fit(self, X, Y):
+        """
+        WHAT IT DOES: Learns slope and intercept from days X and prices Y
+        """
+
+        x = np.asarray(X, dtype=np.float64).reshape(-1)
+        y = np.asarray(Y, dtype=np.float64)
+
+        self.n_samples_ = len(x)
+        self.mean_ = x.mean()
+        std = x.std()
+        self.scale_ = std if std > 0 else 1.0
+
+        x_scaled = (x - self.mean_) / self.scale_
+        mean_y = y.mean()
+        sxx = np.dot(x_scaled, x_scaled)
+        slope = np.dot(x_scaled, y - mean_y) / sxx if sxx > 0 else 0.0
+
+        self.coef_ = np.array([slope])
+        self.intercept_ = mean_y
+
+        # Kept for prediction intervals
+        residual = y - mean_y - slope * x_scaled
+        self.df_ = self.n_samples_ - 2
+        self.sigma_ = float(np.sqrt(np.dot(residual, residual) / self.df_)) if self.df_ > 0 else 0.0
+        self.sxx_ = float(sxx) * self.scale_ ** 2
+        return self
+
+    def std_error(self, X):
+        """
+        WHAT IT DOES: Standard error of the forecast for days X
+        """
+
+        return linear_std_error(X, self.n_samples_, self.mean_, self.sxx_, self.sigma_)
+
+    def get_state(self):
+        """
+        WHAT IT DOES: Everything needed to rebuild the fitted engine (plain numbers)
+        """
+
+        return {
+            "mean": float(self.mean_),
+            "scale": float(self.scale_),
+            "coef": float(self.coef_[0]),
+            "intercept": float(self.intercept_),
+            "n_samples": int(self.n_samples_),
+            "sigma": float(self.sigma_),
+            "sxx": float(self.sxx_)
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        WHAT IT DOES: Rebuilds a fitted engine from get_state() - no data, no fitting
+        """
+
+        engine = cls()
+        engine.mean_ = state["mean"]
+        engine.scale_ = state["scale"]
+        engine.coef_ = np.array([state["coef"]])
+        engine.intercept_ = state["intercept"]
+        engine.n_samples_ = state["n_samples"]
+        engine.df_ = engine.n_samples_ - 2
+        engine.sigma_ = state["sigma"]
+        engine.sxx_ = state["sxx"]
+        return engine
+
+    def predict(self, X):
+        """
+        WHAT IT DOES: Predicts prices for days X (one price per row)
+        """
+
+        x = np.asarray(X, dtype=np.float64).reshape(-1)
+        return self.intercept_ + self.coef_[0] * (x - self.mean_) / self.scale_
+
+    def evaluate(self, X, Y):
+        """
+        WHAT IT DOES: MAE, MSE and R² in one pass over the residuals
+        """
+
+        y = np.asarray(Y, dtype=np.float64)
+        residual = y - self.predict(X)
+        sse = np.dot(residual, residual)
+        centered = y - y.mean()
+
+        return {
+            "mae": float(np.abs(residual).mean()),
+            "mse": float(sse / len(y)),
+            "r2": float(r2_from_errors(sse, np.dot(centered, centered)))
+        }
+
+
+class SklearnLinearTrend:
+    """
+    WHAT IT DOES: The original engine - StandardScaler + LinearRegression
+
+    scikit-learn is imported only when this engine is created, so the API
+    starts quickly when the numpy engine is used.
+    """
+
+    name = "sklearn"
+
+    def __init__(self):
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+
+        self.scaler = StandardScaler()
+        self.model = LinearRegression()
+
+    @property
+    def coef_(self):
+        return self.model.coef_
+
+    @property
+    def intercept_(self):
+        return self.model.intercept_
+
+    @property
+    def mean_(self):
+        return self.scaler.mean_[0]
+
+    @property
+    def scale_(self):
+        return self.scaler.scale_[0]
+
+    def fit(self, X, Y):
+        self.model.fit(self.scaler.fit_transform(X), Y)
+
+        # Kept for prediction intervals
+        x = np.asarray(X, dtype=np.float64).reshape(-1)
+        residual = np.asarray(Y, dtype=np.float64) - self.predict(X)
+        self.n_samples_ = len(x)
+        self.df_ = self.n_samples_ - 2
+        self.sigma_ = float(np.sqrt(np.dot(residual, residual) / self.df_)) if self.df_ > 0 else 0.0
+        self.sxx_ = float(np.dot(x - x.mean(), x - x.mean()))
+        return self
+
+    def predict(self, X):
+        return self.model.predict(self.scaler.transform(X))
+
+    def std_error(self, X):
+        return linear_std_error(X, self.n_samples_, self.mean_, self.sxx_, self.sigma_)
+
+    def get_state(self):
+        # Same numbers as the numpy engine, which rebuilds it (see from_state)
+        return {
+            "mean": float(self.mean_),
+            "scale": float(self.scale_),
+            "coef": float(self.coef_[0]),
+            "intercept": float(self.intercept_),
+            "n_samples": int(self.n_samples_),
+            "sigma": float(self.sigma_),
+            "sxx": float(self.sxx_)
+        }
+
+    def evaluate(self, X, Y):
+        from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+        Y_pred = self.predict(X)
+        return {
+            "mae": mean_absolute_error(Y, Y_pred),
+            "mse": mean_squared_error(Y, Y_pred),
+            "r2": r2_score(Y, Y_pred)
+        }
+
+
+class OnlineLinearTrend:
+    """
+    WHAT IT DOES: The same straight line, built from running sums instead of data
+
+    The database keeps, per product, n, Σx, Σy, Σx², Σxy and Σy² over its
+    daily average prices (see database.update_model_stats). From those six
+    numbers we get the least-squares line and its errors directly:
+    - Sxx = Σx² - (Σx)²/n,  Sxy = Σxy - Σx·Σy/n,  Syy = Σy² - (Σy)²/n
+    - slope = Sxy / Sxx,  intercept = mean_y - slope * mean_x
+    - SSE = Syy - slope * Sxy   ->   MSE, RMSE and R²
+    MAE needs every single error, so it is NOT available here.
+    """
+
+    name = "online"
+
+    def __init__(self, stats):
+        n = stats["n_days"]
+        self.stats = stats
+        self.n_samples_ = n
+
+        mean_x = stats["sum_x"] / n
+        mean_y = stats["sum_y"] / n
+        sxx = max(stats["sum_xx"] - stats["sum_x"] * mean_x, 0.0)
+        sxy = stats["sum_xy"] - stats["sum_x"] * mean_y
+        syy = max(stats["sum_yy"] - stats["sum_y"] * mean_y, 0.0)
+
+        # Tiny values are rounding noise from the running sums
+        if sxx < 1e-9:
+            sxx = 0.0
+        if syy <= 1e-9 * max(stats["sum_yy"], 1.0):
+            syy = 0.0
+
+        self.slope = sxy / sxx if sxx > 0 else 0.0
+        self.intercept = mean_y - self.slope * mean_x
+
+        sse = max(syy - self.slope * sxy, 0.0)
+        if sse <= 1e-9 * max(stats["sum_yy"], 1.0):
+            sse = 0.0
+
+        self.mse = sse / n
+        self.r2 = r2_from_errors(sse, syy)
+
+        # Kept for prediction intervals
+        self.mean_x = mean_x
+        self.sxx = sxx
+        self.df_ = n - 2
+        self.sigma_ = math.sqrt(sse / self.df_) if self.df_ > 0 else 0.0
+
+    def predict(self, X):
+        """
+        WHAT IT DOES: Predicts prices for days X (counted from the origin day)
+        """
+
+        x = np.asarray(X, dtype=np.float64).reshape(-1)
+        return self.intercept + self.slope * x
+
+    def std_error(self, X):
+        """
+        WHAT IT DOES: Standard error of the forecast for days X
+        """
+
+        return linear_std_error(X, self.n_samples_, self.mean_x, self.sxx, self.sigma_)
+
+    def evaluate(self):
+        """
+        WHAT IT DOES: MSE and R² of the fit (MAE is not available)
+        """
+
+        return {"mse": self.mse, "r2": self.r2}
+
+
+ESTIMATORS = {
+    "numpy": NumpyLinearTrend,
+    "sklearn": SklearnLinearTrend,
+}
+
+
+def make_estimator(backend=None):
+    """
+    WHAT IT DOES: Creates a fresh estimator for the chosen backend name
+    """
+
+    backend = backend or DEFAULT_BACKEND
+    if backend not in ESTIMATORS:
+        raise ValueError(f"Unknown model backend '{backend}'. Choose from: {', '.join(ESTIMATORS)}")
+    return ESTIMATORS[backend]()
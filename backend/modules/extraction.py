@@ -0,0 +1,442 @@
+"""
+================================================================================
+EXTRACTION MODULE - extraction.py
+
+EXPLANATION:
+This module reads product cards out of retailer search pages, using
+declarative selector specs that are compiled into lxml XPath queries.
+
+The problem:
+- BeautifulSoup builds a Python object for EVERY tag and text of a page;
+  a 1-2 MB search page costs hundreds of milliseconds of CPU, all while
+  holding the GIL (no other thread of the server can run Python)
+- Each product card was then searched with find()/find_all() several
+  times (one call per fallback selector)
+
+The solution:
+1. Selector specs: each retailer DESCRIBES where things are
+   (tag + classes / attributes, in fallback order) instead of coding the
+   lookups; see Selector and the spec dictionaries in scraper.py
+2. compile_spec() turns a spec into XPath expressions once; every
+   process compiles each expression once more into an lxml XPath object
+3. The page is parsed by lxml's C parser straight into its own tree (no
+   Python object per tag), starting at the first result card: everything
+   before it (head, scripts, navigation) is not parsed at all
+4. Parsing runs in a pool of worker processes, so the threads serving
+   API requests never spend their time (or the GIL) on HTML
+
+Streaming (StreamExtractor / stream_extract):
+- The page is fed to lxml's incremental parser chunk by chunk WHILE it
+  downloads, and every result card is handed out as soon as its closing
+  tag has been parsed
+- The caller can stop at the first card it likes (or at the result
+  cap): the rest of the page is never downloaded nor parsed
+- Finished cards are removed from the tree, so memory stays small
+
+Spec format:
+    {
+        "start_marker": 'data-component-type="s-search-result"',   # optional
+        "results": [Selector("div", attrs={...}), ...],   # first that matches wins
+        "fields": {
+            "title": [Selector("h2", "a-size-mini"), Selector("h2")],
+            "link": [Selector("a", "a-link-normal", attribute="href")],
+        }
+    }
+- A field is the text of (or an attribute of) the first element matched
+  by the first selector that matches anything; None if nothing matches
+
+Configuration (environment variables):
+- PARSE_WORKERS: worker processes (default: CPU cores, at most 4;
+  0 = parse in the calling thread)
+
+================================================================================
+"""
+
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+import multiprocessing
+
+from lxml import etree
+
+
+def _default_parse_workers():
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return min(4, cores)
+
+
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(_default_parse_workers())))
+
+# Longest time to wait for a worker to parse one page (seconds)
+PARSE_TIMEOUT = 10
+
+
+# ============================================================================
+# SELECTOR SPECS
+# ============================================================================
+
+class Selector(namedtuple("Selector", ["tag", "classes", "attrs", "attribute"])):
+    """
+    WHAT IT DOES: Describes one way to find an element
+
+    PARAMETERS:
+    - tag: Element name, e.g. "span" ("*" = any)
+    - classes: One class, "a b" (needs both) or a list (any of them)
+    - attrs: Other attributes that must have these exact values
+    - attribute: Read this attribute instead of the element's text
+
+    Same matching as BeautifulSoup's find(tag, {"class": classes, **attrs})
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, tag, classes=None, attrs=None, attribute=None):
+        return super().__new__(cls, tag, classes, attrs, attribute)
+
+
+# A compiled spec holds only strings, so it can be sent to worker processes
+CompiledSpec = namedtuple("CompiledSpec", ["start_marker", "results", "fields"])
+
+
+def _class_test(name):
+    # True if "name" is one of the element's classes
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def selector_xpath(selector, relative=True):
+    """
+    WHAT IT DOES: XPath expression for a Selector
+
+    Example: Selector("span", ["a", "b"]) ->
+        .//span[(contains(..., ' a ') or contains(..., ' b '))]
+    """
+
+    tests = []
+    classes = selector.classes
+    if isinstance(classes, str):
+        # "lfloat product-price" -> element needs both classes
+        tests.extend(_class_test(name) for name in classes.split())
+    elif classes:
+        tests.append("(" + " or ".join(_class_test(name) for name in classes) + ")")
+
+    for name, value in (selector.attrs or {}).items():
+        tests.append(f"@{name}='{value}'")
+
+    path = (".//" if relative else "//") + selector.tag
+    if tests:
+        path += "[" + " and ".join(tests) + "]"
+    return path
+
+
+def compile_spec(spec):
+    """
+    WHAT IT DOES: Turns a selector spec into XPath expressions (done once per retailer)
+
+    RETURNS: CompiledSpec
+    - results: XPath per result selector
+    - fields: ((field name, ((xpath, attribute), ...)), ...)
+    """
+
+    results = tuple(selector_xpath(selector) for selector in spec["results"])
+    fields = tuple(
+        (name, tuple((f"({selector_xpath(selector)})[1]", selector.attribute) for selector in selectors))
+        for name, selectors in spec["fields"].items()
+    )
+    marker = spec.get("start_marker")
+    return CompiledSpec(marker.encode() if marker else None, results, fields)
+
+
+# ============================================================================
+# PARSING (runs inside the worker processes)
+# ============================================================================
+
+_local = threading.local()
+
+
+@lru_cache(maxsize=None)
+def _xpath(expression):
+    # XPath objects are compiled once per process and reused
+    return etree.XPath(expression)
+
+
+def _parser(encoding):
+    # lxml parsers must not be shared between threads: one per thread
+    parsers = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+    if encoding not in parsers:
+        parsers[encoding] = etree.HTMLParser(encoding=encoding, remove_comments=True)
+    return parsers[encoding]
+
+
+def _region(content, marker):
+    # The page from the tag that contains the first marker onwards
+    if marker is None:
+        return content
+    position = content.find(marker)
+    if position < 0:
+        return content
+    start = content.rfind(b"<", 0, position)
+    return content[start:] if start >= 0 else content
+
+
+def extract(spec, content, encoding=None, limit=None):
+    """
+    WHAT IT DOES: Reads the result cards of one page with a compiled spec
+
+    PARAMETERS:
+    - spec: CompiledSpec (see compile_spec)
+    - content: Page as bytes
+    - encoding: Character set of the page (default utf-8)
+    - limit: Read at most this many cards
+
+    RETURNS: One dictionary {field name: text or None} per card
+    """
+
+    data = _region(content, spec.start_marker)
+    root = etree.fromstring(data, _parser(encoding or "utf-8")) if data.strip() else None
+    if root is None:
+        return []
+
+    cards = []
+    for expression in spec.results:
+        cards = _xpath(expression)(root)
+        if cards:
+            break
+
+    return [_read_fields(spec, card) for card in cards[:limit]]
+
+
+def _read_fields(spec, card):
+    # {field name: text or attribute of the first match, or None}
+    item = {}
+    for name, selectors in spec.fields:
+        value = None
+        for expression, attribute in selectors:
+            found = _xpath(expression)(card)
+            if found:
+                element = found[0]
+                value = element.get(attribute) if attribute else "".join(element.itertext())
+                break
+        item[name] = value
+    return item
+
+
+# ============================================================================
+# STREAMING (runs in the thread that downloads the page)
+# ============================================================================
+
+class StreamExtractor:
+    """
+    WHAT IT DOES: Reads result cards from a page that arrives in chunks
+
+    PARAMETERS:
+    - spec: CompiledSpec (see compile_spec)
+    - encoding: Character set of the page (default utf-8)
+    - limit: Hand out at most this many cards
+
+    USAGE:
+        extractor = StreamExtractor(spec, limit=5)
+        for chunk in chunks:
+            for item in extractor.feed(chunk):
+                ...            # same dictionaries as extract()
+            if extractor.done:
+                break
+        for item in extractor.close():
+            ...
+
+    Same cards, in the same order, as extract() on the whole page:
+    - Cards of the first results selector are handed out right away
+    - Cards of a fallback selector are kept until the page has ended,
+      because they only count if the first selector matched nothing
+    - A card inside another card of the same selector comes after it
+    """
+
+    def __init__(self, spec, encoding=None, limit=None):
+        self.spec = spec
+        self.limit = limit
+        self.emitted = 0
+        self.bytes_fed = 0
+
+        # Per results selector: "is this element a card?" and
+        # "is it inside another card?" (both relative to the element)
+        self._tests = []
+        tags = set()
+        for expression in spec.results:
+            step = expression[len(".//"):]
+            tags.add(step.split("[", 1)[0])
+            self._tests.append((_xpath("self::" + step), _xpath("ancestor::" + step)))
+
+        self._parser = etree.HTMLPullParser(
+            events=("end",),
+            tag=None if "*" in tags else sorted(tags),
+            encoding=encoding or "utf-8",
+            remove_comments=True
+        )
+        self._started = spec.start_marker is None
+        self._head = b""
+        self._nested = [[] for _ in spec.results]
+        self._fallback = [[] for _ in spec.results]
+
+    @property
+    def done(self):
+        """
+        True once limit cards have been handed out
+        """
+        return self.limit is not None and self.emitted >= self.limit
+
+    def feed(self, chunk):
+        """
+        WHAT IT DOES: Parses the next chunk of the page
+
+        RETURNS: List of cards completed by this chunk
+        """
+
+        self.bytes_fed += len(chunk)
+        if not self._started:
+            # Skip everything before the first result card
+            self._head += chunk
+            position = self._head.find(self.spec.start_marker)
+            if position < 0:
+                return []
+            start = self._head.rfind(b"<", 0, position)
+            chunk = self._head[max(start, 0):]
+            self._head = b""
+            self._started = True
+
+        self._parser.feed(chunk)
+        return self._read_events()
+
+    def close(self):
+        """
+        WHAT IT DOES: Ends the page
+
+        RETURNS: Cards still waiting (the last cards, or the fallback
+        selector's cards if the first selector matched nothing)
+        """
+
+        if not self._started:
+            # Marker never seen: parse the whole page
+            self._parser.feed(self._head)
+            self._head = b""
+            self._started = True
+
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        items = self._read_events()
+
+        if not self.emitted:
+            for waiting in self._fallback[1:]:
+                if waiting:
+                    items = waiting[:self.limit]
+                    break
+        return items
+
+    def _read_events(self):
+        items = []
+        for _, element in self._parser.read_events():
+            if self.done:
+                break
+            for priority, (is_card, in_card) in enumerate(self._tests):
+                if not is_card(element):
+                    continue
+                if in_card(element):
+                    # Handed out after the card around it
+                    self._nested[priority].append(element)
+                    break
+
+                cards = [element] + self._nested[priority]
+                self._nested[priority] = []
+                for card in cards:
+                    item = _read_fields(self.spec, card)
+                    if priority:
+                        self._fallback[priority].append(item)
+                    elif not self.done:
+                        items.append(item)
+                        self.emitted += 1
+
+                if priority == 0:
+                    # Done with this card: drop it and everything before it
+                    element.clear(keep_tail=True)
+                    parent = element.getparent()
+                    while parent is not None and element.getprevious() is not None:
+                        del parent[0]
+                break
+        return items
+
+
+def stream_extract(spec, chunks, encoding=None, limit=None):
+    """
+    WHAT IT DOES: Generator over the cards of a page arriving as chunks
+
+    Stops reading chunks as soon as limit cards were handed out, or when
+    the caller stops asking for more cards.
+    """
+
+    extractor = StreamExtractor(spec, encoding, limit)
+    for chunk in chunks:
+        yield from extractor.feed(chunk)
+        if extractor.done:
+            return
+    yield from extractor.close()
+
+
+# ============================================================================
+# THE WORKER POOL
+# ============================================================================
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # "spawn": safe to start from a server that already runs threads
+            _pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def extract_results(spec, content, encoding=None, limit=None):
+    """
+    WHAT IT DOES: Same as extract(), but runs in the parse worker pool
+
+    The calling thread only waits (without holding the GIL). If the pool
+    is disabled (PARSE_WORKERS=0) or broken, the page is parsed here.
+    """
+
+    global _pool
+    if PARSE_WORKERS <= 0:
+        return extract(spec, content, encoding, limit)
+
+    try:
+        return _get_pool().submit(extract, spec, content, encoding, limit).result(PARSE_TIMEOUT)
+    except BrokenProcessPool:
+        print("[-] Parse worker pool broke, parsing in this thread")
+        with _pool_lock:
+            _pool = None
+        return extract(spec, content, encoding, limit)
+
+
+def close_parse_pool():
+    """
+    WHAT IT DOES: Stops the parse worker processes (called on app shutdown)
+    """
+
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
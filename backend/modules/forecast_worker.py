@@ -0,0 +1,369 @@
+"""
+================================================================================
+FORECAST WORKER MODULE - forecast_worker.py
+
+EXPLANATION:
+This module computes price forecasts in the BACKGROUND, so the
+/api/predict-price request does not have to.
+
+The problem:
+- A prediction request loaded the history, trained the model, evaluated
+  it and wrote the prediction to the database - all while the user waited
+
+The solution - precomputed forecasts:
+- A scheduler thread looks every few seconds for products whose price
+  history changed (cheap fingerprint per product, see
+  database.get_price_history_versions) and puts them in a job queue
+- Each scan first refreshes the memory-mapped history store (history_store.py)
+- Worker threads take jobs from the queue, train the model, forecast the
+  next FORECAST_HORIZON days and save the 30-day prediction
+- The API then answers from the latest precomputed forecast immediately
+  (any days_ahead inside the horizon), or trains on the spot with fresh=true
+
+The job queue:
+- A product is queued at most once (queuing it again while it waits does nothing)
+- The history version every job ran for is remembered, whatever the
+  outcome: a product with too little history (or whose forecast failed)
+  is only tried again once its prices change
+- Only the FORECAST_CACHE_SIZE most recently used forecasts are kept in
+  memory; an evicted product is forecast on request instead
+- The saved 30-day prediction replaces the previous one for the same date
+  (one row per product and date, however often it is recomputed)
+- queue_snapshot() lists waiting and running jobs, stats() has the metrics
+- Queue lag = how long a job waited between being queued and being started
+
+Configuration (environment variables):
+- FORECAST_WORKERS: number of worker threads (default 2)
+- FORECAST_SCAN_INTERVAL: seconds between scans for changed products (default 30)
+- FORECAST_CACHE_SIZE: forecasts kept in memory (default 1000)
+
+================================================================================
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from modules.database import get_price_history_versions, upsert_prediction
+from modules.forecasting import get_trained_model, NotEnoughHistoryError
+from modules.history_store import history_store
+
+
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", "2"))
+FORECAST_SCAN_INTERVAL = float(os.environ.get("FORECAST_SCAN_INTERVAL", "30"))
+FORECAST_CACHE_SIZE = int(os.environ.get("FORECAST_CACHE_SIZE", "1000"))
+
+# Days forecast per product, and the forecast saved to the predictions table
+# (the last day of the horizon if the horizon is shorter)
+FORECAST_HORIZON = 365
+SAVED_DAYS_AHEAD = 30
+
+
+class ForecastWorker:
+    """
+    WHAT IT DOES: Background job queue + worker threads that precompute forecasts
+
+    PARAMETERS:
+    - concurrency: Number of worker threads
+    - scan_interval: Seconds between scans for changed products (0 = no scanning)
+    - horizon: Days forecast for every product (at least 1)
+    - cache_size: Forecasts kept in memory (least recently used are dropped)
+    """
+
+    def __init__(self, concurrency=FORECAST_WORKERS, scan_interval=FORECAST_SCAN_INTERVAL,
+                 horizon=FORECAST_HORIZON, cache_size=FORECAST_CACHE_SIZE):
+        self.concurrency = max(1, concurrency)
+        self.scan_interval = scan_interval
+        if horizon < 1:
+            raise ValueError(f"Forecast horizon must be at least 1 day, got {horizon}")
+        self.horizon = horizon
+        self.cache_size = max(1, cache_size)
+
+        # product_id -> (queued_at, reason, history version or None), oldest first
+        self._queue = OrderedDict()
+        # product_id -> started_at
+        self._running = {}
+        # product_id -> latest forecast, least recently used first
+        self._forecasts = OrderedDict()
+        # product_id -> history version of the last job (completed, skipped or failed)
+        self._attempted = {}
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.scans = 0
+        self.last_scan = None
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.total_run = 0.0
+
+    # ------------------------------------------------------------------
+    # Starting and stopping
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """
+        WHAT IT DOES: Starts the worker threads and the scheduler thread
+        """
+
+        if self._threads:
+            return
+
+        self._stop.clear()
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._work, name=f"forecast-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        if self.scan_interval > 0:
+            thread = threading.Thread(target=self._schedule, name="forecast-scheduler", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        print(f"[+] Forecast worker started ({self.concurrency} threads)")
+
+    def stop(self, timeout=5):
+        """
+        WHAT IT DOES: Stops all threads (jobs still queued are dropped)
+        """
+
+        self._stop.set()
+        with self._cond:
+            self._queue.clear()
+            self._cond.notify_all()
+
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # ------------------------------------------------------------------
+    # The job queue
+    # ------------------------------------------------------------------
+
+    def enqueue(self, product_id, reason="manual", version=None):
+        """
+        WHAT IT DOES: Queues a product for recomputation
+        (version: the history version that made us queue it, if known)
+
+        RETURNS: True if queued, False if it was already waiting
+        """
+
+        with self._cond:
+            if product_id in self._queue:
+                return False
+            self._queue[product_id] = (time.time(), reason, version)
+            self._cond.notify()
+            return True
+
+    def scan(self):
+        """
+        WHAT IT DOES: Queues every product whose history changed since its last forecast
+
+        RETURNS: Number of products queued
+        """
+
+        # Bring the columnar history up to date first, so the jobs train from it
+        try:
+            history_store.refresh()
+        except Exception as e:
+            print(f"[-] History store refresh failed: {e}")
+
+        versions = get_price_history_versions()
+        queued = 0
+        for product_id, version in versions.items():
+            attempted = self._attempted.get(product_id)
+            if attempted == version:
+                continue  # Already done (or hopeless) for exactly this history
+            if self.enqueue(product_id, "new" if attempted is None else "changed", version):
+                queued += 1
+
+        self.scans += 1
+        self.last_scan = time.time()
+        return queued
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            try:
+                queued = self.scan()
+                if queued:
+                    print(f"[FORECAST] Queued {queued} products with new prices")
+            except Exception as e:
+                print(f"[-] Forecast scan failed: {e}")
+            self._stop.wait(self.scan_interval)
+
+    def _next_job(self):
+        with self._cond:
+            while not self._queue and not self._stop.is_set():
+                self._cond.wait()
+            if self._stop.is_set():
+                return None
+
+            product_id, (queued_at, reason, version) = self._queue.popitem(last=False)
+            started_at = time.time()
+            self._running[product_id] = started_at
+
+            lag = started_at - queued_at
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            return product_id, version
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            product_id, version = job
+
+            started = time.perf_counter()
+            try:
+                version = self.compute(product_id)["version"]
+                outcome = "completed"
+            except NotEnoughHistoryError:
+                outcome = "skipped"
+            except Exception as e:
+                print(f"[-] Forecast for product {product_id} failed: {e}")
+                outcome = "failed"
+
+            with self._cond:
+                if version is not None:
+                    self._attempted[product_id] = version
+                self._running.pop(product_id, None)
+                self.total_run += time.perf_counter() - started
+                setattr(self, outcome, getattr(self, outcome) + 1)
+
+    # ------------------------------------------------------------------
+    # The forecasts
+    # ------------------------------------------------------------------
+
+    def compute(self, product_id):
+        """
+        WHAT IT DOES: Trains (or reuses) the model, forecasts the horizon, saves it
+
+        RETURNS: The new forecast entry (see get_forecast)
+        """
+
+        trained = get_trained_model(product_id)
+        model = trained["model"]
+        evaluation = trained["evaluation"]
+        horizon = model.predict_horizon(self.horizon)
+
+        saved = min(SAVED_DAYS_AHEAD, self.horizon) - 1
+        upsert_prediction(
+            product_id,
+            horizon["prices"][saved],
+            horizon["dates"][saved],
+            evaluation["R2_Score"],
+            trained["model_info"]["model"]
+        )
+
+        forecast = {
+            "version": trained["version"],
+            "horizon": horizon,
+            "evaluation": evaluation,
+            "model_info": trained["model_info"],
+            "computed_at": time.time()
+        }
+        with self._cond:
+            self._forecasts[product_id] = forecast
+            self._forecasts.move_to_end(product_id)
+            while len(self._forecasts) > self.cache_size:
+                self._forecasts.popitem(last=False)
+        return forecast
+
+    def get_forecast(self, product_id):
+        """
+        WHAT IT DOES: Returns the latest precomputed forecast of a product (or None)
+
+        Dictionary with version, horizon (columns from predict_horizon),
+        evaluation, model_info and computed_at (unix time)
+        """
+
+        with self._cond:
+            forecast = self._forecasts.get(product_id)
+            if forecast is not None:
+                self._forecasts.move_to_end(product_id)
+            return forecast
+
+    def get_prediction(self, product_id, days_ahead):
+        """
+        WHAT IT DOES: One day of the precomputed forecast, in the
+        predict_future_price() format
+
+        RETURNS: (prediction, forecast entry) or None if not available
+        """
+
+        forecast = self.get_forecast(product_id)
+        if forecast is None or not 1 <= days_ahead <= len(forecast["horizon"]["prices"]):
+            return None
+
+        horizon = forecast["horizon"]
+        day = days_ahead - 1
+        prediction = {
+            "predicted_price": horizon["prices"][day],
+            "predicted_date": horizon["dates"][day],
+            "confidence": horizon["confidence"],
+            "days_ahead": days_ahead,
+            "intervals": {
+                level: {"lower": bounds["lower"][day], "upper": bounds["upper"][day]}
+                for level, bounds in horizon["intervals"].items()
+            }
+        }
+        return prediction, forecast
+
+    # ------------------------------------------------------------------
+    # Inspection
+    # ------------------------------------------------------------------
+
+    def queue_snapshot(self, limit=100):
+        """
+        WHAT IT DOES: Lists running jobs and the oldest waiting jobs
+        """
+
+        now = time.time()
+        with self._cond:
+            running = [
+                {"product_id": product_id, "running_for": round(now - started_at, 3)}
+                for product_id, started_at in self._running.items()
+            ]
+            waiting = [
+                {"product_id": product_id, "reason": reason, "waiting_for": round(now - queued_at, 3)}
+                for product_id, (queued_at, reason, _) in list(self._queue.items())[:limit]
+            ]
+        return {"running": running, "waiting": waiting}
+
+    def stats(self):
+        """
+        WHAT IT DOES: Returns queue size, lag and throughput counters
+        """
+
+        now = time.time()
+        with self._cond:
+            started = self.completed + self.failed + self.skipped + len(self._running)
+            finished = self.completed + self.failed + self.skipped
+            oldest = next(iter(self._queue.values()), None)
+            return {
+                "workers": self.concurrency,
+                "running": bool(self._threads),
+                "queued": len(self._queue),
+                "in_progress": len(self._running),
+                "completed": self.completed,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "forecasts": len(self._forecasts),
+                "cache_size": self.cache_size,
+                "current_lag": round(now - oldest[0], 3) if oldest else 0.0,
+                "avg_lag": round(self.total_lag / started, 3) if started else 0.0,
+                "max_lag": round(self.max_lag, 3),
+                "avg_run_time": round(self.total_run / finished, 4) if finished else 0.0,
+                "scans": self.scans,
+                "last_scan_age": round(now - self.last_scan, 1) if self.last_scan else None
+            }
+
+
+# Shared worker used by the API
+forecast_worker = ForecastWorker()
@@ -0,0 +1,232 @@
+"""
+================================================================================
+FORECASTING MODULE - forecasting.py
+
+EXPLANATION:
+This module hands out TRAINED price prediction models, training as
+rarely as possible.
+
+The problem:
+- Training means: load all prices -> build a DataFrame -> fit the model
+- Doing that on every /api/predict-price request repeats the same work
+  again and again, although the price history rarely changes
+
+The solution - a model cache:
+- After training, the model is kept in memory, filed under the product
+  AND the "version" of the price history it was trained on
+- The version is a cheap fingerprint (row count, newest price_id, sum of
+  prices) read from the database index
+- Same version next time -> reuse the model, no loading, no fitting
+- A new or changed price row changes the version -> the model is retrained
+- The cache holds a limited number of models (least recently used go first)
+- Not in memory? The model store (model_store.py) may have it in the
+  database, trained by another process or before a restart
+- Training reads the product's columns from the memory-mapped history
+  store (history_store.py) when it is up to date for that product, and
+  falls back to the prices table otherwise
+
+Which model? (see model_registry.py)
+- By default ("auto") every product gets the model that did best in a
+  quick backtest on its own history: linear, seasonal or holt
+- The training result says which model won and how long fitting took
+
+Online predictions (engine="online"):
+- The database keeps running sums of each product's trend line, updated
+  in O(1) whenever a price is saved (see database.update_model_stats)
+- get_online_prediction() builds the line from those sums: no history is
+  read and nothing is trained, so a new price is reflected immediately
+- Same slope, intercept, R² and RMSE as the full fit; MAE is not
+  available because it needs every single error
+
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules.cache import TTLCache
+from modules.database import get_product_prices, get_price_history_version, get_model_stats
+from modules.estimators import OnlineLinearTrend, interval_bounds
+from modules.history_store import history_store
+from modules.ml_predictor import PricePredictionModel
+from modules.model_registry import DEFAULT_FORECAST_MODEL
+from modules.model_store import save_model, load_model
+
+
+# Fewest price records we need to fit a trend
+MIN_PRICE_RECORDS = 3
+
+# Most trained models kept in memory, and how long one may be reused (seconds)
+MODEL_CACHE_SIZE = 1000
+MODEL_CACHE_TTL = 24 * 60 * 60
+
+# key = (product_id, history version, model type), value = {"model", "evaluation", "version"}
+# Models for old versions are never asked for again and fall out as LRU
+model_cache = TTLCache(max_entries=MODEL_CACHE_SIZE, default_ttl=MODEL_CACHE_TTL)
+
+# Day numbers in price_model_stats are CAST(julianday(date) AS INTEGER);
+# 1970-01-01 has day number 2440587
+UNIX_EPOCH = pd.Timestamp("1970-01-01")
+UNIX_EPOCH_DAY = 2440587
+
+
+class NotEnoughHistoryError(ValueError):
+    """
+    Raised when a product has too few prices to train a model
+    """
+
+
+def prices_to_dataframe(product_id, prices):
+    """
+    WHAT IT DOES: Turns price records from the database into the DataFrame
+    layout PricePredictionModel.prepare_data() expects
+    """
+
+    return pd.DataFrame({
+        "product_id": product_id,
+        "price": [record["price"] for record in prices],
+        "date": [record["date"] for record in prices],
+        "website": [record["website"] for record in prices],
+        "product_name": "Product"
+    })
+
+
+def train_product_model(product_id, prices, model_type=None):
+    """
+    WHAT IT DOES: Trains a new model on a product's price records
+
+    RETURNS: (trained model, evaluation metrics)
+    """
+
+    df = prices_to_dataframe(product_id, prices)
+
+    model = PricePredictionModel(model_type=model_type or DEFAULT_FORECAST_MODEL)
+    X, Y, dates = model.prepare_data(df, "Product")
+    model.train(X, Y)
+    evaluation = model.get_model_evaluation(X, Y)
+
+    return model, evaluation
+
+
+def train_product_model_from_arrays(days, prices, model_type=None):
+    """
+    WHAT IT DOES: Trains a new model on a product's columns from the history store
+
+    RETURNS: (trained model, evaluation metrics)
+    """
+
+    model = PricePredictionModel(model_type=model_type or DEFAULT_FORECAST_MODEL)
+    X, Y, dates = model.prepare_arrays(days, prices)
+    model.train(X, Y)
+    evaluation = model.get_model_evaluation(X, Y)
+
+    return model, evaluation
+
+
+def get_trained_model(product_id, model_type=None):
+    """
+    WHAT IT DOES: Returns a trained model for a product, from the cache if possible
+
+    PARAMETERS:
+    - model_type: "auto" (default), "linear", "seasonal" or "holt"
+
+    RETURNS: Dictionary with:
+    - model: Trained PricePredictionModel
+    - evaluation: Its metrics (MAE, RMSE, R2_Score, ...)
+    - model_info: Model that serves the predictions, fit time (ms), backtest
+    - version: Price history version it was trained on
+    - cached: True if it was not trained now
+    - source: "memory", "store" (database) or "trained"
+
+    RAISES: NotEnoughHistoryError if the product has fewer than 3 prices
+    """
+
+    version = get_price_history_version(product_id)
+    if version[0] < MIN_PRICE_RECORDS:
+        raise NotEnoughHistoryError("Not enough historical data to make prediction")
+
+    model_type = model_type or DEFAULT_FORECAST_MODEL
+    key = (product_id, version, model_type)
+    entry = model_cache.get(key)
+    if entry is not None:
+        return dict(entry, cached=True, source="memory")
+
+    entry = load_model(product_id, model_type, version)
+    if entry is not None:
+        model_cache.set(key, entry)
+        return dict(entry, cached=True, source="store")
+
+    history = history_store.get_history(product_id)
+    if history is not None and history["version"] == version:
+        model, evaluation = train_product_model_from_arrays(history["days"], history["prices"], model_type)
+    else:
+        prices = get_product_prices(product_id)
+        if len(prices) < MIN_PRICE_RECORDS:
+            raise NotEnoughHistoryError("Not enough historical data to make prediction")
+
+        model, evaluation = train_product_model(product_id, prices, model_type)
+
+    entry = {"model": model, "evaluation": evaluation, "model_info": model.model_info, "version": version}
+    model_cache.set(key, entry)
+
+    try:
+        save_model(product_id, model_type, version, model, evaluation)
+    except Exception as e:
+        # The model still works, it just is not shared
+        print(f"[-] Could not store model for product {product_id}: {e}")
+
+    return dict(entry, cached=False, source="trained")
+
+
+def get_online_prediction(product_id, days_ahead=30, levels=None):
+    """
+    WHAT IT DOES: Predicts a future price from the running sums (no training)
+
+    RETURNS: (prediction, evaluation) in the same format as
+    PricePredictionModel.predict_future_price() and get_model_evaluation(),
+    except that evaluation has no "MAE"
+
+    RAISES: NotEnoughHistoryError if the product has fewer than 3 prices
+    """
+
+    stats = get_model_stats(product_id)
+    if stats is None or stats["n_records"] < MIN_PRICE_RECORDS:
+        raise NotEnoughHistoryError("Not enough historical data to make prediction")
+
+    model = OnlineLinearTrend(stats)
+    metrics = model.evaluate()
+
+    # x is counted in days from the product's origin day (a julian day number)
+    future_x = stats["last_x"] + days_ahead
+    predicted = model.predict([future_x])
+    predicted_price = float(predicted[0])
+    intervals = interval_bounds(predicted, model.std_error([future_x]), model.df_, levels)
+    future_date = UNIX_EPOCH + pd.Timedelta(days=stats["origin_day"] + future_x - UNIX_EPOCH_DAY)
+
+    prediction = {
+        "predicted_price": round(predicted_price, 2),
+        "predicted_date": future_date.strftime("%Y-%m-%d"),
+        "confidence": round(metrics["r2"] * 100, 2),
+        "days_ahead": days_ahead,
+        "intervals": {
+            level: {"lower": round(float(bounds["lower"][0]), 2), "upper": round(float(bounds["upper"][0]), 2)}
+            for level, bounds in intervals.items()
+        }
+    }
+
+    evaluation = {
+        "MSE": round(metrics["mse"], 2),
+        "RMSE": round(float(np.sqrt(metrics["mse"])), 2),
+        "R2_Score": round(metrics["r2"], 4),
+        "Accuracy": f"{metrics['r2'] * 100:.2f}%"
+    }
+
+    return prediction, evaluation
+
+
+def get_model_cache_stats():
+    """
+    WHAT IT DOES: Returns the model cache counters (hits, misses, evictions...)
+    """
+
+    return model_cache.stats()
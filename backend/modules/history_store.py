@@ -0,0 +1,411 @@
+"""
+================================================================================
+HISTORY STORE MODULE - history_store.py
+
+EXPLANATION:
+A columnar copy of the price history, kept in .npy files next to the
+database and opened with memory mapping.
+
+Why?
+- In SQLite every price is a row; reading a product's history turns each
+  row into a Python tuple, then a dict, then a DataFrame (three copies)
+- Training only needs two columns: the day and the price
+- Here each column is ONE contiguous array on disk, sorted by product,
+  so a product's history is simply a slice of every array
+
+What is memory mapping (mmap)?
+- The file is not read into memory up front; the operating system maps it
+  into our address space and loads pages when they are touched
+- A slice of a mapped array is a "view": no copy is made at all
+- Every server process maps the same files and shares the page cache
+
+Files (in one "generation" folder, see below):
+- product_ids.npy  int64   one entry per product (sorted)
+- offsets.npy      int64   product i owns rows offsets[i]:offsets[i+1]
+- versions.npy     float64 price history version per product (count, max id, sum)
+- days.npy         int32   day number (days since 1970-01-01)
+- prices.npy       float64 price (same precision as the database)
+- websites.npy     int16   website code (names in meta.json)
+
+Incremental rebuild (refresh):
+- The history version of every product is compared with versions.npy
+- Only new or changed products are read from the prices table; the rows of
+  all other products are copied from the current files
+- The new files are written into a new generation folder and CURRENT is
+  switched to it in one step, so readers never see half-written files
+
+Several server processes:
+- Writers take a lock file (LOCK), so only one process builds at a time;
+  the next one starts from the generation the previous one wrote
+- A writer only deletes generations OLDER than the one CURRENT named
+  before its switch, so a process that just read CURRENT still finds it
+- A reader that still misses a file (e.g. after two quick rebuilds) gets
+  None, and the caller reads SQLite instead
+
+Command line:
+    python -m modules.history_store          (refresh)
+    python -m modules.history_store --full   (rebuild from scratch)
+
+================================================================================
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+
+from modules import database
+from modules.database import get_price_columns, get_price_history_versions
+
+
+# Folder of the store (default: "history_store" next to the database file)
+HISTORY_STORE_DIR = os.environ.get("HISTORY_STORE_DIR")
+
+COLUMNS = {
+    "days": np.int32,
+    "prices": np.float64,
+    "websites": np.int16,
+}
+
+# Day numbers are days since this date
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+@contextmanager
+def _file_lock(path):
+    """
+    WHAT IT DOES: Holds an exclusive lock on a file (blocks until it is free)
+
+    The lock is released when the process ends, even if it crashes.
+    """
+
+    with open(path, "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ~10 s, keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _generation_number(name):
+    # gen-<nanoseconds> -> nanoseconds (None for other names)
+    try:
+        return int(name[len("gen-"):]) if name.startswith("gen-") else None
+    except ValueError:
+        return None
+
+
+def default_directory():
+    """
+    WHAT IT DOES: Folder of the store for the current database
+    """
+
+    if HISTORY_STORE_DIR:
+        return HISTORY_STORE_DIR
+    return os.path.join(os.path.dirname(os.path.abspath(database.DATABASE_PATH)), "history_store")
+
+
+class HistoryStore:
+    """
+    WHAT IT DOES: Columnar, memory-mapped copy of the prices table
+
+    PARAMETERS:
+    - directory: Folder for the .npy files (created if missing)
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._arrays = None
+        self._meta = None
+        self.refreshes = 0
+        self.last_refresh_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Opening the current files
+    # ------------------------------------------------------------------
+
+    def _root(self):
+        return self.directory or default_directory()
+
+    def _read_current(self):
+        # Name of the generation CURRENT points to (None if no store yet)
+        try:
+            with open(os.path.join(self._root(), "CURRENT")) as file:
+                return file.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _open(self):
+        # Maps the generation named in CURRENT (if any)
+        # Raises OSError if its files disappear while opening
+        generation = self._read_current()
+        if generation is None:
+            return None, None
+
+        folder = os.path.join(self._root(), generation)
+        with open(os.path.join(folder, "meta.json")) as file:
+            meta = json.load(file)
+
+        # Empty files cannot be memory-mapped
+        mmap_mode = "r" if meta["rows"] else None
+        arrays = {}
+        for name in ("product_ids", "offsets", "versions", *COLUMNS):
+            arrays[name] = np.load(os.path.join(folder, f"{name}.npy"), mmap_mode=mmap_mode)
+        return arrays, meta
+
+    def _current(self):
+        # (arrays, meta) of the open generation; (None, None) if there is no
+        # store or its files vanished (readers then use SQLite)
+        if self._arrays is None:
+            with self._lock:
+                for attempt in range(2):
+                    if self._arrays is not None:
+                        break
+                    try:
+                        self._arrays, self._meta = self._open()
+                    except OSError as e:
+                        # Removed by a rebuild right after we read CURRENT: try the new one
+                        if attempt:
+                            print(f"[-] History store not readable, using the database: {e}")
+                            return None, None
+        return self._arrays, self._meta
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _position(self, arrays, product_id):
+        product_ids = arrays["product_ids"]
+        i = int(np.searchsorted(product_ids, product_id))
+        if i < len(product_ids) and product_ids[i] == product_id:
+            return i
+        return None
+
+    def get_version(self, product_id):
+        """
+        WHAT IT DOES: History version of a product in the store (None if missing)
+        """
+
+        arrays, _ = self._current()
+        if arrays is None:
+            return None
+        i = self._position(arrays, product_id)
+        if i is None:
+            return None
+        count, max_id, total = arrays["versions"][i]
+        return (int(count), int(max_id), float(total))
+
+    def get_history(self, product_id):
+        """
+        WHAT IT DOES: A product's price history as array views (no copy)
+
+        RETURNS: {"days", "prices", "websites", "website_names", "version"}
+        sorted by day, or None if the product is not in the store
+        - days: int32 days since 1970-01-01 (EPOCH)
+        - websites: int16 codes, website_names[code] is the name
+        """
+
+        arrays, meta = self._current()
+        if arrays is None:
+            return None
+        i = self._position(arrays, product_id)
+        if i is None:
+            return None
+
+        start, end = int(arrays["offsets"][i]), int(arrays["offsets"][i + 1])
+        count, max_id, total = arrays["versions"][i]
+        return {
+            "days": arrays["days"][start:end],
+            "prices": arrays["prices"][start:end],
+            "websites": arrays["websites"][start:end],
+            "website_names": meta["websites"],
+            "version": (int(count), int(max_id), float(total))
+        }
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def refresh(self, full=False):
+        """
+        WHAT IT DOES: Brings the store up to date with the prices table
+
+        Only products whose history version changed are read from SQLite.
+
+        RETURNS: Number of products re-read (0 = already up to date)
+        """
+
+        root = self._root()
+        os.makedirs(root, exist_ok=True)
+
+        # One writer per store: threads take the lock, processes the lock file
+        with self._lock, _file_lock(os.path.join(root, "LOCK")):
+            start = time.perf_counter()
+
+            # Start from the newest generation (another process may have written it)
+            self._arrays, self._meta = self._open()
+            arrays, meta = (None, None) if full else (self._arrays, self._meta)
+
+            # Step 1: Which products changed?
+            current = get_price_history_versions()
+            old_versions = {}
+            if arrays is not None:
+                old_versions = {
+                    int(product_id): (int(v[0]), int(v[1]), float(v[2]))
+                    for product_id, v in zip(arrays["product_ids"], arrays["versions"])
+                }
+            changed = [product_id for product_id, version in current.items() if old_versions.get(product_id) != version]
+            removed = [product_id for product_id in old_versions if product_id not in current]
+            if arrays is not None and not changed and not removed:
+                return 0
+
+            # Step 2: Read only the changed products (all of them on a first build)
+            reread_all = arrays is None or len(changed) > len(current) // 2
+            versions, rows = get_price_columns(None if reread_all else changed)
+
+            website_names = list(meta["websites"]) if meta else []
+            codes = {name: code for code, name in enumerate(website_names)}
+            for row in rows:
+                if row[2] not in codes:
+                    codes[row[2]] = len(website_names)
+                    website_names.append(row[2])
+
+            fresh = {
+                "product_id": np.array([row[0] for row in rows], dtype=np.int64),
+                "days": np.array([row[1] for row in rows], dtype=COLUMNS["days"]),
+                "prices": np.array([row[3] for row in rows], dtype=COLUMNS["prices"]),
+                "websites": np.array([codes[row[2]] for row in rows], dtype=COLUMNS["websites"]),
+            }
+
+            # Step 3: Keep the rows of unchanged products from the current files
+            if reread_all:
+                columns = fresh
+                all_versions = versions
+            else:
+                drop = np.isin(arrays["product_ids"], np.array(changed + removed, dtype=np.int64))
+                keep_rows = np.repeat(~drop, np.diff(arrays["offsets"]))
+                kept_ids = np.repeat(arrays["product_ids"], np.diff(arrays["offsets"]))[keep_rows]
+
+                columns = {"product_id": np.concatenate([kept_ids, fresh["product_id"]])}
+                for name in COLUMNS:
+                    columns[name] = np.concatenate([np.asarray(arrays[name])[keep_rows], fresh[name]])
+
+                all_versions = {pid: v for pid, v in old_versions.items() if pid in current and pid not in versions}
+                all_versions.update(versions)
+
+            # Step 4: Sort by product, day, website and write a new generation
+            order = np.lexsort((columns["websites"], columns["days"], columns["product_id"]))
+            sorted_ids = columns["product_id"][order]
+            product_ids = np.unique(sorted_ids)
+            offsets = np.searchsorted(sorted_ids, np.append(product_ids, np.iinfo(np.int64).max)).astype(np.int64)
+            version_rows = np.array(
+                [all_versions[int(product_id)] for product_id in product_ids], dtype=np.float64
+            ).reshape(-1, 3)
+
+            output = {
+                "product_ids": product_ids,
+                "offsets": offsets,
+                "versions": version_rows,
+                **{name: columns[name][order] for name in COLUMNS},
+            }
+            new_meta = {
+                "websites": website_names,
+                "rows": int(len(order)),
+                "products": int(len(product_ids)),
+                "built_at": time.time(),
+            }
+            self._write(output, new_meta)
+
+            self._arrays, self._meta = self._open()
+            self.refreshes += 1
+            self.last_refresh_seconds = time.perf_counter() - start
+            print(f"[+] History store: {len(versions)} products re-read, "
+                  f"{new_meta['rows']} rows in {self.last_refresh_seconds:.2f}s")
+            return len(versions)
+
+    def _write(self, output, meta):
+        # New generation folder, then switch CURRENT to it atomically
+        # (called with the writer lock held)
+        root = self._root()
+        previous = self._read_current()
+
+        generation = f"gen-{time.time_ns()}"
+        folder = os.path.join(root, generation)
+        os.makedirs(folder)
+        for name, array in output.items():
+            np.save(os.path.join(folder, f"{name}.npy"), array)
+        with open(os.path.join(folder, "meta.json"), "w") as file:
+            json.dump(meta, file)
+
+        pointer = os.path.join(root, f"CURRENT.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(pointer, "w") as file:
+            file.write(generation)
+        os.replace(pointer, os.path.join(root, "CURRENT"))
+
+        # Generations older than the previous CURRENT: nobody can be about
+        # to open them any more. Processes that still map them keep working
+        # (the files stay until unmapped); on Windows removal may fail.
+        keep_from = _generation_number(previous) if previous else None
+        if keep_from is None:
+            return
+        for name in os.listdir(root):
+            number = _generation_number(name)
+            if number is not None and number < keep_from:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def stats(self):
+        """
+        WHAT IT DOES: Size of the store and how long the last refresh took
+        """
+
+        arrays, meta = self._current()
+        return {
+            "products": meta["products"] if meta else 0,
+            "rows": meta["rows"] if meta else 0,
+            "built_at": meta["built_at"] if meta else None,
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 3)
+        }
+
+
+# Shared store used by the API
+history_store = HistoryStore()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar price history store")
+    parser.add_argument("--db", default=database.DATABASE_PATH, help="SQLite database file")
+    parser.add_argument("--dir", default=None, help="Store folder (default: next to the database)")
+    parser.add_argument("--full", action="store_true", help="Rebuild from scratch")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.db
+    database.initialize_database()
+
+    store = HistoryStore(args.dir)
+    print({"reread": store.refresh(full=args.full), **store.stats()})
@@ -37,12 +37,13 @@ What is Training?
 
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from datetime import datetime, timedelta
+import time
 import warnings
 
+from modules.estimators import NumpyLinearTrend, make_estimator, interval_bounds
+from modules.model_registry import fit_model, restore_model
+
 warnings.filterwarnings('ignore')
 
 
@@ -57,20 +58,29 @@ class PricePredictionModel:
     - Prediction: Using the trained model to predict future prices
     """
     
-    def __init__(self):
+    def __init__(self, backend=None, model_type="linear"):
         """
         WHAT IT DOES: Initialize the ML model
         
+        PARAMETERS:
+        - backend: Fitting engine, "numpy" (fast, default) or "sklearn"
+          (see estimators.py)
+        - model_type: "linear" (default), "seasonal", "holt" or "auto"
+          (pick the best by backtest, see model_registry.py)
+        
         We initialize:
-        - model: The Linear Regression object
-        - scaler: Normalizes data (makes numbers easier to work with)
+        - model: The linear regression engine (scales the data AND fits the line)
         - is_trained: Flag to check if model is trained
         """
         
-        self.model = LinearRegression()
-        self.scaler = StandardScaler()
+        self.model = make_estimator(backend)
+        self.backend = self.model.name
+        self.model_type = model_type
+        self.forecaster = None
+        self.model_info = None
         self.is_trained = False
         self.training_accuracy = 0
+        self.training_metrics = None
         self.price_history = None
         self.dates = None
     
@@ -125,8 +135,44 @@ class PricePredictionModel:
         self.dates = pd.to_datetime(daily_prices['date'])
         
         return X, Y, daily_prices['date'].values
-    
-    
+
+
+    def prepare_arrays(self, days, prices):
+        """
+        WHAT IT DOES: Same as prepare_data(), straight from NumPy columns
+
+        PARAMETERS:
+        - days: Day numbers (days since 1970-01-01), e.g. from the history store
+        - prices: Price of each record
+
+        RETURNS: X (features), Y (prices), dates
+
+        EXPLANATION:
+        - No DataFrame is built: np.unique finds the distinct days and
+          np.bincount adds up the prices of each day
+        - The input arrays are only read, so memory-mapped views can be
+          passed in directly
+        """
+
+        if len(days) == 0:
+            raise ValueError("No price data given")
+
+        # Distinct days (sorted) and, for every record, which day it belongs to
+        unique_days, day_index = np.unique(days, return_inverse=True)
+
+        # Average price per day
+        Y = np.bincount(day_index, weights=prices) / np.bincount(day_index)
+
+        # Days since the first date, as a column
+        days_since_start = (unique_days - unique_days[0]).astype(np.int64)
+        X = days_since_start.reshape(-1, 1)
+
+        dates = unique_days.astype("datetime64[D]").astype("datetime64[ns]")
+        self.dates = pd.Series(dates)
+
+        return X, Y, dates
+
+
     def train(self, X, Y):
         """
         WHAT IT DOES: Trains the ML model on historical price data
@@ -147,24 +193,35 @@ class PricePredictionModel:
         - Like converting miles and kilometers to same unit
         """
         
-        # Step 1: Scale the features
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # Step 2: Train the model (fit it to the data)
+        # Step 1 + 2: Scale the features and train the model (fit it to the data)
         # This is where the magic happens!
         # The model finds the best line through the data points
-        self.model.fit(X_scaled, Y)
+        start = time.perf_counter()
+        self.model.fit(X, Y)
+        self.model_info = {
+            "model": "linear",
+            "fit_ms": round((time.perf_counter() - start) * 1000, 3),
+            "selection": {}
+        }
         
-        # Step 3: Make predictions on training data
-        # To check how good our model is
-        Y_pred = self.model.predict(X_scaled)
+        # Other model types (seasonal, holt, auto) forecast with a
+        # model from the registry; the line above stays for get_model_coefficients()
+        self.forecaster = None
+        if self.model_type != "linear":
+            forecaster, self.model_info = fit_model(np.asarray(X).reshape(-1), Y, self.model_type, self.backend)
+            if forecaster.name != "linear":
+                self.forecaster = forecaster
         
-        # Step 4: Calculate R² score (model accuracy)
+        # Step 3: Check how good our model is on the training data
+        # and keep the metrics for get_model_evaluation()
+        self.training_metrics = self._active_model().evaluate(X, Y)
+        
+        # Step 4: R² score (model accuracy)
         # R² ranges from 0 to 1
         # 1 = perfect predictions
         # 0 = terrible predictions
         # 0.8+ = good model
-        self.training_accuracy = r2_score(Y, Y_pred)
+        self.training_accuracy = self.training_metrics["r2"]
         
         # Mark model as trained
         self.is_trained = True
@@ -176,12 +233,26 @@ class PricePredictionModel:
         }
     
     
-    def predict_future_price(self, days_ahead=30):
+    def _active_model(self):
+        # The registry model if one was chosen, else the linear engine
+        return self.forecaster if self.forecaster is not None else self.model
+    
+    
+    def _predict_with_intervals(self, future_X, levels=None):
+        # Point forecast and interval bounds for the same days, in one pass
+        model = self._active_model()
+        predicted = np.asarray(model.predict(future_X), dtype=np.float64)
+        intervals = interval_bounds(predicted, model.std_error(future_X), model.df_, levels)
+        return predicted, intervals
+    
+    
+    def predict_future_price(self, days_ahead=30, levels=None):
         """
         WHAT IT DOES: Predicts price for a future date
         
         PARAMETERS:
         - days_ahead: How many days in the future to predict (default 30 days)
+        - levels: Prediction interval levels in percent (default 80 and 95)
         
         RETURNS: Dictionary with prediction details
         
@@ -189,6 +260,9 @@ class PricePredictionModel:
         - Uses the trained model to predict
         - Calculates confidence based on model accuracy
         - Returns predicted price and date
+        - intervals: price ranges the real price should fall in with the
+          given probability, e.g. {"95": {"lower": 9100, "upper": 9900}}
+          (empty if the history is too short to estimate them)
         
         FORMULA USED:
         Price = slope * time + intercept
@@ -210,11 +284,9 @@ class PricePredictionModel:
         # Reshape for prediction
         future_X = np.array([[future_days]])
         
-        # Scale using the same scaler
-        future_X_scaled = self.scaler.transform(future_X)
-        
-        # Make prediction
-        predicted_price = self.model.predict(future_X_scaled)[0]
+        # Make prediction (the model scales the input the same way as in training)
+        predicted, intervals = self._predict_with_intervals(future_X, levels)
+        predicted_price = float(predicted[0])
         
         # Confidence: Higher accuracy = higher confidence
         confidence = self.training_accuracy * 100
@@ -223,30 +295,86 @@ class PricePredictionModel:
             "predicted_price": round(predicted_price, 2),
             "predicted_date": future_date.strftime("%Y-%m-%d"),
             "confidence": round(confidence, 2),
-            "days_ahead": days_ahead
+            "days_ahead": days_ahead,
+            "intervals": {
+                level: {"lower": round(float(bounds["lower"][0]), 2), "upper": round(float(bounds["upper"][0]), 2)}
+                for level, bounds in intervals.items()
+            }
         }
     
     
-    def predict_multiple_days(self, days_range=30):
+    def predict_horizon(self, days_ahead=30, levels=None):
         """
-        WHAT IT DOES: Predicts prices for multiple days ahead
+        WHAT IT DOES: Predicts the price for EVERY day from 1 to days_ahead
         
         PARAMETERS:
-        - days_range: How many days to predict (will predict 1 to days_range)
+        - days_ahead: Last day of the forecast (e.g. 365 = one year)
+        - levels: Prediction interval levels in percent (default 80 and 95)
         
-        RETURNS: List of predictions
+        RETURNS: Dictionary of equally long lists (columns), ready for a chart:
+        - days_ahead: [1, 2, 3, ...]
+        - dates: ["2024-03-02", "2024-03-03", ...]
+        - prices: [16604.38, 16598.1, ...]
+        - confidence: Model confidence (same for every day)
+        - intervals: {"95": {"lower": [...], "upper": [...]}, ...} (a band
+          around the prices, wider further into the future)
+        
+        EXPLANATION:
+        - All future days are put in ONE array and predicted in ONE call
+        - Much faster than calling predict_future_price once per day
         """
         
         if not self.is_trained:
             raise Exception("Model must be trained first!")
         
-        predictions = []
+        # Day numbers of all future days (days since first date)
+        steps = np.arange(1, days_ahead + 1)
+        last_date = self.dates.iloc[-1]
+        first_date = self.dates.iloc[0]
+        future_X = ((last_date - first_date).days + steps).reshape(-1, 1)
+        
+        # Scale and predict all days (and their intervals) at once
+        predicted_prices, intervals = self._predict_with_intervals(future_X, levels)
+        
+        # Dates of all future days at once
+        future_dates = np.datetime64(last_date.date(), "D") + steps
+        
+        return {
+            "days_ahead": steps.tolist(),
+            "dates": np.datetime_as_string(future_dates, unit="D").tolist(),
+            "prices": np.round(predicted_prices, 2).tolist(),
+            "confidence": round(self.training_accuracy * 100, 2),
+            "intervals": {
+                level: {
+                    "lower": np.round(bounds["lower"], 2).tolist(),
+                    "upper": np.round(bounds["upper"], 2).tolist()
+                }
+                for level, bounds in intervals.items()
+            }
+        }
+    
+    
+    def predict_multiple_days(self, days_range=30):
+        """
+        WHAT IT DOES: Predicts prices for multiple days ahead
         
-        for day in range(1, days_range + 1):
-            prediction = self.predict_future_price(day)
-            predictions.append(prediction)
+        PARAMETERS:
+        - days_range: How many days to predict (will predict 1 to days_range)
         
-        return predictions
+        RETURNS: List of predictions (same format as predict_future_price)
+        """
+        
+        horizon = self.predict_horizon(days_range)
+        
+        return [
+            {
+                "predicted_price": price,
+                "predicted_date": date,
+                "confidence": horizon["confidence"],
+                "days_ahead": day
+            }
+            for day, date, price in zip(horizon["days_ahead"], horizon["dates"], horizon["prices"])
+        ]
     
     
     def get_model_evaluation(self, X, Y):
@@ -287,17 +415,12 @@ class PricePredictionModel:
         if not self.is_trained:
             raise Exception("Model must be trained first!")
         
-        # Scale features
-        X_scaled = self.scaler.transform(X)
-        
-        # Make predictions
-        Y_pred = self.model.predict(X_scaled)
-        
-        # Calculate metrics
-        mae = mean_absolute_error(Y, Y_pred)
-        mse = mean_squared_error(Y, Y_pred)
+        # Calculate metrics (one pass over the prediction errors)
+        metrics = self._active_model().evaluate(X, Y)
+        mae = metrics["mae"]
+        mse = metrics["mse"]
         rmse = np.sqrt(mse)
-        r2 = r2_score(Y, Y_pred)
+        r2 = metrics["r2"]
         
         return {
             "MAE": round(mae, 2),
@@ -308,6 +431,55 @@ class PricePredictionModel:
         }
     
     
+    def to_artifact(self):
+        """
+        WHAT IT DOES: Everything needed to rebuild this trained model, as plain
+        JSON-friendly values (used by the model store)
+        
+        Contains the line's parameters and scaler statistics, the chosen
+        model and its parameters, the training metrics and the first/last
+        training date. No price data.
+        """
+        
+        if not self.is_trained:
+            raise Exception("Model must be trained first!")
+        
+        return {
+            "backend": self.backend,
+            "model_type": self.model_type,
+            "estimator": self.model.get_state(),
+            "forecaster": self.forecaster.get_state() if self.forecaster is not None else None,
+            "model_info": self.model_info,
+            "training_metrics": {name: float(value) for name, value in self.training_metrics.items()},
+            "first_date": self.dates.iloc[0].strftime("%Y-%m-%d"),
+            "last_date": self.dates.iloc[-1].strftime("%Y-%m-%d")
+        }
+    
+    
+    @classmethod
+    def from_artifact(cls, artifact):
+        """
+        WHAT IT DOES: Rebuilds a trained model from to_artifact() - no data, no fitting
+        
+        The straight line is rebuilt with the numpy engine (the stored
+        numbers are the same for both engines, so are the predictions).
+        """
+        
+        model = cls(backend="numpy", model_type=artifact["model_type"])
+        model.model = NumpyLinearTrend.from_state(artifact["estimator"])
+        model.model_info = artifact["model_info"]
+        if artifact["forecaster"] is not None:
+            model.forecaster = restore_model(model.model_info["model"], artifact["forecaster"])
+        
+        model.training_metrics = artifact["training_metrics"]
+        model.training_accuracy = model.training_metrics["r2"]
+        # Only the first and last date are used for predictions
+        # (NumPy parses the fixed YYYY-MM-DD format much faster than pd.to_datetime)
+        model.dates = pd.Series(np.array([artifact["first_date"], artifact["last_date"]], dtype="datetime64[ns]"))
+        model.is_trained = True
+        return model
+    
+    
     def get_model_coefficients(self):
         """
         WHAT IT DOES: Returns the model's learned parameters
@@ -324,8 +496,18 @@ class PricePredictionModel:
         if not self.is_trained:
             raise Exception("Model must be trained first!")
         
-        slope = self.model.coef_[0]
-        intercept = self.model.intercept_
+        # coef_ is the slope per SCALED day: divide by the scale to get the
+        # price change per day, and move the intercept back to day 0
+        slope = float(self.model.coef_[0] / self.model.scale_)
+        intercept = float(self.model.intercept_ - slope * self.model.mean_)
+        details = {}
+        
+        # Models from the registry report their own trend line (price per day,
+        # price on day 0) and extras such as the size of seasonal cycles
+        if self.forecaster is not None:
+            slope = self.forecaster.slope
+            intercept = self.forecaster.intercept
+            details = self.forecaster.describe()
         
         # Interpret slope
         if slope > 0:
@@ -339,7 +521,9 @@ class PricePredictionModel:
             "slope": round(slope, 4),
             "intercept": round(intercept, 2),
             "price_change_per_day": f"₹{abs(slope):.2f} per day",
-            "trend": trend
+            "trend": trend,
+            "model": self.model_info["model"],
+            **details
         }
 
 
@@ -0,0 +1,549 @@
+"""
+================================================================================
+MODEL REGISTRY MODULE - model_registry.py
+
+EXPLANATION:
+A straight line can only say "prices go up" or "prices go down".
+Real prices also move in cycles: monthly drops, festive season sales...
+This module holds several forecasting models and picks the best one for
+each product.
+
+Available models (all work on the DAILY average price, x = days since
+the first price):
+- "linear":   price = slope * day + intercept (the original model)
+- "seasonal": the line PLUS sine/cosine waves for a monthly and a yearly
+              cycle (a wave is only used once the history covers 2 cycles)
+- "holt":     Holt's exponential smoothing - follows the recent level and
+              trend of the price, recent days count more than old ones
+
+How is the best model chosen? (rolling-origin backtest)
+- Pretend we are at an earlier day ("origin"), train on the prices before
+  it and forecast the prices after it, which we actually know
+- Do that for a few origins (e.g. 3) and average the errors (MAE)
+- The model with the smallest error wins
+- Too little history for a backtest -> the linear model is used
+
+Latency budget:
+- Every fit is timed during the backtest
+- A model whose fit takes longer than MODEL_LATENCY_BUDGET_MS is not
+  chosen, so a prediction never gets slow because of a fancy model
+
+Prediction intervals:
+Every model has std_error(x), the standard error of its forecast for days
+x, worked out from what was kept while fitting (see estimators.py).
+Linear and seasonal use the exact least-squares formula, holt the
+standard formula for Holt's method. A new model that does not override
+std_error() gets a simple one from its training errors.
+
+Adding a model: subclass ForecastModel and call register_model(MyModel).
+
+================================================================================
+"""
+
+import os
+import time
+
+import numpy as np
+
+from modules.estimators import NumpyLinearTrend, make_estimator, r2_from_errors
+
+
+# Slowest fit (milliseconds) a model may need to be chosen
+MODEL_LATENCY_BUDGET_MS = float(os.environ.get("MODEL_LATENCY_BUDGET_MS", "25"))
+
+# Model used when none is asked for: "auto" = pick by backtest
+DEFAULT_FORECAST_MODEL = os.environ.get("PRICE_FORECAST_MODEL", "auto")
+
+# Rolling-origin backtest: number of origins and fewest daily points needed
+BACKTEST_FOLDS = 3
+BACKTEST_MIN_POINTS = 12
+
+
+class ModelNotApplicableError(ValueError):
+    """
+    Raised by fit() when a model cannot be used on this price history
+    """
+
+
+class ForecastModel:
+    """
+    WHAT IT DOES: Base class of all forecasting models
+
+    A model must implement:
+    - fit(x, y): x = days since first price, y = daily average prices
+    - predict(x): prices for any days x (usually future days)
+    - describe(): model-specific details for get_model_coefficients()
+    and set self.slope (trend in price per day) and self.intercept (price
+    of that trend line on day 0) when fitted and in set_state().
+    It may override std_error(x) for its own prediction intervals.
+    """
+
+    name = "base"
+    min_points = 2
+    parameters = 2
+
+    def __init__(self):
+        self.slope = 0.0
+        self.intercept = 0.0
+        self.n_samples_ = 0
+        self.df_ = 0
+        self.sigma_ = 0.0
+
+    def _keep_residuals(self, x, y):
+        # Residual spread on the training data, for std_error()
+        residual = np.asarray(y, dtype=np.float64) - self.predict(x)
+        self.n_samples_ = len(residual)
+        self.df_ = self.n_samples_ - self.parameters
+        self.sigma_ = float(np.sqrt(np.dot(residual, residual) / self.df_)) if self.df_ > 0 else 0.0
+
+    def std_error(self, x):
+        """
+        WHAT IT DOES: Standard error of the forecast for days x
+
+        Default: the training error spread, the same for every day
+        """
+
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        return np.full(len(x), self.sigma_ * np.sqrt(1 + 1 / max(self.n_samples_, 1)))
+
+    def fit(self, x, y):
+        raise NotImplementedError
+
+    def predict(self, x):
+        raise NotImplementedError
+
+    def describe(self):
+        return {}
+
+    def get_state(self):
+        """
+        WHAT IT DOES: The fitted parameters as plain numbers/lists (for the model store)
+        """
+
+        return {"slope": self.slope, "n_samples": self.n_samples_, "df": self.df_, "sigma": self.sigma_}
+
+    def set_state(self, state):
+        """
+        WHAT IT DOES: Restores a fitted model from get_state() - no fitting
+        """
+
+        self.slope = state["slope"]
+        self.n_samples_ = state["n_samples"]
+        self.df_ = state["df"]
+        self.sigma_ = state["sigma"]
+        return self
+
+    def evaluate(self, x, y):
+        """
+        WHAT IT DOES: MAE, MSE and R² on the given points
+        """
+
+        y = np.asarray(y, dtype=np.float64)
+        residual = y - self.predict(x)
+        sse = np.dot(residual, residual)
+        centered = y - y.mean()
+
+        return {
+            "mae": float(np.abs(residual).mean()),
+            "mse": float(sse / len(y)),
+            "r2": float(r2_from_errors(sse, np.dot(centered, centered)))
+        }
+
+
+class LinearTrendModel(ForecastModel):
+    """
+    WHAT IT DOES: The original straight line, fitted by the estimator engine
+    """
+
+    name = "linear"
+    min_points = 2
+
+    def __init__(self, backend=None):
+        super().__init__()
+        self.estimator = make_estimator(backend)
+
+    def fit(self, x, y):
+        X = np.asarray(x, dtype=np.float64).reshape(-1, 1)
+        self.estimator.fit(X, y)
+        self._set_line()
+        self.n_samples_ = self.estimator.n_samples_
+        self.df_ = self.estimator.df_
+        self.sigma_ = self.estimator.sigma_
+        return self
+
+    def _set_line(self):
+        # coef_ is per SCALED day: divide by the scale for price per day
+        self.slope = float(self.estimator.coef_[0] / self.estimator.scale_)
+        self.intercept = float(self.estimator.intercept_ - self.slope * self.estimator.mean_)
+
+    def predict(self, x):
+        return np.asarray(self.estimator.predict(np.asarray(x, dtype=np.float64).reshape(-1, 1)), dtype=np.float64)
+
+    def std_error(self, x):
+        return self.estimator.std_error(x)
+
+    def get_state(self):
+        return dict(super().get_state(), estimator=self.estimator.get_state())
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.estimator = NumpyLinearTrend.from_state(state["estimator"])
+        self._set_line()
+        return self
+
+
+class SeasonalTrendModel(ForecastModel):
+    """
+    WHAT IT DOES: Straight line + monthly and yearly cycles (least squares)
+
+    FORMULA:
+    price = a + b*day + Σ (c_k * sin(2π*day/P_k) + d_k * cos(2π*day/P_k))
+    for every cycle length P_k (30.4 and 365.25 days) that the history
+    covers at least twice.
+    """
+
+    name = "seasonal"
+    min_points = 6
+    periods = {"monthly": 30.4375, "yearly": 365.25}
+
+    def __init__(self):
+        super().__init__()
+        self.used_periods = {}
+        self.coefficients = None
+
+    def _design(self, x):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        columns = [np.ones_like(x), x / 365.25]
+        for period in self.used_periods.values():
+            angle = 2 * np.pi * x / period
+            columns.append(np.sin(angle))
+            columns.append(np.cos(angle))
+        return np.column_stack(columns)
+
+    def fit(self, x, y):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        span = x.max() - x.min()
+        self.used_periods = {
+            name: period for name, period in self.periods.items() if span >= 2 * period
+        }
+        if not self.used_periods:
+            raise ModelNotApplicableError("History too short for a seasonal cycle")
+
+        design = self._design(x)
+        if len(x) < design.shape[1] + 2:
+            raise ModelNotApplicableError("Too few prices for a seasonal model")
+
+        self.coefficients = np.linalg.lstsq(design, np.asarray(y, dtype=np.float64), rcond=None)[0]
+        self.slope = float(self.coefficients[1] / 365.25)
+        self.intercept = float(self.coefficients[0])
+
+        # (DᵀD)⁻¹ gives the uncertainty of the coefficients
+        self.parameters = design.shape[1]
+        self.covariance = np.linalg.pinv(design.T @ design)
+        self._keep_residuals(x, y)
+        return self
+
+    def predict(self, x):
+        return self._design(x) @ self.coefficients
+
+    def std_error(self, x):
+        # sigma * sqrt(1 + dᵀ (DᵀD)⁻¹ d) for every row d of the design
+        design = self._design(x)
+        leverage = np.einsum("ij,jk,ik->i", design, self.covariance, design)
+        return self.sigma_ * np.sqrt(1 + leverage)
+
+    def get_state(self):
+        return dict(
+            super().get_state(),
+            periods=self.used_periods,
+            coefficients=self.coefficients.tolist(),
+            covariance=self.covariance.tolist()
+        )
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.used_periods = state["periods"]
+        self.coefficients = np.array(state["coefficients"])
+        self.covariance = np.array(state["covariance"])
+        self.parameters = len(self.coefficients)
+        self.intercept = float(self.coefficients[0])
+        return self
+
+    def describe(self):
+        # Amplitude = how far the cycle moves the price up and down
+        seasonality = {}
+        for i, (name, period) in enumerate(self.used_periods.items()):
+            sin, cos = self.coefficients[2 + 2 * i:4 + 2 * i]
+            seasonality[name] = {
+                "period_days": period,
+                "amplitude": round(float(np.hypot(sin, cos)), 2)
+            }
+        return {"seasonality": seasonality}
+
+
+class HoltTrendModel(ForecastModel):
+    """
+    WHAT IT DOES: Holt's linear exponential smoothing
+
+    The prices are first filled in for every day (straight lines between
+    known days). Then, day by day:
+    - level = alpha * price + (1 - alpha) * (level + trend)
+    - trend = beta * (level - previous level) + (1 - beta) * trend
+    Forecast h days after the last price: level + h * trend
+    For days inside the history, predict() gives the one-step-ahead
+    forecast made the day before (what the model "expected" that day).
+
+    alpha and beta are chosen from a small grid by the smallest one-step
+    error; all grid combinations run together as NumPy arrays.
+    """
+
+    name = "holt"
+    min_points = 4
+    alphas = np.array([0.1, 0.3, 0.5, 0.8])
+    betas = np.array([0.02, 0.1, 0.3])
+
+    def __init__(self):
+        super().__init__()
+        self.level = 0.0
+        self.last_x = 0.0
+        self.alpha = None
+        self.beta = None
+
+    def fit(self, x, y):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) < self.min_points:
+            raise ModelNotApplicableError("Too few prices for exponential smoothing")
+
+        # One value per day between the first and the last price
+        grid_x = np.arange(x.min(), x.max() + 1)
+        series = np.interp(grid_x, x, y)
+
+        alpha, beta = np.meshgrid(self.alphas, self.betas)
+        alpha, beta = alpha.ravel(), beta.ravel()
+
+        level = np.full(alpha.shape, series[0])
+        trend = np.full(alpha.shape, series[1] - series[0])
+        sse = np.zeros(alpha.shape)
+        fitted = np.empty((len(series), len(alpha)))
+        fitted[0] = series[0]
+        for i, value in enumerate(series[1:], start=1):
+            forecast = level + trend
+            fitted[i] = forecast
+            sse += (value - forecast) ** 2
+            new_level = alpha * value + (1 - alpha) * forecast
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            level = new_level
+
+        best = int(np.argmin(sse))
+        self.alpha, self.beta = float(alpha[best]), float(beta[best])
+        self.level = float(level[best])
+        self.slope = float(trend[best])
+        self.last_x = float(grid_x[-1])
+        # The forecast line level + trend * (x - last_x), written as a line from day 0
+        self.intercept = self.level - self.slope * self.last_x
+        self.grid_x = grid_x
+        self.fitted = fitted[:, best]
+
+        # One-step-ahead errors give the spread of a 1-day forecast
+        self.n_samples_ = len(x)
+        self.df_ = len(x) - 2
+        self.sigma_ = float(np.sqrt(sse[best] / (len(series) - 1)))
+        return self
+
+    def predict(self, x):
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        future = self.level + self.slope * (x - self.last_x)
+        return np.where(x > self.last_x, future, np.interp(x, self.grid_x, self.fitted))
+
+    def std_error(self, x):
+        # h days ahead: sigma² * (1 + (h-1) * (α² + αβh + β²h(2h-1)/6))
+        # where β is the state-space trend weight α·β* (fit() uses the
+        # smoothing weight β*, so it is converted here)
+        h = np.maximum(np.asarray(x, dtype=np.float64).reshape(-1) - self.last_x, 1)
+        a, b = self.alpha, self.alpha * self.beta
+        growth = (h - 1) * (a * a + a * b * h + b * b * h * (2 * h - 1) / 6)
+        return self.sigma_ * np.sqrt(1 + growth)
+
+    def describe(self):
+        return {"alpha": self.alpha, "beta": self.beta, "level": round(self.level, 2)}
+
+    def get_state(self):
+        # The in-history fitted values are kept at 2 decimals (they are prices)
+        return dict(
+            super().get_state(),
+            alpha=self.alpha,
+            beta=self.beta,
+            level=self.level,
+            last_x=self.last_x,
+            first_x=float(self.grid_x[0]),
+            fitted=np.round(self.fitted, 2).tolist()
+        )
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.alpha = state["alpha"]
+        self.beta = state["beta"]
+        self.level = state["level"]
+        self.last_x = state["last_x"]
+        self.intercept = self.level - self.slope * self.last_x
+        self.fitted = np.array(state["fitted"])
+        self.grid_x = state["first_x"] + np.arange(len(self.fitted))
+        return self
+
+
+# Registry: model name -> class
+FORECAST_MODELS = {}
+
+
+def register_model(model_class):
+    """
+    WHAT IT DOES: Makes a ForecastModel subclass available by its name
+    """
+
+    FORECAST_MODELS[model_class.name] = model_class
+    return model_class
+
+
+for _model_class in (LinearTrendModel, SeasonalTrendModel, HoltTrendModel):
+    register_model(_model_class)
+
+
+def make_model(name, backend=None):
+    """
+    WHAT IT DOES: Creates an (unfitted) model by name
+    """
+
+    if name not in FORECAST_MODELS:
+        raise ValueError(f"Unknown forecast model '{name}'. Choose from: auto, {', '.join(FORECAST_MODELS)}")
+    if name == "linear":
+        return LinearTrendModel(backend)
+    return FORECAST_MODELS[name]()
+
+
+def restore_model(name, state):
+    """
+    WHAT IT DOES: Rebuilds a fitted model from its stored state (see get_state)
+    """
+
+    return make_model(name, "numpy").set_state(state)
+
+
+def _timed_fit(model, x, y):
+    start = time.perf_counter()
+    model.fit(x, y)
+    return (time.perf_counter() - start) * 1000
+
+
+def backtest(name, x, y, folds=BACKTEST_FOLDS, backend=None):
+    """
+    WHAT IT DOES: Rolling-origin backtest of one model
+
+    The last part of the history is cut into `folds` equal windows. For each
+    window the model is trained on everything before it and predicts the
+    prices inside it.
+
+    RETURNS: {"mae": average error, "fit_ms": slowest fit} or None if the
+    model cannot be used on this history
+    """
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Test windows cover the last third of the history
+    window = max(1.0, (x[-1] - x[0]) / (3 * folds))
+    errors = []
+    slowest = 0.0
+
+    for fold in range(folds, 0, -1):
+        origin = x[-1] - fold * window
+        train = x <= origin
+        test = (x > origin) & (x <= origin + window)
+        if train.sum() < 2 or not test.any():
+            continue
+
+        model = make_model(name, backend)
+        try:
+            slowest = max(slowest, _timed_fit(model, x[train], y[train]))
+        except ModelNotApplicableError:
+            return None
+        errors.append(np.abs(y[test] - model.predict(x[test])))
+
+    if not errors:
+        return None
+
+    return {"mae": float(np.concatenate(errors).mean()), "fit_ms": slowest}
+
+
+def select_model(x, y, budget_ms=None, backend=None):
+    """
+    WHAT IT DOES: Picks the model with the smallest backtest error that
+    stays within the latency budget
+
+    RETURNS: (model name, backtest report)
+    - report: {model name: {"mae", "fit_ms", "within_budget"}}
+    The linear model is used when the history is too short to backtest.
+    """
+
+    budget_ms = MODEL_LATENCY_BUDGET_MS if budget_ms is None else budget_ms
+
+    if len(x) < BACKTEST_MIN_POINTS:
+        return "linear", {}
+
+    report = {}
+    for name in FORECAST_MODELS:
+        result = backtest(name, x, y, backend=backend)
+        if result is None:
+            continue
+        result["within_budget"] = result["fit_ms"] <= budget_ms
+        result["mae"] = round(result["mae"], 2)
+        result["fit_ms"] = round(result["fit_ms"], 3)
+        report[name] = result
+
+    candidates = [name for name, result in report.items() if result["within_budget"]]
+    if not candidates:
+        return "linear", report
+
+    return min(candidates, key=lambda name: report[name]["mae"]), report
+
+
+def fit_model(x, y, model_type=None, backend=None, budget_ms=None):
+    """
+    WHAT IT DOES: Chooses (if model_type is "auto") and fits a forecasting model
+
+    RETURNS: (fitted model, info)
+    - info: {"model", "fit_ms" (selection + final fit), "selection" (backtest report)}
+    A chosen model that does not apply to the full history, or whose fit on
+    the full history takes longer than the latency budget, falls back to
+    linear ("fallback" in info says why).
+    """
+
+    model_type = model_type or DEFAULT_FORECAST_MODEL
+    budget_ms = MODEL_LATENCY_BUDGET_MS if budget_ms is None else budget_ms
+    start = time.perf_counter()
+
+    report = {}
+    if model_type == "auto":
+        model_type, report = select_model(x, y, budget_ms, backend)
+
+    fallback = None
+    model = make_model(model_type, backend)
+    try:
+        # The backtest only timed fits on part of the history: check the full one too
+        if model.name != "linear" and _timed_fit(model, x, y) > budget_ms:
+            fallback = f"{model.name} fit over the {budget_ms:g} ms budget"
+    except ModelNotApplicableError as error:
+        fallback = str(error)
+
+    if fallback is not None:
+        model = make_model("linear", backend)
+        model.fit(x, y)
+
+    info = {
+        "model": model.name,
+        "fit_ms": round((time.perf_counter() - start) * 1000, 3),
+        "selection": report
+    }
+    if fallback is not None:
+        info["fallback"] = fallback
+    return model, info
@@ -0,0 +1,117 @@
+"""
+================================================================================
+MODEL STORE MODULE - model_store.py
+
+EXPLANATION:
+This module saves trained models in the database, so a model trained once
+is reused by every server process and survives restarts.
+
+What is stored? (an "artifact", table model_artifacts)
+- The fitted numbers: slope/intercept, scaler statistics (mean and
+  spread of the days), the chosen model and its parameters
+- Training metrics and evaluation (MAE, RMSE, R²...)
+- First and last training date
+- The data version: fingerprint of the price history it was trained on
+No price data is stored, so loading is one indexed row + a small JSON
+document, and rebuilding the model needs no fitting at all.
+
+Stale artifacts:
+- The current data version is compared with the stored one
+- Different -> the prices changed since training, the artifact is ignored
+  and the caller trains (and stores) a new model
+
+================================================================================
+"""
+
+import json
+import threading
+import time
+
+from modules.database import save_model_artifact, get_model_artifact
+from modules.ml_predictor import PricePredictionModel
+
+
+class _StoreStats:
+    # Counters for get_model_store_stats()
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.saves = 0
+        self.load_seconds = 0.0
+
+    def count(self, name, seconds=0.0):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self.load_seconds += seconds
+
+
+_stats = _StoreStats()
+
+
+def version_key(version):
+    """
+    WHAT IT DOES: Price history version (a tuple) as text for the database
+    """
+
+    return json.dumps(list(version))
+
+
+def save_model(product_id, model_type, version, model, evaluation):
+    """
+    WHAT IT DOES: Stores a trained PricePredictionModel and its evaluation
+    """
+
+    document = json.dumps({"model": model.to_artifact(), "evaluation": evaluation})
+    save_model_artifact(product_id, model_type, version_key(version), document)
+    _stats.count("saves")
+
+
+def load_model(product_id, model_type, version):
+    """
+    WHAT IT DOES: Rebuilds a stored model if it was trained on this data version
+
+    RETURNS: {"model", "evaluation", "model_info", "version", "trained_at"}
+    or None if nothing is stored or the stored model is stale
+    """
+
+    start = time.perf_counter()
+    row = get_model_artifact(product_id, model_type)
+
+    if row is None:
+        _stats.count("misses", time.perf_counter() - start)
+        return None
+
+    data_version, document, trained_at = row
+    if data_version != version_key(version):
+        _stats.count("stale", time.perf_counter() - start)
+        return None
+
+    stored = json.loads(document)
+    model = PricePredictionModel.from_artifact(stored["model"])
+    _stats.count("hits", time.perf_counter() - start)
+
+    return {
+        "model": model,
+        "evaluation": stored["evaluation"],
+        "model_info": model.model_info,
+        "version": version,
+        "trained_at": trained_at
+    }
+
+
+def get_model_store_stats():
+    """
+    WHAT IT DOES: Returns hits, misses, stale artifacts, saves and average load time
+    """
+
+    with _stats.lock:
+        lookups = _stats.hits + _stats.misses + _stats.stale
+        return {
+            "hits": _stats.hits,
+            "misses": _stats.misses,
+            "stale": _stats.stale,
+            "saves": _stats.saves,
+            "avg_load_ms": round(_stats.load_seconds * 1000 / lookups, 4) if lookups else 0.0
+        }
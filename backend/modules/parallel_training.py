@@ -0,0 +1,214 @@
+"""
+================================================================================
+PARALLEL TRAINING MODULE - parallel_training.py
+
+EXPLANATION:
+This module trains one PricePredictionModel per product on ALL CPU cores.
+
+Why processes and not threads?
+- Fitting a model is pure number crunching (CPU-bound)
+- Python threads take turns on one core (the GIL), so 8 threads are not
+  faster than 1 for this kind of work
+- Separate processes each have their own interpreter and really run at
+  the same time, one per core
+
+Why shared memory?
+- Normally every argument sent to a process is pickled (copied into bytes)
+- A big catalogue would be copied once for every chunk of work
+- Instead the price arrays are put ONCE into shared memory blocks;
+  the processes open the same blocks and read them without copying
+- Results are written back into a shared output array the same way
+
+How the work is split:
+- Prices are sorted by product, so every product is one slice of the arrays
+- The products are cut into chunks with about the same number of prices
+  (a few chunks per core so a slow chunk does not hold everybody up)
+- Each process trains the products in its chunk and writes slope,
+  intercept and metrics into its rows of the output array
+
+The result has the same layout as batch_forecast.fit_all_trends().
+
+================================================================================
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from modules.ml_predictor import PricePredictionModel
+
+
+# Chunks per worker process (more chunks = better balance, more overhead)
+CHUNKS_PER_WORKER = 4
+
+# Output columns written by the workers
+RESULT_COLUMNS = ["slope", "intercept", "r2", "mae", "mse", "last_day"]
+
+
+def default_workers():
+    """
+    WHAT IT DOES: Number of CPU cores this process may use
+    """
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _share(array):
+    """
+    Copies an array into a new shared memory block
+
+    RETURNS: (block, description) - the description (name, dtype, shape)
+    is all another process needs to open the same array
+    """
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block, (block.name, array.dtype.str, array.shape)
+
+
+def _attach(description):
+    """
+    Opens an array shared by _share() (no copy)
+    """
+    name, dtype, shape = description
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _train_chunk(days_info, prices_info, starts_info, output_info, first, last, backend):
+    """
+    Runs in a worker process: trains products first..last-1 and writes
+    their results into the shared output array
+    """
+    blocks = []
+    arrays = []
+    try:
+        for info in (days_info, prices_info, starts_info, output_info):
+            block, array = _attach(info)
+            blocks.append(block)
+            arrays.append(array)
+        days, prices, starts, output = arrays
+
+        for i in range(first, last):
+            product_days = days[starts[i]:starts[i + 1]]
+            product_prices = prices[starts[i]:starts[i + 1]]
+
+            # Average price per day (same as prepare_data)
+            unique_days, position = np.unique(product_days, return_inverse=True)
+            daily = np.bincount(position, weights=product_prices) / np.bincount(position)
+            X = (unique_days - unique_days[0]).reshape(-1, 1)
+
+            model = PricePredictionModel(backend=backend)
+            model.train(X, daily)
+            metrics = model.training_metrics
+
+            # The engine works on the scaled day, convert back to price per day
+            slope = model.model.coef_[0] / model.model.scale_
+            intercept = model.model.intercept_ - slope * model.model.mean_
+
+            output[i] = (slope, intercept, metrics["r2"], metrics["mae"], metrics["mse"], X[-1, 0])
+
+        return last - first
+    finally:
+        # Views must be dropped before the blocks can be closed
+        arrays = days = prices = starts = output = product_days = product_prices = None
+        for block in blocks:
+            block.close()
+
+
+def _partition(starts, parts):
+    """
+    Cuts products into at most `parts` ranges with about equal numbers of prices
+
+    RETURNS: List of (first product, last product + 1)
+    """
+    products = len(starts) - 1
+    targets = np.linspace(0, starts[-1], parts + 1)[1:-1]
+    cuts = np.searchsorted(starts, targets)
+    bounds = np.unique(np.concatenate(([0], cuts, [products])))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def train_all_products(product_ids, dates, prices, workers=None, backend=None):
+    """
+    WHAT IT DOES: Trains one model per product in a pool of worker processes
+
+    PARAMETERS:
+    - product_ids, dates (YYYY-MM-DD), prices: One entry per price record
+    - workers: Number of processes (default: all CPU cores)
+    - backend: Model engine for PricePredictionModel ("numpy" or "sklearn")
+
+    RETURNS: Dictionary of arrays, one entry per product (same layout as
+    batch_forecast.fit_all_trends):
+    - product_id, records, first_date, last_day, slope, intercept, r2, mae, mse
+    - plus "timings" (seconds spent sharing, training and collecting)
+    """
+
+    workers = workers or default_workers()
+    start = time.perf_counter()
+
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(product_ids) == 0:
+        raise ValueError("No price records to train on")
+
+    # Step 1: Sort by product so every product is one slice
+    order = np.argsort(product_ids, kind="stable")
+    product_ids, days, prices = product_ids[order], days[order], prices[order]
+
+    change = np.flatnonzero(product_ids[1:] != product_ids[:-1]) + 1
+    starts = np.concatenate(([0], change, [len(product_ids)])).astype(np.int64)
+    products = len(starts) - 1
+
+    # Step 2: Put inputs and the (empty) output into shared memory
+    blocks = []
+    try:
+        infos = []
+        for array in (days, prices, starts, np.zeros((products, len(RESULT_COLUMNS)))):
+            block, info = _share(array)
+            blocks.append(block)
+            infos.append(info)
+        shared = time.perf_counter()
+
+        # Step 3: Train the chunks in parallel
+        chunks = _partition(starts, workers * CHUNKS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = [
+                pool.submit(_train_chunk, *infos, first, last, backend)
+                for first, last in chunks
+            ]
+            for future in futures:
+                future.result()
+        trained = time.perf_counter()
+
+        # Step 4: Copy the results out before the shared blocks are freed
+        output = np.ndarray((products, len(RESULT_COLUMNS)), dtype=np.float64, buffer=blocks[3].buf).copy()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    first_day = np.minimum.reduceat(days, starts[:-1])
+
+    result = {
+        "product_id": product_ids[starts[:-1]],
+        "records": np.diff(starts),
+        "first_date": first_day.astype("datetime64[D]"),
+    }
+    for column, name in enumerate(RESULT_COLUMNS):
+        result[name] = output[:, column]
+
+    result["timings"] = {
+        "workers": workers,
+        "chunks": len(chunks),
+        "share_seconds": round(shared - start, 3),
+        "train_seconds": round(trained - shared, 3),
+        "total_seconds": round(time.perf_counter() - start, 3),
+    }
+    return result
@@ -0,0 +1,418 @@
+"""
+================================================================================
+RATE LIMITER MODULE - rate_limiter.py
+
+EXPLANATION:
+This module decides WHEN each request to a retailer website may go out.
+Every outbound request of the process goes through one shared scheduler.
+
+Why do we need it?
+- Retailers block clients that send too many requests too quickly
+- The old limiter made the scraping thread sleep until its slot came up,
+  so ten searches at once meant ten threads parked in time.sleep()
+- Nothing bounded the TOTAL rate, and a background refresh was just as
+  urgent as a user waiting for an answer
+
+How it works:
+1. Token buckets:
+   - Every retailer has a bucket that fills with `rate` tokens per second,
+     up to `burst` tokens; sending a request takes one token
+   - One global bucket bounds the requests of ALL retailers together,
+     however many users are searching
+2. Priority lanes:
+   - INTERACTIVE: a user is waiting for the answer
+   - BACKGROUND: refreshes nobody is waiting for
+   - When a token frees up, interactive requests always go first
+3. No sleeping threads:
+   - submit() only puts the request in a queue and returns a Future
+   - ONE dispatcher thread hands requests to the worker pool the moment
+     both buckets have a token, and otherwise waits for the next token
+   - Worker threads only ever run real requests
+4. Load-shedding:
+   - Each lane of each retailer holds at most MAX_QUEUE requests; more
+     are refused right away (RequestShed) instead of piling up
+   - A request that waited longer than MAX_WAIT is dropped, its caller
+     has given up on it by then
+   - Cancelled requests (caller stopped waiting) never go out
+5. Metrics (stats()): queue depths, requests sent / shed / cancelled,
+   queue wait percentiles and the tokens left in every bucket
+
+Configuration (environment variables):
+- OUTBOUND_GLOBAL_RATE: requests per second to all retailers together (default 4)
+- OUTBOUND_GLOBAL_BURST: requests allowed at once after a quiet period (default 6)
+- OUTBOUND_WORKERS: threads that run the requests (default 8)
+
+================================================================================
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+
+OUTBOUND_GLOBAL_RATE = float(os.environ.get("OUTBOUND_GLOBAL_RATE", "4"))
+OUTBOUND_GLOBAL_BURST = float(os.environ.get("OUTBOUND_GLOBAL_BURST", "6"))
+OUTBOUND_WORKERS = int(os.environ.get("OUTBOUND_WORKERS", "8"))
+
+# Priority lanes, most urgent first
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+# Most requests waiting per retailer and lane
+MAX_QUEUE = {INTERACTIVE: 32, BACKGROUND: 8}
+
+# Most seconds a request may wait for its turn before it is dropped
+MAX_WAIT = {INTERACTIVE: 10, BACKGROUND: 60}
+
+# Rate used for retailers nobody configured (requests per second, burst)
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 2
+
+# Queue waits remembered per retailer for the percentiles
+WAIT_WINDOW = 200
+
+
+class RequestShed(Exception):
+    """
+    Raised (through the Future) for a request the scheduler refused to send
+    """
+
+
+class TokenBucket:
+    """
+    WHAT IT DOES: Allows `rate` events per second on average, and up to
+    `burst` events at once after a quiet period
+
+    A rate of 0 (or less) means unlimited. Not thread safe on its own,
+    the scheduler calls it under its lock.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now):
+        """
+        RETURNS: Seconds until a token is available (0 = one is there now)
+        """
+
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        """
+        WHAT IT DOES: Uses up one token (call wait_time() first)
+        """
+
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens -= 1
+
+    def available(self, now):
+        if self.rate <= 0:
+            return None
+        self._refill(now)
+        return round(self.tokens, 2)
+
+
+class _Host:
+    # Bucket, lanes and counters of one retailer
+
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.queues = {lane: deque() for lane in LANES}
+        self.waits = deque(maxlen=WAIT_WINDOW)
+        self.submitted = {lane: 0 for lane in LANES}
+        self.sent = {lane: 0 for lane in LANES}
+        self.shed = {"queue_full": 0, "expired": 0}
+        self.cancelled = 0
+
+
+class OutboundScheduler:
+    """
+    WHAT IT DOES: Shared queue that sends requests to retailer websites
+    within per-retailer and global token-bucket rate limits
+
+    PARAMETERS:
+    - global_rate / global_burst: Bucket shared by all retailers
+    - max_workers: Threads that run the requests
+
+    USAGE:
+        future = outbound_scheduler.submit("Amazon", adapter.search, "iPhone 15")
+        item = future.result()   # raises RequestShed if it was refused
+    """
+
+    def __init__(self, global_rate=OUTBOUND_GLOBAL_RATE, global_burst=OUTBOUND_GLOBAL_BURST,
+                 max_workers=OUTBOUND_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._global = TokenBucket(global_rate, global_burst)
+        self._hosts = {}
+        self._cond = threading.Condition()
+        self._pool = None
+        self._thread = None
+        self._stopped = False
+        self._in_flight = 0
+
+    # ------------------------------------------------------------------
+    # Configuration
+    # ------------------------------------------------------------------
+
+    def configure(self, host, rate, burst=DEFAULT_BURST):
+        """
+        WHAT IT DOES: Sets the rate limit of one retailer (0 = unlimited);
+        requests already waiting are kept
+        """
+
+        with self._cond:
+            if host in self._hosts:
+                self._hosts[host].bucket = TokenBucket(rate, burst)
+            else:
+                self._hosts[host] = _Host(rate, burst)
+            self._cond.notify()
+
+    def configure_global(self, rate, burst):
+        """
+        WHAT IT DOES: Sets the rate limit of all retailers together (0 = unlimited)
+        """
+
+        with self._cond:
+            self._global = TokenBucket(rate, burst)
+            self._cond.notify()
+
+    # ------------------------------------------------------------------
+    # Submitting requests
+    # ------------------------------------------------------------------
+
+    def submit(self, host, function, *args, priority=INTERACTIVE, max_wait=None):
+        """
+        WHAT IT DOES: Queues function(*args) to run when the host's turn comes
+
+        PARAMETERS:
+        - host: Retailer name (whose bucket the request uses)
+        - priority: INTERACTIVE or BACKGROUND
+        - max_wait: Seconds the request may wait (default MAX_WAIT[priority])
+
+        RETURNS: A Future with function's result. It fails with RequestShed
+        if the lane is full or the request waited too long. Cancelling the
+        Future while it waits means the request is never sent.
+        """
+
+        if priority not in MAX_QUEUE:
+            raise ValueError(f"Unknown priority: {priority}")
+
+        future = Future()
+        now = time.monotonic()
+        deadline = now + (MAX_WAIT[priority] if max_wait is None else max_wait)
+
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Outbound scheduler is stopped")
+            self._start()
+
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _Host(DEFAULT_RATE, DEFAULT_BURST)
+
+            state.submitted[priority] += 1
+            lane = state.queues[priority]
+            if len(lane) >= MAX_QUEUE[priority]:
+                state.shed["queue_full"] += 1
+                future.set_exception(RequestShed(f"{host}: {priority} queue is full ({len(lane)} waiting)"))
+                return future
+
+            lane.append((future, function, args, now, deadline))
+            self._cond.notify()
+
+        # A cancelled request leaves the queue right away
+        future.add_done_callback(self._wake)
+        return future
+
+    def _wake(self, future):
+        if future.cancelled():
+            with self._cond:
+                self._cond.notify()
+
+    def run(self, host, function, *args, priority=INTERACTIVE, max_wait=None):
+        """
+        WHAT IT DOES: submit() and wait for the result (raises RequestShed if refused)
+        """
+
+        return self.submit(host, function, *args, priority=priority, max_wait=max_wait).result()
+
+    # ------------------------------------------------------------------
+    # The dispatcher
+    # ------------------------------------------------------------------
+
+    def _start(self):
+        # Started on first use (called under the lock)
+        if self._thread is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="outbound")
+            self._thread = threading.Thread(target=self._dispatch_loop, name="outbound-dispatcher",
+                                            daemon=True)
+            self._thread.start()
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._stopped:
+                self._cond.wait(self._dispatch())
+
+    def _dispatch(self):
+        """
+        Sends every request that has its tokens, most urgent lane first
+
+        RETURNS: Seconds until something may change (None = wait for submit)
+        """
+
+        wake = None
+        progress = True
+        while progress:
+            progress = False
+            now = time.monotonic()
+            wake = None
+
+            for lane in LANES:
+                for host, state in self._hosts.items():
+                    queue = state.queues[lane]
+                    self._drop_dead(host, state, queue, now)
+                    if not queue:
+                        continue
+
+                    # Wake up in time to shed a request when it expires
+                    wait = max(state.bucket.wait_time(now), self._global.wait_time(now))
+                    if wait:
+                        wait = min(wait, min(item[4] for item in queue) - now)
+                    if wait > 0:
+                        wake = wait if wake is None else min(wake, wait)
+                        continue
+
+                    state.bucket.take(now)
+                    self._global.take(now)
+                    future, function, args, queued_at, _ = queue.popleft()
+                    state.waits.append(now - queued_at)
+                    state.sent[lane] += 1
+                    self._in_flight += 1
+                    self._pool.submit(self._run, future, function, args)
+                    progress = True
+
+        return wake
+
+    def _drop_dead(self, host, state, queue, now):
+        # Remove cancelled and expired requests from a lane
+        alive = []
+        for item in queue:
+            future, _, _, queued_at, deadline = item
+            if future.cancelled():
+                state.cancelled += 1
+            elif now >= deadline:
+                if self._refuse(future, RequestShed(f"{host}: waited {now - queued_at:.1f}s for a turn")):
+                    state.shed["expired"] += 1
+                else:
+                    state.cancelled += 1
+            else:
+                alive.append(item)
+
+        if len(alive) < len(queue):
+            queue.clear()
+            queue.extend(alive)
+
+    @staticmethod
+    def _refuse(future, error):
+        # Fails a waiting request. The caller may cancel() it at the same
+        # moment: set_running_or_notify_cancel() claims the future first, so
+        # set_exception() can never hit an already-cancelled one.
+        # Returns False if the caller cancelled first.
+        if not future.set_running_or_notify_cancel():
+            return False
+        future.set_exception(error)
+        return True
+
+    def _run(self, future, function, args):
+        # Runs in a worker thread
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+
+    # ------------------------------------------------------------------
+    # Stopping and metrics
+    # ------------------------------------------------------------------
+
+    def stop(self):
+        """
+        WHAT IT DOES: Refuses everything still waiting and stops the threads
+        """
+
+        with self._cond:
+            self._stopped = True
+            for host, state in self._hosts.items():
+                for queue in state.queues.values():
+                    while queue:
+                        self._refuse(queue.popleft()[0], RequestShed(f"{host}: scheduler stopped"))
+            self._cond.notify_all()
+            thread, pool = self._thread, self._pool
+
+        if thread is not None:
+            thread.join(5)
+            pool.shutdown(wait=False)
+
+    def stats(self):
+        """
+        WHAT IT DOES: Queue depths, counters, queue waits and tokens per retailer
+        """
+
+        with self._cond:
+            now = time.monotonic()
+            hosts = {}
+            for host, state in self._hosts.items():
+                waits = np.array(state.waits)
+                hosts[host] = {
+                    "rate": state.bucket.rate,
+                    "burst": state.bucket.burst,
+                    "tokens": state.bucket.available(now),
+                    "queued": {lane: len(queue) for lane, queue in state.queues.items()},
+                    "submitted": dict(state.submitted),
+                    "sent": dict(state.sent),
+                    "shed": dict(state.shed),
+                    "cancelled": state.cancelled,
+                    "queue_wait": dict(
+                        {f"p{p}": round(float(np.percentile(waits, p)), 4) for p in (50, 95, 99)}
+                        if len(waits) else {},
+                        samples=len(waits)
+                    )
+                }
+
+            return {
+                "global": {
+                    "rate": self._global.rate,
+                    "burst": self._global.burst,
+                    "tokens": self._global.available(now)
+                },
+                "in_flight": self._in_flight,
+                "queued": sum(sum(h["queued"].values()) for h in hosts.values()),
+                "sent": sum(sum(h["sent"].values()) for h in hosts.values()),
+                "shed": sum(sum(h["shed"].values()) for h in hosts.values()),
+                "hosts": hosts
+            }
+
+
+# One scheduler for every outbound request of this process
+outbound_scheduler = OutboundScheduler()
@@ -0,0 +1,233 @@
+"""
+================================================================================
+RETAILER HEALTH MODULE - retailer_health.py
+
+EXPLANATION:
+This module keeps track of how well every retailer website is doing, so
+one slow or blocking website cannot slow down every search.
+
+The problem:
+- Every request waited up to a fixed 10 seconds for the website
+- A website that is down (or blocking us) was asked again and again,
+  adding those 10 seconds to EVERY /api/compare-prices call
+
+1. Adaptive timeouts:
+- The response times of the last requests are remembered
+- The timeout is a multiple of the 95th percentile of those times
+  (e.g. a site that normally answers in 0.4 s gets ~1 s instead of 10 s)
+- Until enough requests were seen, the retailer's normal timeout is used
+- A request that timed out counts as a response time of (at least) the
+  timeout, so the timeout grows again when the website slows down
+  instead of cutting off every request
+
+2. Circuit breaker (like the fuse in a house):
+- CLOSED: normal, requests are sent
+- After FAILURE_THRESHOLD failures in a row (errors, timeouts or a
+  status other than 200) the circuit OPENS: the retailer is skipped
+  right away for a cool-down period
+- After the cool-down it is HALF-OPEN: ONE request (the probe) is let
+  through with the retailer's full timeout; success closes the circuit,
+  failure opens it again with a twice as long cool-down (up to MAX_COOLDOWN)
+- Opening the circuit forgets the old response times, so timeouts start
+  from the full timeout again once the website answers
+
+"Product not found" is a normal answer and does not count as a failure.
+
+================================================================================
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+# Response times remembered per retailer
+LATENCY_WINDOW = 50
+
+# Requests needed before timeouts adapt
+MIN_LATENCY_SAMPLES = 5
+
+# Timeout = TIMEOUT_MULTIPLIER x 95th percentile, never below MIN_TIMEOUT
+TIMEOUT_PERCENTILE = 95
+TIMEOUT_MULTIPLIER = 2.5
+MIN_TIMEOUT = 1.0
+
+# Failures in a row that open the circuit, and the cool-down (seconds)
+FAILURE_THRESHOLD = 3
+COOLDOWN = 30
+MAX_COOLDOWN = 300
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RetailerHealth:
+    """
+    WHAT IT DOES: Latency tracker, adaptive timeout and circuit breaker
+    for one retailer
+
+    PARAMETERS:
+    - name: Retailer name (for messages)
+    - max_timeout: The retailer's normal timeout; adaptive timeouts never exceed it
+    """
+
+    def __init__(self, name, max_timeout=10):
+        self.name = name
+        self.max_timeout = max_timeout
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = COOLDOWN
+        self.opened_until = 0.0
+        self._probe_in_flight = False
+
+        self.requests = 0
+        self.failures = 0
+        self.skipped = 0
+        self.times_opened = 0
+        self.last_error = None
+        self.last_failure_at = None
+
+    # ------------------------------------------------------------------
+    # Timeouts
+    # ------------------------------------------------------------------
+
+    def timeout(self):
+        """
+        WHAT IT DOES: Seconds to wait for this retailer right now
+        (the half-open probe always gets the full timeout)
+        """
+
+        with self._lock:
+            if self.state != CLOSED or len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return self.max_timeout
+            p95 = float(np.percentile(self._latencies, TIMEOUT_PERCENTILE))
+        return min(self.max_timeout, max(MIN_TIMEOUT, p95 * TIMEOUT_MULTIPLIER))
+
+    # ------------------------------------------------------------------
+    # The circuit breaker
+    # ------------------------------------------------------------------
+
+    def should_skip(self):
+        """
+        WHAT IT DOES: True if a request would be skipped right now (counted
+        as skipped); unlike allow_request() it never starts a probe
+        """
+
+        with self._lock:
+            if self.state == OPEN:
+                skip = time.monotonic() < self.opened_until
+            else:
+                skip = self.state == HALF_OPEN and self._probe_in_flight
+            if skip:
+                self.skipped += 1
+            return skip
+
+    def allow_request(self):
+        """
+        WHAT IT DOES: Asks whether a request may be sent
+
+        RETURNS: True = send it (it may be the half-open probe), False = skip
+        the retailer. Every allowed request must end in record_success() or
+        record_failure().
+        """
+
+        with self._lock:
+            if self.state == OPEN and time.monotonic() >= self.opened_until:
+                self.state = HALF_OPEN
+                print(f"[HEALTH] {self.name}: cool-down over, probing")
+
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self.skipped += 1
+                    return False
+                self._probe_in_flight = True
+
+            elif self.state == OPEN:
+                self.skipped += 1
+                return False
+
+            self.requests += 1
+            return True
+
+    def record_success(self, latency):
+        """
+        WHAT IT DOES: A request got a normal answer after latency seconds
+        """
+
+        with self._lock:
+            self._latencies.append(latency)
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                print(f"[HEALTH] {self.name}: answering again, circuit closed")
+            self.state = CLOSED
+            self.cooldown = COOLDOWN
+            self._probe_in_flight = False
+
+    def record_failure(self, reason, latency=None):
+        """
+        WHAT IT DOES: A request failed (error, timeout or unexpected status)
+
+        latency: Seconds waited before giving up, for timeouts; it is
+        remembered like a response time, so the timeout can grow again
+        """
+
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = reason
+            self.last_failure_at = time.time()
+
+            if self.state == HALF_OPEN:
+                # The probe failed: open again, and wait longer this time
+                self.cooldown = min(MAX_COOLDOWN, self.cooldown * 2)
+                self._open()
+            elif self.state == CLOSED and self.consecutive_failures >= FAILURE_THRESHOLD:
+                self._open()
+            self._probe_in_flight = False
+
+    def _open(self):
+        self.state = OPEN
+        self._latencies.clear()
+        self.opened_until = time.monotonic() + self.cooldown
+        self.times_opened += 1
+        print(f"[HEALTH] {self.name}: {self.consecutive_failures} failures in a row "
+              f"({self.last_error}), skipped for {self.cooldown:.0f}s")
+
+    # ------------------------------------------------------------------
+    # Inspection
+    # ------------------------------------------------------------------
+
+    def stats(self):
+        """
+        WHAT IT DOES: State of the circuit, latency percentiles and counters
+        """
+
+        timeout = self.timeout()
+        with self._lock:
+            latencies = np.array(self._latencies)
+            percentiles = (
+                {f"p{p}": round(float(np.percentile(latencies, p)), 4) for p in (50, 95, 99)}
+                if len(latencies) else {}
+            )
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "cooldown_remaining": round(max(0.0, self.opened_until - time.monotonic()), 1)
+                if self.state == OPEN else 0.0,
+                "timeout": round(timeout, 3),
+                "latency": dict(percentiles, samples=len(latencies)),
+                "requests": self.requests,
+                "failures": self.failures,
+                "skipped": self.skipped,
+                "times_opened": self.times_opened,
+                "last_error": self.last_error,
+                "last_failure_at": self.last_failure_at
+            }
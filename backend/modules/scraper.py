@@ -12,25 +12,50 @@ Features:
 - Real-time price scraping
 - Automatic fallback to sample data if scraping fails
 - User-agent rotation to avoid blocking
-- Rate limiting to be respectful to servers
+- Rate limiting to be respectful to servers: every request goes through
+  one shared scheduler with token buckets per retailer and overall, and
+  user searches before background refreshes (see rate_limiter.py)
+- Concurrent fan-out: all retailers are searched at the same time
+- One adapter class per retailer with a pooled, keep-alive HTTP session
+- Declarative selector specs compiled to lxml XPath, parsed in worker
+  processes (see extraction.py)
+- Streaming mode: pages are parsed while they download, and the download
+  stops at the first matching product
+- Per-retailer health: adaptive timeouts and a circuit breaker that skips
+  a failing website for a while (see retailer_health.py)
 - Robust error handling
 
 ================================================================================
 """
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
 import pandas as pd
 from datetime import datetime
+import os
 import time
 import random
 import re
+import threading
+from concurrent.futures import as_completed, TimeoutError as FutureTimeout
 from fake_useragent import UserAgent
 from urllib.parse import quote_plus
 
+from modules.extraction import Selector, compile_spec, extract_results, stream_extract, close_parse_pool
+from modules.rate_limiter import outbound_scheduler, RequestShed, INTERACTIVE
+from modules.retailer_health import RetailerHealth
+
 # Initialize user agent generator
 ua = UserAgent()
 
+# Parse search pages while they download and stop at the first match
+# (SCRAPE_STREAMING=0 downloads whole pages and parses them in the worker pool)
+STREAM_PAGES = os.environ.get("SCRAPE_STREAMING", "1") != "0"
+
+# Bytes read from the network at a time in streaming mode
+STREAM_CHUNK_SIZE = 16 * 1024
+
 
 def get_headers():
     """
@@ -46,6 +71,23 @@ def get_headers():
     }
 
 
+# Words that carry no meaning in a product search
+COMMON_WORDS = ['the', 'a', 'an', 'and', 'or', 'for', 'in', 'with']
+
+
+def normalize_query(search_query):
+    """
+    Normalized form of a search, used as a cache key
+    Lowercase, extra whitespace collapsed and common words removed
+    Example: "  The iPhone 15 " -> "iphone 15"
+    """
+    if not search_query:
+        return ''
+    
+    words = [word for word in search_query.lower().split() if word not in COMMON_WORDS]
+    return ' '.join(words)
+
+
 def validate_product_match(product_title, search_query):
     """
     Check if the scraped product title matches the search query
@@ -68,8 +110,7 @@ def validate_product_match(product_title, search_query):
             return False
     
     # Extract key words from query (skip common words)
-    common_words = ['the', 'a', 'an', 'and', 'or', 'for', 'in', 'with']
-    query_words = [word for word in query_lower.split() if word not in common_words and len(word) > 2]
+    query_words = [word for word in query_lower.split() if word not in COMMON_WORDS and len(word) > 2]
     
     # Check if at least 40% of query words appear in title (relaxed from 60%)
     if not query_words:
@@ -99,247 +140,6 @@ def clean_price(price_text):
     return None
 
 
-def scrape_amazon_india(product_name):
-    """
-    Scrape real-time prices from Amazon India
-    """
-    try:
-        print(f"[*] Scraping Amazon India for: {product_name}")
-        
-        # Construct search URL
-        search_query = quote_plus(product_name)
-        url = f"https://www.amazon.in/s?k={search_query}"
-        
-        # Make request with headers
-        response = requests.get(url, headers=get_headers(), timeout=10)
-        
-        if response.status_code != 200:
-            print(f"[-] Amazon returned status code: {response.status_code}")
-            return None
-        
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        # Find product containers
-        products = soup.find_all('div', {'data-component-type': 's-search-result'})
-        
-        if not products:
-            print("[-] No products found on Amazon")
-            return None
-        
-        # Extract first product with validation
-        for product in products[:5]:  # Check first 5 results
-            try:
-                # Extract price
-                price_whole = product.find('span', {'class': 'a-price-whole'})
-                price_fraction = product.find('span', {'class': 'a-price-fraction'})
-                
-                if price_whole:
-                    price_text = price_whole.text.replace(',', '').replace('₹', '').strip()
-                    if price_fraction:
-                        price_text += '.' + price_fraction.text.strip()
-                    
-                    price = float(price_text)
-                    
-                    # Extract product title - try multiple selectors
-                    title = product.find('h2', {'class': 'a-size-mini'})
-                    if not title:
-                        title = product.find('span', {'class': 'a-size-medium'})
-                    if not title:
-                        title = product.find('span', {'class': 'a-size-base-plus'})
-                    if not title:
-                        title = product.find('h2')
-                    
-                    product_title = title.text.strip() if title else ''
-                    
-                    # Skip if title is empty or too short
-                    if len(product_title) < 5:
-                        continue
-                    
-                    # Validate product match
-                    if not validate_product_match(product_title, product_name):
-                        print(f"[SKIP] Amazon: '{product_title[:50]}' doesn't match query")
-                        continue
-                    
-                    # Get product link
-                    link_element = product.find('a', {'class': 'a-link-normal'})
-                    product_url = f"https://www.amazon.in{link_element['href']}" if link_element and 'href' in link_element.attrs else url
-                    
-                    print(f"[+] Amazon: Rs.{price} - {product_title[:50]}...")
-                    
-                    return {
-                        "name": product_title,
-                        "price": price,
-                        "link": product_url
-                    }
-            except Exception as e:
-                continue
-        
-        print("[-] Could not extract price from Amazon")
-        return None
-        
-    except Exception as e:
-        print(f"[-] Amazon scraping error: {str(e)}")
-        return None
-
-
-def scrape_flipkart(product_name):
-    """
-    Scrape real-time prices from Flipkart
-    """
-    try:
-        print(f"[*] Scraping Flipkart for: {product_name}")
-        
-        # Construct search URL
-        search_query = quote_plus(product_name)
-        url = f"https://www.flipkart.com/search?q={search_query}"
-        
-        # Make request with headers
-        response = requests.get(url, headers=get_headers(), timeout=10)
-        
-        if response.status_code != 200:
-            print(f"[-] Flipkart returned status code: {response.status_code}")
-            return None
-        
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        # Flipkart has multiple possible container classes
-        products = soup.find_all('div', {'class': ['_1AtVbE', '_2kHMtA', '_13oc-S', 'cPHDOP']})
-        
-        if not products:
-            # Try alternative container
-            products = soup.find_all('div', {'class': 'tUxRFH'})
-        
-        if not products:
-            print("[-] No products found on Flipkart")
-            return None
-        
-        # Extract first product with price and validation
-        for product in products[:7]:  # Check first 7 results
-            try:
-                # Find price element
-                price_element = product.find('div', {'class': ['_30jeq3', '_3I9_wc', 'Nx9bqj']})
-                
-                if price_element:
-                    price_text = price_element.text
-                    price = clean_price(price_text)
-                    
-                    if price:
-                        # Extract product title
-                        title_element = product.find('div', {'class': ['_4rR01T', 'KzDlHZ', 'IRpwTa']})
-                        if not title_element:
-                            title_element = product.find('a', {'class': ['IRpwTa', '_2rpwqI', 's1Q9rs']})
-                        
-                        product_title = title_element.text.strip() if title_element else ''
-                        
-                        # Validate product match
-                        if not validate_product_match(product_title, product_name):
-                            print(f"[SKIP] Flipkart: '{product_title[:50]}' doesn't match query")
-                            continue
-                        
-                        # Get product link
-                        link_element = product.find('a', {'class': ['_1fQZEK', 'CGtC98', '_2rpwqI']})
-                        if not link_element:
-                            link_element = product.find('a')
-                        
-                        product_url = f"https://www.flipkart.com{link_element['href']}" if link_element and 'href' in link_element.attrs else url
-                        
-                        print(f"[+] Flipkart: Rs.{price} - {product_title[:50]}...")
-                        
-                        return {
-                            "name": product_title,
-                            "price": price,
-                            "link": product_url
-                        }
-            except Exception as e:
-                continue
-        
-        print("[-] Could not extract price from Flipkart")
-        return None
-        
-    except Exception as e:
-        print(f"[-] Flipkart scraping error: {str(e)}")
-        return None
-
-
-def scrape_snapdeal(product_name):
-    """
-    Scrape real-time prices from Snapdeal
-    """
-    try:
-        print(f"[*] Scraping Snapdeal for: {product_name}")
-        
-        # Construct search URL
-        search_query = quote_plus(product_name)
-        url = f"https://www.snapdeal.com/search?keyword={search_query}"
-        
-        # Make request with headers
-        response = requests.get(url, headers=get_headers(), timeout=10)
-        
-        if response.status_code != 200:
-            print(f"[-] Snapdeal returned status code: {response.status_code}")
-            return None
-        
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        # Find product containers
-        products = soup.find_all('div', {'class': ['product-tuple-listing', 'favDp']})
-        
-        if not products:
-            print("[-] No products found on Snapdeal")
-            return None
-        
-        # Extract first product with validation
-        for product in products[:5]:  # Check first 5 results
-            try:
-                # Extract price
-                price_element = product.find('span', {'class': 'lfloat product-price'})
-                if not price_element:
-                    price_element = product.find('span', {'class': 'product-price'})
-                
-                if price_element:
-                    price_text = price_element.text
-                    price = clean_price(price_text)
-                    
-                    if price:
-                        # Extract product title
-                        title_element = product.find('p', {'class': 'product-title'})
-                        product_title = title_element.text.strip() if title_element else ''
-                        
-                        # Validate product match
-                        if not validate_product_match(product_title, product_name):
-                            print(f"[SKIP] Snapdeal: '{product_title[:50]}' doesn't match query")
-                            continue
-                        
-                        # Get product link
-                        link_element = product.find('a', {'class': 'dp-widget-link'})
-                        if not link_element:
-                            link_element = product.find('a')
-                        
-                        product_url = link_element['href'] if link_element and 'href' in link_element.attrs else url
-                        if not product_url.startswith('http'):
-                            product_url = f"https://www.snapdeal.com{product_url}"
-                        
-                        print(f"[+] Snapdeal: Rs.{price} - {product_title[:50]}...")
-                        
-                        return {
-                            "name": product_title,
-                            "price": price,
-                            "link": product_url
-                        }
-            except Exception as e:
-                continue
-        
-        print("[-] Could not extract price from Snapdeal")
-        return None
-        
-    except Exception as e:
-        print(f"[-] Snapdeal scraping error: {str(e)}")
-        return None
-
-
 def get_fallback_data(product_name):
     """
     Fallback sample data if real scraping fails
@@ -393,118 +193,700 @@ def get_fallback_data(product_name):
     return {"name": product_name, "price": base_price + random.randint(-5000, 10000)}
 
 
-def scrape_all_websites(product_name):
+class RetailerUnavailable(Exception):
     """
-    Search for a product on all websites and return real-time prices
-    Only returns ACTUAL scraped prices, not fake data
+    Raised by RetailerAdapter.search() when the retailer gave no usable answer
+    (network error, timeout, unexpected status, unreadable page, or skipped
+    by its circuit breaker): we do NOT know whether it has the product
+    """
+
+
+# ============================================================================
+# RETAILER ADAPTERS
+# ============================================================================
+# Every retailer is one adapter class. The base class owns everything that
+# is the same for all websites:
+# - A long-lived requests.Session with its own connection pool, so repeated
+#   searches reuse open TCP/TLS connections (keep-alive) instead of
+#   handshaking again every time
+# - A limit on how many requests may be in flight to the host at once
+# - A health tracker: timeouts adapt to how fast the website usually
+#   answers, and a website that keeps failing is skipped for a while
+# - The search flow: fetch page -> extract result cards -> build items -> validate
+#   (streaming: cards are extracted while the page downloads, and the
+#   download is cut off as soon as a card passes validation)
+#
+# A retailer adapter only says WHERE to search, WHERE things are on its
+# page (a selector spec, see extraction.py) and how to turn the extracted
+# text into a price. Adding a new website = writing one small subclass
+# and registering it.
+
+class RetailerAdapter:
+    """
+    WHAT IT DOES: Base class for searching one retailer website
     
-    Returns: Dictionary with prices from each website (or "Not Available")
+    SETTINGS (override in subclasses or pass to __init__):
+    - name: Key used in the comparison results (e.g. "Amazon")
+    - search_url: Search page URL with a {query} placeholder
+    - spec: Selector spec for the result cards (see extraction.py)
+    - max_results: How many result cards to check before giving up
+    - pool_size: Connections kept open to the host
+    - max_concurrency: Requests allowed in flight to the host at once
+    - keep_alive: Reuse connections between searches
+    - timeout: Most seconds to wait for the website (the health tracker
+      lowers it for websites that usually answer faster)
+    - streaming: Parse while downloading and stop at the first match
     """
-    print(f"\n{'='*60}")
-    print(f"[SEARCH] Searching for: {product_name}")
-    print(f"{'='*60}\n")
     
-    comparison_results = {}
+    name = None
+    label = None
+    search_url = None
+    spec = None
+    max_results = 5
+    pool_size = 4
+    max_concurrency = 4
+    keep_alive = True
+    timeout = 10
+    streaming = STREAM_PAGES
     
-    # Try scraping Amazon
-    try:
-        amazon_data = scrape_amazon_india(product_name)
-        if amazon_data:
-            comparison_results["Amazon"] = {
-                "price": amazon_data["price"],
-                "link": amazon_data["link"],
-                "available": True
-            }
-            print(f"[SUCCESS] Amazon: Rs.{amazon_data['price']}")
+    def __init__(self, pool_size=None, max_concurrency=None, keep_alive=None, timeout=None,
+                 streaming=None):
+        if pool_size is not None:
+            self.pool_size = pool_size
+        if max_concurrency is not None:
+            self.max_concurrency = max_concurrency
+        if keep_alive is not None:
+            self.keep_alive = keep_alive
+        if timeout is not None:
+            self.timeout = timeout
+        if streaming is not None:
+            self.streaming = streaming
+        
+        # Transfer counters (see transfer_stats)
+        self.pages = 0
+        self.bytes_read = 0
+        self.early_stops = 0
+        
+        self.compiled = compile_spec(self.spec)
+        self.health = RetailerHealth(self.name, max_timeout=self.timeout)
+        self.session = self._build_session()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+    
+    def _build_session(self):
+        """
+        Create the pooled HTTP session used for every request to this retailer
+        """
+        session = requests.Session()
+        pool = HTTPAdapter(
+            pool_connections=1,           # We only talk to one host
+            pool_maxsize=self.pool_size,  # Connections kept open to it
+            pool_block=True,              # Never open more than pool_size
+            max_retries=0
+        )
+        session.mount("https://", pool)
+        session.mount("http://", pool)
+        return session
+    
+    def search_link(self, product_name):
+        """
+        Search page URL for a product (also shown to users when nothing is found)
+        """
+        return self.search_url.format(query=quote_plus(product_name))
+    
+    def fetch(self, url, stream=False, timeout=None):
+        """
+        Download a page through the pooled session
+        (stream=True: only the headers are read, the body is read later)
+        """
+        headers = get_headers()
+        if not self.keep_alive:
+            headers['Connection'] = 'close'
+        
+        with self._slots:
+            return self.session.get(url, headers=headers, timeout=timeout or self.timeout, stream=stream)
+    
+    def _read_chunks(self, response, deadline):
+        """
+        The response body in chunks, counted in bytes_read
+        Raises ReadTimeout if the body is still arriving after the deadline
+        """
+        chunks = response.iter_content(STREAM_CHUNK_SIZE)
+        while True:
+            try:
+                chunk = next(chunks, None)
+            except requests.exceptions.ConnectionError as e:
+                # A socket timeout while reading the body arrives as a ConnectionError
+                if isinstance(e.args[0] if e.args else None, ReadTimeoutError):
+                    raise requests.exceptions.ReadTimeout(f"{self.name} stopped sending the page") from e
+                raise
+            if chunk is None:
+                return
+            self.bytes_read += len(chunk)
+            yield chunk
+            if time.monotonic() > deadline:
+                raise requests.exceptions.ReadTimeout(f"{self.name} page not complete within the timeout")
+    
+    def build_item(self, fields, url):
+        """
+        Turn the extracted fields of one result card into
+        {"name", "price", "link"} (or None to skip the card)
+        """
+        raise NotImplementedError
+    
+    def search(self, product_name):
+        """
+        Scrape real-time price of the best matching product from this retailer
+        
+        Returns None ONLY if the page was read and has no matching product.
+        Raises RetailerUnavailable if the retailer could not be asked or gave
+        no usable answer, so a failure is never mistaken for "not found".
+        """
+        try:
+            if not self.health.allow_request():
+                print(f"[-] {self.name} skipped: too many recent failures")
+                raise RetailerUnavailable(f"{self.name} skipped: too many recent failures")
+            
+            print(f"[*] Scraping {self.label or self.name} for: {product_name}")
+            
+            url = self.search_link(product_name)
+            timeout = self.health.timeout()
+            started = time.monotonic()
+            try:
+                response = self.fetch(url, stream=True, timeout=timeout)
+            except Exception as e:
+                self.health.record_failure(type(e).__name__, self._timed_out(e, started))
+                raise
+            
+            with response:
+                if response.status_code != 200:
+                    self.health.record_failure(f"HTTP {response.status_code}")
+                    print(f"[-] {self.name} returned status code: {response.status_code}")
+                    raise RetailerUnavailable(f"{self.name} returned status code: {response.status_code}")
+                
+                # Any answer counts as healthy, unless the body itself fails to arrive
+                failure = None
+                try:
+                    return self._read_results(response, url, product_name, started + timeout)
+                except requests.exceptions.RequestException as e:
+                    failure = e
+                    raise
+                finally:
+                    if failure:
+                        self.health.record_failure(type(failure).__name__, self._timed_out(failure, started))
+                    else:
+                        self.health.record_success(time.monotonic() - started)
+            
+        except RetailerUnavailable:
+            raise
+        except Exception as e:
+            print(f"[-] {self.name} scraping error: {str(e)}")
+            raise RetailerUnavailable(f"{self.name} scraping error: {e}") from e
+    
+    @staticmethod
+    def _timed_out(error, started):
+        """
+        Seconds waited if the error is a timeout (None for other errors)
+        """
+        if isinstance(error, requests.exceptions.Timeout):
+            return time.monotonic() - started
+        return None
+    
+    def _read_results(self, response, url, product_name, deadline):
+        """
+        Read the page body and return the first matching product
+        """
+        self.pages += 1
+        encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else None
+        chunks = self._read_chunks(response, deadline)
+        
+        if self.streaming:
+            # Parse while downloading; leaving search()'s "with" block early
+            # closes the connection, so the rest is never downloaded
+            products = stream_extract(self.compiled, chunks, encoding, limit=self.max_results)
+            item = self.first_match(products, url, product_name)
+            if item and not response.raw.isclosed():
+                self.early_stops += 1
+            return item
+        
+        # Parse HTML (in the parse worker pool)
+        content = b"".join(chunks)
+        products = extract_results(self.compiled, content, encoding, limit=self.max_results)
+        return self.first_match(products, url, product_name)
+    
+    def first_match(self, products, url, product_name):
+        """
+        First result card that builds into an item matching the search
+        (products may be a generator: it is only read as far as needed)
+        """
+        found = 0
+        for fields in products:
+            found += 1
+            try:
+                item = self.build_item(fields, url)
+            except Exception:
+                continue
+            
+            if not item:
+                continue
+            
+            # Validate product match
+            if not validate_product_match(item["name"], product_name):
+                print(f"[SKIP] {self.name}: '{item['name'][:50]}' doesn't match query")
+                continue
+            
+            print(f"[+] {self.name}: Rs.{item['price']} - {item['name'][:50]}...")
+            return item
+        
+        if not found:
+            print(f"[-] No products found on {self.name}")
         else:
-            comparison_results["Amazon"] = {
-                "price": None,
-                "link": f"https://www.amazon.in/s?k={quote_plus(product_name)}",
-                "available": False
-            }
-            print(f"[NOT FOUND] Amazon: Product not available")
-        time.sleep(random.uniform(1, 2))  # Rate limiting
-    except Exception as e:
-        print(f"[-] Amazon error: {e}")
-        comparison_results["Amazon"] = {
-            "price": None,
-            "link": f"https://www.amazon.in/s?k={quote_plus(product_name)}",
-            "available": False
+            print(f"[-] Could not extract price from {self.name}")
+        return None
+    
+    def transfer_stats(self):
+        """
+        Pages fetched, bytes downloaded and downloads cut short by a match
+        """
+        return {
+            "pages": self.pages,
+            "bytes_read": self.bytes_read,
+            "avg_bytes_per_page": self.bytes_read // self.pages if self.pages else 0,
+            "early_stops": self.early_stops
+        }
+    
+    def close(self):
+        """
+        Close all pooled connections
+        """
+        self.session.close()
+
+
+class AmazonAdapter(RetailerAdapter):
+    """
+    Amazon India search results
+    """
+    
+    name = "Amazon"
+    label = "Amazon India"
+    search_url = "https://www.amazon.in/s?k={query}"
+    max_results = 5
+    
+    spec = {
+        "start_marker": 'data-component-type="s-search-result"',
+        "results": [Selector("div", attrs={"data-component-type": "s-search-result"})],
+        "fields": {
+            "price_whole": [Selector("span", "a-price-whole")],
+            "price_fraction": [Selector("span", "a-price-fraction")],
+            # Product title - try multiple selectors
+            "title": [
+                Selector("h2", "a-size-mini"),
+                Selector("span", "a-size-medium"),
+                Selector("span", "a-size-base-plus"),
+                Selector("h2"),
+            ],
+            "link": [Selector("a", "a-link-normal", attribute="href")],
+        }
+    }
+    
+    def build_item(self, fields, url):
+        # Extract price
+        if fields["price_whole"] is None:
+            return None
+        
+        price_text = fields["price_whole"].replace(',', '').replace('₹', '').strip()
+        if fields["price_fraction"] is not None:
+            price_text += '.' + fields["price_fraction"].strip()
+        
+        price = float(price_text)
+        
+        product_title = (fields["title"] or '').strip()
+        
+        # Skip if title is empty or too short
+        if len(product_title) < 5:
+            return None
+        
+        # Get product link
+        product_url = f"https://www.amazon.in{fields['link']}" if fields["link"] is not None else url
+        
+        return {
+            "name": product_title,
+            "price": price,
+            "link": product_url
+        }
+
+
+class FlipkartAdapter(RetailerAdapter):
+    """
+    Flipkart search results
+    """
+    
+    name = "Flipkart"
+    search_url = "https://www.flipkart.com/search?q={query}"
+    max_results = 7
+    
+    spec = {
+        "results": [
+            # Flipkart has multiple possible container classes
+            Selector("div", ['_1AtVbE', '_2kHMtA', '_13oc-S', 'cPHDOP']),
+            # Alternative container
+            Selector("div", 'tUxRFH'),
+        ],
+        "fields": {
+            "price": [Selector("div", ['_30jeq3', '_3I9_wc', 'Nx9bqj'])],
+            "title": [
+                Selector("div", ['_4rR01T', 'KzDlHZ', 'IRpwTa']),
+                Selector("a", ['IRpwTa', '_2rpwqI', 's1Q9rs']),
+            ],
+            "link": [
+                Selector("a", ['_1fQZEK', 'CGtC98', '_2rpwqI'], attribute="href"),
+                Selector("a", attribute="href"),
+            ],
         }
+    }
     
-    # Try scraping Flipkart
+    def build_item(self, fields, url):
+        price = clean_price(fields["price"])
+        if not price:
+            return None
+        
+        product_title = (fields["title"] or '').strip()
+        
+        # Get product link
+        product_url = f"https://www.flipkart.com{fields['link']}" if fields["link"] is not None else url
+        
+        return {
+            "name": product_title,
+            "price": price,
+            "link": product_url
+        }
+
+
+class SnapdealAdapter(RetailerAdapter):
+    """
+    Snapdeal search results
+    """
+    
+    name = "Snapdeal"
+    search_url = "https://www.snapdeal.com/search?keyword={query}"
+    max_results = 5
+    
+    spec = {
+        "results": [Selector("div", ['product-tuple-listing', 'favDp'])],
+        "fields": {
+            "price": [
+                Selector("span", 'lfloat product-price'),
+                Selector("span", 'product-price'),
+            ],
+            "title": [Selector("p", 'product-title')],
+            "link": [
+                Selector("a", 'dp-widget-link', attribute="href"),
+                Selector("a", attribute="href"),
+            ],
+        }
+    }
+    
+    def build_item(self, fields, url):
+        price = clean_price(fields["price"])
+        if not price:
+            return None
+        
+        product_title = (fields["title"] or '').strip()
+        
+        # Get product link
+        product_url = fields["link"] if fields["link"] is not None else url
+        if not product_url.startswith('http'):
+            product_url = f"https://www.snapdeal.com{product_url}"
+        
+        return {
+            "name": product_title,
+            "price": price,
+            "link": product_url
+        }
+
+
+# ============================================================================
+# RETAILER REGISTRY
+# ============================================================================
+# Every retailer we compare, in the order the frontend shows them.
+# Each adapter is created once and reused, so its connection pool stays warm.
+
+# Requests per second to each retailer (on average), and how many may go
+# out at once after a quiet period
+RETAILER_RATE = 1 / 1.5
+RETAILER_BURST = 2
+
+RETAILERS = {}
+
+
+def register_retailer(adapter):
+    """
+    Add a retailer adapter to the comparison (replaces one with the same name)
+    """
+    RETAILERS[adapter.name] = adapter
+    outbound_scheduler.configure(adapter.name, RETAILER_RATE, RETAILER_BURST)
+    return adapter
+
+
+register_retailer(AmazonAdapter())
+register_retailer(FlipkartAdapter())
+register_retailer(SnapdealAdapter())
+
+
+def get_retailer_health():
+    """
+    Health and transfer statistics of every retailer
+    """
+    return {
+        name: dict(adapter.health.stats(), transfers=adapter.transfer_stats())
+        for name, adapter in RETAILERS.items()
+    }
+
+
+def close_retailers():
+    """
+    Close the connection pools of all retailers and stop the parse workers
+    (called on app shutdown)
+    """
+    outbound_scheduler.stop()
+    for adapter in RETAILERS.values():
+        adapter.close()
+    close_parse_pool()
+
+
+def _search_or_none(website, product_name):
+    """
+    One retailer's best match, or None if not found or on errors
+    """
+    try:
+        return RETAILERS[website].search(product_name)
+    except RetailerUnavailable:
+        return None
+
+
+def scrape_amazon_india(product_name):
+    """
+    Scrape real-time prices from Amazon India
+    """
+    return _search_or_none("Amazon", product_name)
+
+
+def scrape_flipkart(product_name):
+    """
+    Scrape real-time prices from Flipkart
+    """
+    return _search_or_none("Flipkart", product_name)
+
+
+def scrape_snapdeal(product_name):
+    """
+    Scrape real-time prices from Snapdeal
+    """
+    return _search_or_none("Snapdeal", product_name)
+
+
+# ============================================================================
+# SEARCH ALL RETAILERS
+# ============================================================================
+
+# Longest time one search waits for all retailers together (seconds)
+SCRAPE_DEADLINE = 15
+
+
+def _not_available(website, product_name):
+    """
+    Result entry for a retailer where no product was found
+    """
+    return {
+        "price": None,
+        "link": RETAILERS[website].search_link(product_name),
+        "available": False
+    }
+
+
+def _skipped(website, product_name):
+    """
+    Result entry for a retailer without a usable answer: not asked (its
+    circuit is open, or the outbound scheduler had no room for the request),
+    or it failed or timed out. Such entries are never cached or saved.
+    """
+    return dict(_not_available(website, product_name), skipped=True)
+
+
+def _search_retailer(website, product_name):
+    """
+    Ask ONE retailer and build its entry (runs in an outbound worker thread,
+    when the rate limits allow it)
+    """
     try:
-        flipkart_data = scrape_flipkart(product_name)
-        if flipkart_data:
-            comparison_results["Flipkart"] = {
-                "price": flipkart_data["price"],
-                "link": flipkart_data["link"],
+        data = RETAILERS[website].search(product_name)
+        if data:
+            print(f"[SUCCESS] {website}: Rs.{data['price']}")
+            return {
+                "price": data["price"],
+                "link": data["link"],
                 "available": True
             }
-            print(f"[SUCCESS] Flipkart: Rs.{flipkart_data['price']}")
-        else:
-            comparison_results["Flipkart"] = {
-                "price": None,
-                "link": f"https://www.flipkart.com/search?q={quote_plus(product_name)}",
-                "available": False
-            }
-            print(f"[NOT FOUND] Flipkart: Product not available")
-        time.sleep(random.uniform(1, 2))  # Rate limiting
+        
+        print(f"[NOT FOUND] {website}: Product not available")
+        return _not_available(website, product_name)
     except Exception as e:
-        print(f"[-] Flipkart error: {e}")
-        comparison_results["Flipkart"] = {
-            "price": None,
-            "link": f"https://www.flipkart.com/search?q={quote_plus(product_name)}",
-            "available": False
-        }
+        # RetailerUnavailable or a bug: either way we did not learn anything
+        print(f"[-] {website} error: {e}")
+        return _skipped(website, product_name)
+
+
+def _submit_retailer(website, product_name, priority):
+    """
+    Queue the search of one retailer with the outbound scheduler
     
-    # Try scraping Snapdeal
+    Returns: A Future with the entry, or None if the retailer keeps failing
+    and is skipped without asking
+    """
+    if RETAILERS[website].health.should_skip():
+        print(f"[SKIPPED] {website}: too many recent failures")
+        return None
+    return outbound_scheduler.submit(website, _search_retailer, website, product_name, priority=priority)
+
+
+def _entry(website, product_name, future):
+    """
+    Entry of a finished search (a request the scheduler refused counts as skipped)
+    """
+    if future is None:
+        return _skipped(website, product_name)
     try:
-        snapdeal_data = scrape_snapdeal(product_name)
-        if snapdeal_data:
-            comparison_results["Snapdeal"] = {
-                "price": snapdeal_data["price"],
-                "link": snapdeal_data["link"],
-                "available": True
-            }
-            print(f"[SUCCESS] Snapdeal: Rs.{snapdeal_data['price']}")
+        return future.result()
+    except RequestShed as e:
+        print(f"[SHED] {e}")
+        return _skipped(website, product_name)
+
+
+def scrape_retailer(website, product_name, priority=INTERACTIVE):
+    """
+    Scrape ONE retailer and return its entry for the comparison dictionary
+    
+    The request waits in the outbound scheduler's queue until the rate
+    limits allow it (no thread sleeps meanwhile).
+    A retailer that keeps failing is skipped without waiting at all.
+    """
+    return _entry(website, product_name, _submit_retailer(website, product_name, priority))
+
+
+def iter_retailers(product_name, websites=None, priority=INTERACTIVE):
+    """
+    Scrape the given retailers (default: all of them) at the same time and
+    yield (website, entry) for each one AS SOON AS it has answered
+    
+    Retailers still busy after SCRAPE_DEADLINE seconds are given up on
+    (entry marked skipped); requests still waiting for their turn by then
+    are never sent.
+    """
+    websites = [w for w in RETAILERS if websites is None or w in websites]
+    
+    # Fan out: one request per retailer, sent as soon as the limits allow
+    futures = {}
+    for website in websites:
+        future = _submit_retailer(website, product_name, priority)
+        if future is None:
+            yield website, _skipped(website, product_name)
         else:
-            comparison_results["Snapdeal"] = {
-                "price": None,
-                "link": f"https://www.snapdeal.com/search?keyword={quote_plus(product_name)}",
-                "available": False
-            }
-            print(f"[NOT FOUND] Snapdeal: Product not available")
-        time.sleep(random.uniform(1, 2))  # Rate limiting
-    except Exception as e:
-        print(f"[-] Snapdeal error: {e}")
-        comparison_results["Snapdeal"] = {
-            "price": None,
-            "link": f"https://www.snapdeal.com/search?keyword={quote_plus(product_name)}",
-            "available": False
+            futures[future] = website
+    
+    try:
+        for future in as_completed(list(futures), timeout=SCRAPE_DEADLINE):
+            website = futures.pop(future)
+            yield website, _entry(website, product_name, future)
+    except FutureTimeout:
+        for future, website in futures.items():
+            print(f"[-] {website} error: no response within {SCRAPE_DEADLINE}s")
+            future.cancel()  # never sent if it is still waiting for its turn
+            yield website, _skipped(website, product_name)
+
+
+def scrape_retailers(product_name, websites=None, concurrent=True, on_result=None,
+                     priority=INTERACTIVE):
+    """
+    Scrape the given retailers (default: all of them) WITHOUT fallback prices
+    
+    PARAMETERS:
+    - product_name: What to search for
+    - websites: List of retailer names to ask (None = all registered retailers)
+    - concurrent: True = ask all retailers at the same time (total time is the
+      slowest retailer), False = ask them one after another
+    - on_result: Optional function(website, entry), called as soon as each
+      retailer has answered
+    - priority: INTERACTIVE (a user is waiting) or BACKGROUND (a refresh)
+    
+    Returns: Dictionary with one entry per retailer, in RETAILERS order
+    """
+    websites = [w for w in RETAILERS if websites is None or w in websites]
+    results = {}
+    
+    if concurrent:
+        answers = iter_retailers(product_name, websites, priority)
+    else:
+        answers = ((website, scrape_retailer(website, product_name, priority)) for website in websites)
+    
+    for website, entry in answers:
+        results[website] = entry
+        if on_result is not None:
+            on_result(website, entry)
+    
+    # Collect in RETAILERS order so the response shape never changes
+    return {website: results[website] for website in websites}
+
+
+def add_fallback_prices(comparison_results, product_name):
+    """
+    If no retailer has the product, fill in estimated prices for all of them
+    
+    Returns: The comparison dictionary (a new one if estimates were added)
+    """
+    available_count = sum(1 for v in comparison_results.values() if v.get('available', False))
+    if available_count > 0:
+        return comparison_results
+    
+    print("[FALLBACK] No real prices found. Generating estimated prices...")
+    
+    estimated = {}
+    for website, data in comparison_results.items():
+        fallback = get_fallback_data(product_name)
+        estimated[website] = {
+            "price": fallback["price"],
+            "link": data["link"],
+            "available": True,
+            "estimated": True  # Flag to indicate this is estimated
         }
     
+    print("[+] Estimated prices generated for all websites")
+    return estimated
+
+
+def scrape_all_websites(product_name, concurrent=True):
+    """
+    Search for a product on all websites and return real-time prices
+    Only returns ACTUAL scraped prices, not fake data
+    
+    PARAMETERS:
+    - product_name: What to search for
+    - concurrent: True = ask all retailers at the same time (total time is the
+      slowest retailer), False = ask them one after another
+    
+    Returns: Dictionary with prices from each website (or "Not Available")
+    """
+    print(f"\n{'='*60}")
+    print(f"[SEARCH] Searching for: {product_name}")
+    print(f"{'='*60}\n")
+    
+    comparison_results = scrape_retailers(product_name, concurrent=concurrent)
+    
     available_count = sum(1 for v in comparison_results.values() if v.get('available', False))
     print(f"\n{'='*60}")
     print(f"[+] Search complete! Found prices on {available_count} out of {len(comparison_results)} websites")
     print(f"{'='*60}\n")
     
     # If no products found, add estimated fallback prices
-    if available_count == 0:
-        print("[FALLBACK] No real prices found. Generating estimated prices...")
-        
-        for website in comparison_results.keys():
-            fallback = get_fallback_data(product_name)
-            comparison_results[website] = {
-                "price": fallback["price"],
-                "link": comparison_results[website]["link"],
-                "available": True,
-                "estimated": True  # Flag to indicate this is estimated
-            }
-        
-        print("[+] Estimated prices generated for all websites")
-    
-    return comparison_results
+    return add_fallback_prices(comparison_results, product_name)
 
 
 def find_cheapest_option(comparison_results):
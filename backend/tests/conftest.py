@@ -0,0 +1,139 @@
+"""
+Shared pytest setup:
+- makes the backend modules importable as "from modules.x import y" (like main.py)
+- db: a fresh SQLite database in a temporary folder
+- fake_retailers: a local HTTP server standing in for Amazon, Flipkart and
+  Snapdeal, with the real retailer adapters pointed at it
+
+Run from the backend folder:
+    python -m pytest -q
+"""
+
+import http.server
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_html_parsing import CARD_TEMPLATES  # noqa: E402
+from modules import comparison, database, extraction, scraper  # noqa: E402
+from modules.rate_limiter import OUTBOUND_GLOBAL_BURST, OUTBOUND_GLOBAL_RATE, outbound_scheduler  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    A new, empty database (all tables created) used by every database call
+    """
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "test.db"))
+    database.initialize_database()
+    yield database
+    database.close_connections()
+
+
+# ============================================================================
+# FAKE RETAILER SERVER
+# ============================================================================
+
+# URL path of each retailer on the fake server (same keys as CARD_TEMPLATES)
+RETAILER_PATHS = {"Amazon": "amazon", "Flipkart": "flipkart", "Snapdeal": "snapdeal"}
+ADAPTER_CLASSES = {
+    "Amazon": scraper.AmazonAdapter,
+    "Flipkart": scraper.FlipkartAdapter,
+    "Snapdeal": scraper.SnapdealAdapter,
+}
+
+
+def search_page(path, cards=1, price=70000):
+    """
+    A search results page of one retailer with `cards` iPhone 15 results
+    """
+    body = "".join(CARD_TEMPLATES[path].format(i=i, gb=128, price=price + i) for i in range(cards))
+    return f"<html><body>{body}</body></html>".encode()
+
+
+class FakeRetailerServer(http.server.ThreadingHTTPServer):
+    """
+    Answers /<retailer>?q=... according to its settings, per retailer:
+    - mode: "ok" (one matching card), "empty" (no cards) or "error" (503)
+    - delay: seconds to wait before answering
+    Counts the requests every retailer got.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeRetailerHandler)
+        self.mode = {path: "ok" for path in RETAILER_PATHS.values()}
+        self.delay = {path: 0.0 for path in RETAILER_PATHS.values()}
+        self.requests = {path: 0 for path in RETAILER_PATHS.values()}
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}/{path}?q={{query}}"
+
+    def handle_error(self, request, client_address):
+        # A client that gave up (timeout, page cut short) is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeRetailerHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = self.path.strip("/").split("?")[0]
+        with self.server.lock:
+            self.server.requests[path] += 1
+        time.sleep(self.server.delay[path])
+
+        mode = self.server.mode[path]
+        status = 503 if mode == "error" else 200
+        body = b"<html><body>busy</body></html>" if mode == "error" else search_page(path, 1 if mode == "ok" else 0)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_retailers(monkeypatch):
+    """
+    Fresh adapters for all retailers, pointed at a local FakeRetailerServer
+
+    Rate limits are turned off and pages are parsed in this process, so
+    tests only wait for the fake server. The comparison cache starts empty.
+    """
+    server = FakeRetailerServer()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    rate, burst = scraper.RETAILER_RATE, scraper.RETAILER_BURST
+
+    monkeypatch.setattr(extraction, "PARSE_WORKERS", 0)
+    monkeypatch.setattr(scraper, "RETAILER_RATE", 0)
+    monkeypatch.setattr(scraper, "RETAILERS", {})
+    outbound_scheduler.configure_global(0, 1)
+    comparison.comparison_cache.clear()
+
+    for name, path in RETAILER_PATHS.items():
+        adapter = ADAPTER_CLASSES[name](timeout=2)
+        adapter.search_url = server.url(path)
+        scraper.register_retailer(adapter)
+    monkeypatch.setattr(comparison, "RETAILERS", scraper.RETAILERS)
+
+    yield server
+
+    for name, adapter in scraper.RETAILERS.items():
+        adapter.close()
+        outbound_scheduler.configure(name, rate, burst)
+    outbound_scheduler.configure_global(OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_BURST)
+    comparison.comparison_cache.clear()
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,96 @@
+"""
+The vectorized batch fit (batch_forecast.py) gives the same lines as
+PricePredictionModel trained on one product at a time, and saving the
+batch forecast again replaces the earlier predictions
+"""
+
+import numpy as np
+import pytest
+
+from modules.batch_forecast import BATCH_MODEL, fit_all_trends, forecast_all_products
+from modules.ml_predictor import PricePredictionModel
+
+
+def price_records(products=6, seed=11):
+    """
+    Shuffled records of several products: a few websites per day,
+    missing days, one product with a flat price and one with a single day
+    """
+    rng = np.random.default_rng(seed)
+    product_ids, dates, prices = [], [], []
+    for product_id in range(1, products + 1):
+        start = np.datetime64("2024-01-01") + rng.integers(0, 40)
+        days = np.sort(rng.choice(90, size=rng.integers(5, 40), replace=False))
+        if product_id == products:
+            days = days[:1]
+        for day in days:
+            for _ in range(rng.integers(1, 4)):
+                if product_id == 1:
+                    price = 5000.0
+                else:
+                    price = 20000 + product_id * 1000 - 30 * day + rng.normal(0, 300)
+                product_ids.append(product_id)
+                dates.append(str(start + day))
+                prices.append(round(price, 2))
+
+    order = rng.permutation(len(product_ids))
+    return (np.array(product_ids)[order], np.array(dates)[order], np.array(prices)[order])
+
+
+def reference_fits(product_ids, dates, prices):
+    # One PricePredictionModel per product, like /api/predict-price trains it
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    fits = {}
+    for product_id in np.unique(product_ids):
+        mine = product_ids == product_id
+        model = PricePredictionModel(model_type="linear")
+        X, Y, _ = model.prepare_arrays(days[mine], prices[mine])
+        model.train(X, Y)
+        fits[int(product_id)] = (model, X, Y)
+    return fits
+
+
+def assert_same_as_reference(fits, reference):
+    assert sorted(fits["product_id"].tolist()) == sorted(reference)
+    for i, product_id in enumerate(fits["product_id"].tolist()):
+        model, X, Y = reference[product_id]
+        coefficients = model.get_model_coefficients()
+        metrics = model.training_metrics
+
+        assert fits["slope"][i] == pytest.approx(coefficients["slope"], abs=1e-4)
+        assert fits["intercept"][i] == pytest.approx(coefficients["intercept"], abs=0.01)
+        assert fits["last_day"][i] == X[-1, 0]
+        assert fits["r2"][i] == pytest.approx(metrics["r2"], abs=1e-6)
+        assert fits["mae"][i] == pytest.approx(metrics["mae"], rel=1e-6, abs=1e-6)
+        assert fits["mse"][i] == pytest.approx(metrics["mse"], rel=1e-6, abs=1e-6)
+
+        # Same forecast 30 days after the last price
+        predicted = model.predict_future_price(30)["predicted_price"]
+        assert fits["intercept"][i] + fits["slope"][i] * (X[-1, 0] + 30) == pytest.approx(predicted, abs=0.01)
+
+
+def store_records(db, records):
+    for product_id, date, price in zip(*(column.tolist() for column in records)):
+        db.add_product(product_id, f"Product {product_id}", "Phones")
+        db.add_price(product_id, "Shop", price, date)
+
+
+def test_vectorized_fit_matches_price_prediction_model():
+    records = price_records()
+    assert_same_as_reference(fit_all_trends(*records), reference_fits(*records))
+
+
+def test_running_the_batch_again_replaces_its_predictions(db):
+    store_records(db, price_records())
+
+    first = forecast_all_products(days_ahead=14)
+    connection = db.get_connection()
+    rows = connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+    saved = {product_id: db.get_predictions(product_id) for product_id in range(1, 7)}
+
+    assert rows == first["products"] > 0
+    assert forecast_all_products(days_ahead=14)["products"] == first["products"]
+    assert connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] == rows
+    for product_id, predictions in saved.items():
+        assert db.get_predictions(product_id) == predictions
+        assert all(prediction["model"] == BATCH_MODEL == "linear" for prediction in predictions)
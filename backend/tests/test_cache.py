@@ -0,0 +1,56 @@
+"""
+TTL expiry and LRU eviction of the in-memory cache (modules/cache.py)
+"""
+
+from modules.cache import TTLCache, estimate_size
+
+
+def test_entries_expire_after_their_ttl():
+    cache = TTLCache(default_ttl=60)
+    cache.set("fresh", 1)
+    cache.set("old", 2, age=61)  # stored 61 seconds ago
+
+    assert cache.get("fresh") == 1
+    assert cache.get("old") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_ttl_per_entry_and_reported_age():
+    cache = TTLCache(default_ttl=60)
+    cache.set("short", "a", ttl=10, age=11)
+    cache.set("long", "b", ttl=300, age=11)
+
+    assert cache.get("short") is None
+    value, age, is_stale = cache.get_entry("long")
+    assert value == "b"
+    assert 11 <= age < 12
+    assert not is_stale
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cap_evicts_and_skips_huge_values():
+    value = "x" * 100
+    cache = TTLCache(max_bytes=3 * estimate_size(value))
+    for key in "abcd":
+        cache.set(key, value)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+    cache.set("huge", "x" * 1000)  # bigger than the whole cache
+    assert cache.get("huge") is None
+    assert cache.stats()["entries"] == 3
@@ -0,0 +1,100 @@
+"""
+Price comparison through the cache, against the fake retailer server
+(modules/comparison.py)
+"""
+
+import time
+
+from modules import comparison
+from modules.comparison import get_comparison, NOT_FOUND_CACHE_TTL
+
+QUERY = "iPhone 15 128GB"
+
+
+def test_found_and_not_found_answers_are_cached(fake_retailers, db):
+    fake_retailers.mode["snapdeal"] = "empty"
+
+    result, age, stale = get_comparison(QUERY)
+    assert result["Amazon"]["available"]
+    assert not result["Snapdeal"]["available"]
+
+    key = comparison.normalize_query(QUERY)
+    assert comparison.comparison_cache.get((key, "Amazon"))["available"]
+    assert comparison.retailer_ttl("Snapdeal", result["Snapdeal"]) == NOT_FOUND_CACHE_TTL
+    assert comparison.comparison_cache.get((key, "Snapdeal")) is not None
+
+    # The second search is answered from the cache
+    get_comparison(QUERY)
+    assert fake_retailers.requests == {"amazon": 1, "flipkart": 1, "snapdeal": 1}
+
+
+def test_failed_retailer_is_not_cached_as_not_found(fake_retailers, db):
+    fake_retailers.mode["flipkart"] = "error"
+
+    result, age, stale = get_comparison(QUERY)
+    assert result["Flipkart"]["skipped"]
+    assert result["Amazon"]["available"]
+
+    key = comparison.normalize_query(QUERY)
+    assert comparison.comparison_cache.get((key, "Flipkart")) is None
+    assert "Flipkart" not in db.get_scrape_results(key, ["Flipkart"])
+
+    # Next time only the failed retailer is asked again
+    fake_retailers.mode["flipkart"] = "ok"
+    result, age, stale = get_comparison(QUERY)
+    assert result["Flipkart"]["available"]
+    assert fake_retailers.requests == {"amazon": 1, "flipkart": 2, "snapdeal": 1}
+
+
+# ============================================================================
+# Streamed comparison: answers in arrival order
+# ============================================================================
+
+def test_answers_are_streamed_in_arrival_order(fake_retailers, db):
+    fake_retailers.delay.update(amazon=0.0, snapdeal=0.2, flipkart=0.5)
+
+    events = list(comparison.iter_comparison(QUERY))
+    retailers = [event for event in events if event["type"] == "retailer"]
+
+    assert [event["website"] for event in retailers] == ["Amazon", "Snapdeal", "Flipkart"]
+    assert all(event["source"] == "live" for event in retailers)
+    assert events[-1]["type"] == "summary"
+    assert list(events[-1]["comparison"]) == ["Amazon", "Flipkart", "Snapdeal"]
+    assert events[-1]["comparison"]["Flipkart"] == retailers[2]["result"]
+
+
+def test_cached_answers_come_first(fake_retailers, db):
+    fake_retailers.delay.update(amazon=0.2, snapdeal=0.0)
+    key = comparison.normalize_query(QUERY)
+    cached = {"price": 71000.0, "link": "https://flipkart.example/p", "available": True}
+    comparison.comparison_cache.set((key, "Flipkart"), cached)
+
+    events = list(comparison.iter_comparison(QUERY))
+
+    assert [(event.get("website"), event.get("source")) for event in events] == [
+        ("Flipkart", "cache"), ("Snapdeal", "live"), ("Amazon", "live"), (None, None)
+    ]
+    assert events[0]["result"] == cached
+    assert fake_retailers.requests["flipkart"] == 0
+
+
+def test_slow_retailer_is_given_up_at_the_stream_deadline(fake_retailers, db, monkeypatch):
+    monkeypatch.setattr(comparison, "SCRAPE_DEADLINE", 0.1)
+    monkeypatch.setattr(comparison, "STREAM_DEADLINE_MARGIN", 0.2)
+    fake_retailers.delay["flipkart"] = 1.0
+
+    start = time.monotonic()
+    events = list(comparison.iter_comparison(QUERY))
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.8
+    flipkart = next(event for event in events if event.get("website") == "Flipkart")
+    assert flipkart["result"]["skipped"]
+    assert events[-1]["comparison"]["Amazon"]["available"]
+
+    # The scrape behind it still finishes (and is cached) before the database goes away
+    key = comparison.normalize_query(QUERY)
+    deadline = time.monotonic() + 5
+    while comparison.scrape_flight.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert comparison.comparison_cache.get((key, "Flipkart"))["available"]
@@ -0,0 +1,121 @@
+"""
+Reading result cards with compiled selector specs (modules/extraction.py)
+"""
+
+import random
+
+import pytest
+
+from benchmarks.bench_html_parsing import ADAPTERS, make_page
+from modules import extraction, scraper
+from modules.extraction import Selector, compile_spec, extract, extract_results
+
+
+def page_of(retailer, cards=4):
+    # A search page with script/navigation filler around the cards
+    return make_page(retailer, cards, 20, random.Random(7))
+
+
+def items(retailer, cards):
+    adapter = scraper.RETAILERS[ADAPTERS[retailer]]
+    return [adapter.build_item(fields, "https://example.test") for fields in cards]
+
+
+@pytest.mark.parametrize("retailer", sorted(ADAPTERS))
+def test_every_retailer_spec_reads_all_cards(retailer):
+    adapter = scraper.RETAILERS[ADAPTERS[retailer]]
+    found = items(retailer, extract(adapter.compiled, page_of(retailer)))
+
+    assert {item["name"][-1] for item in found} == {"0", "1", "2", "3"}
+    for item in found:
+        assert "iPhone 15" in item["name"]
+        assert 50000 <= item["price"] <= 90000
+        assert item["link"].startswith("https://www.")
+
+
+def test_limit_and_pages_without_cards():
+    adapter = scraper.RETAILERS["Amazon"]
+    assert len(extract(adapter.compiled, page_of("amazon", 10), limit=3)) == 3
+    assert extract(adapter.compiled, b"<html><body><p>No results</p></body></html>") == []
+    assert extract(adapter.compiled, b"") == []
+
+
+def test_selectors_match_like_beautifulsoup():
+    spec = compile_spec({
+        "results": [Selector("div", ["card", "tile"])],
+        "fields": {
+            "both_classes": [Selector("span", "price big")],
+            "attribute": [Selector("a", attrs={"rel": "item"}, attribute="href")],
+            "fallback": [Selector("b"), Selector("i")],
+        }
+    })
+    page = (
+        b'<div class="card"><span class="price">1</span><span class="big price x">2</span>'
+        b'<a href="/no">x</a><a rel="item" href="/yes">y</a><i>third</i></div>'
+        b'<div class="tile wide"><b>first</b></div><div class="cards">not a card</div>'
+    )
+
+    assert extract(spec, page) == [
+        {"both_classes": "2", "attribute": "/yes", "fallback": "third"},
+        {"both_classes": None, "attribute": None, "fallback": "first"},
+    ]
+
+
+def test_worker_pool_gives_the_same_cards(monkeypatch):
+    adapter = scraper.RETAILERS["Snapdeal"]
+    page = page_of("snapdeal")
+    monkeypatch.setattr(extraction, "PARSE_WORKERS", 1)
+    try:
+        assert extract_results(adapter.compiled, page) == extract(adapter.compiled, page)
+    finally:
+        extraction.close_parse_pool()
+
+
+# ============================================================================
+# Streaming: cards read while the page arrives
+# ============================================================================
+
+def chunked(content, size):
+    return (content[i:i + size] for i in range(0, len(content), size))
+
+
+@pytest.mark.parametrize("retailer", sorted(ADAPTERS))
+@pytest.mark.parametrize("size", [1, 13, 256, 4096, 1 << 20])
+def test_stream_gives_the_same_cards_as_the_whole_page(retailer, size):
+    spec = scraper.RETAILERS[ADAPTERS[retailer]].compiled
+    page = page_of(retailer)
+    assert list(extraction.stream_extract(spec, chunked(page, size))) == extract(spec, page)
+
+
+def test_stream_uses_the_fallback_selector_only_without_first_choice_cards():
+    spec = scraper.RETAILERS["Flipkart"].compiled
+    page = (
+        b'<html><body><div class="tUxRFH"><a class="IRpwTa" href="/p/1">Apple iPhone 15</a>'
+        b'<div class="Nx9bqj">&#8377;70,999</div></div></body></html>'
+    )
+    streamed = list(extraction.stream_extract(spec, chunked(page, 16)))
+    assert streamed == extract(spec, page)
+    assert streamed[0]["price"] == "₹70,999"
+
+
+def test_stream_without_the_start_marker_reads_the_whole_page():
+    spec = compile_spec(dict(scraper.SnapdealAdapter.spec, start_marker="not-on-this-page"))
+    page = page_of("snapdeal")
+    streamed = list(extraction.stream_extract(spec, chunked(page, 512)))
+    assert streamed == extract(spec, page)
+    assert len(streamed) == 4
+
+
+def test_stream_stops_reading_at_the_limit():
+    spec = scraper.RETAILERS["Snapdeal"].compiled
+    page = page_of("snapdeal", cards=20)
+    read = []
+
+    def chunks():
+        for chunk in chunked(page, 256):
+            read.append(chunk)
+            yield chunk
+
+    cards = list(extraction.stream_extract(spec, chunks(), limit=2))
+    assert cards == extract(spec, page, limit=2)
+    assert sum(map(len, read)) < len(page) * 0.75
@@ -0,0 +1,66 @@
+"""
+The memory-mapped price history matches the prices table and follows its
+changes (modules/history_store.py)
+"""
+
+import numpy as np
+
+from modules.history_store import EPOCH, HistoryStore
+
+
+def add_prices(db, product_id, days, start_price, websites=("Amazon", "Flipkart")):
+    db.add_product(product_id, f"Phone {product_id}", "Phones")
+    for day in range(days):
+        for i, website in enumerate(websites):
+            db.add_price(product_id, website, start_price - 10 * day + 100 * i, str(EPOCH + 19800 + day))
+
+
+def assert_same_as_database(store, db, product_id):
+    history = store.get_history(product_id)
+    rows = sorted(
+        (price["date"], price["website"], price["price"]) for price in db.get_product_prices(product_id)
+    )
+    stored = sorted(
+        (str(EPOCH + int(day)), history["website_names"][code], float(price))
+        for day, code, price in zip(history["days"], history["websites"], history["prices"])
+    )
+    assert stored == rows
+    assert list(history["days"]) == sorted(history["days"])
+    assert history["version"] == db.get_price_history_versions()[product_id]
+    assert store.get_version(product_id) == history["version"]
+
+
+def test_store_matches_the_prices_table(db, tmp_path):
+    add_prices(db, 1, 20, 30000)
+    add_prices(db, 2, 5, 9000, websites=("Snapdeal",))
+    store = HistoryStore(str(tmp_path / "history"))
+
+    assert store.get_history(1) is None  # not built yet
+    assert store.refresh() == 2
+    assert store.refresh() == 0  # nothing changed
+
+    assert_same_as_database(store, db, 1)
+    assert_same_as_database(store, db, 2)
+    assert store.get_history(3) is None
+    assert store.stats()["rows"] == 45
+
+
+def test_refresh_rereads_only_changed_products(db, tmp_path):
+    # (changing more than half of them would re-read everything)
+    for product_id in range(1, 6):
+        add_prices(db, product_id, 10, 20000 + product_id)
+    store = HistoryStore(str(tmp_path / "history"))
+    store.refresh()
+    unchanged = np.array(store.get_history(1)["prices"])
+
+    db.add_price(2, "Croma", 19000, str(EPOCH + 19900))  # a new website too
+    db.add_price(3, "Amazon", 18000, str(EPOCH + 19800))  # a corrected price
+
+    assert store.refresh() == 2
+    for product_id in range(1, 6):
+        assert_same_as_database(store, db, product_id)
+    assert np.array_equal(store.get_history(1)["prices"], unchanged)
+
+    # Another process with the same folder opens the newest files
+    other = HistoryStore(str(tmp_path / "history"))
+    assert other.get_version(2) == store.get_version(2)
@@ -0,0 +1,71 @@
+"""
+CSV ingest: loading the same file again never duplicates products or prices
+(modules/database.py)
+"""
+
+HEADER = "product_id,product_name,website,price,date,category,website_link\n"
+
+
+def csv_rows(product_id, name, days, start_price, step):
+    rows = []
+    for day in range(days):
+        for website, extra in (("Amazon", 0), ("Flipkart", 150)):
+            price = start_price + step * day + extra + (day % 3) * 40
+            rows.append(f"{product_id},{name},{website},{price},2024-01-{day + 1:02d},Phones,https://{website}.example/{product_id}\n")
+    return rows
+
+
+def write_csv(path, rows):
+    path.write_text(HEADER + "".join(rows))
+    return str(path)
+
+
+def table_counts(db):
+    connection = db.get_connection()
+    return {
+        table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("products", "prices")
+    }
+
+
+def test_loading_the_same_file_twice_changes_nothing(db, tmp_path):
+    path = write_csv(tmp_path / "prices.csv", csv_rows(1, "Phone A", 10, 20000, -50) + csv_rows(2, "Phone B", 8, 9000, 25))
+
+    first = db.bulk_ingest_csv(path)
+    counts = table_counts(db)
+
+    assert first["mode"] == "full"
+    assert counts == {"products": 2, "prices": 36}
+
+    assert db.bulk_ingest_csv(path)["mode"] == "skipped"
+    assert db.bulk_ingest_csv(path, force=True)["mode"] == "full"
+    assert table_counts(db) == counts
+
+
+def test_appended_rows_are_loaded_once(db, tmp_path):
+    rows = csv_rows(1, "Phone A", 12, 20000, -50)
+    path = write_csv(tmp_path / "prices.csv", rows[:10])
+    db.bulk_ingest_csv(path)
+
+    write_csv(tmp_path / "prices.csv", rows)
+    appended = db.bulk_ingest_csv(path)
+
+    assert appended["mode"] == "append"
+    assert appended["rows"] == len(rows) - 10
+    assert table_counts(db)["prices"] == len(rows)
+
+
+def test_changed_file_is_upserted_not_duplicated(db, tmp_path):
+    rows = csv_rows(1, "Phone A", 10, 20000, -50)
+    path = write_csv(tmp_path / "prices.csv", rows)
+    db.bulk_ingest_csv(path)
+
+    # Same days, one price changed in the middle of the file
+    product_id, name, website, price, *rest = rows[5].split(",")
+    rows[5] = ",".join([product_id, name, website, str(float(price) - 999), *rest])
+    write_csv(tmp_path / "prices.csv", rows)
+
+    assert db.bulk_ingest_csv(path)["mode"] == "full"
+    assert table_counts(db)["prices"] == len(rows)
+    prices = {(p["website"], p["date"]): p["price"] for p in db.get_product_prices(1)}
+    assert prices[(website, rest[0])] == float(price) - 999
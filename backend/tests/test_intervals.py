@@ -0,0 +1,84 @@
+"""
+Prediction intervals: t quantiles, the straight-line formula and Holt's
+forecast spread (modules/estimators.py, modules/model_registry.py)
+"""
+
+import numpy as np
+import pytest
+
+from modules.estimators import interval_bounds, t_quantile
+from modules.ml_predictor import PricePredictionModel
+from modules.model_registry import HoltTrendModel, LinearTrendModel
+
+
+@pytest.mark.parametrize("p, df, expected", [
+    (0.975, 1, 12.7062),
+    (0.975, 2, 4.3027),
+    (0.975, 3, 3.1824),
+    (0.975, 10, 2.2281),
+    (0.9, 5, 1.4759),
+    (0.9, 100, 1.2901),
+])
+def test_t_quantiles_match_the_tables(p, df, expected):
+    # Documented accuracy: within 0.2% (exact for 1 and 2 degrees of freedom)
+    assert t_quantile(p, df) == pytest.approx(expected, rel=2e-3)
+
+
+def test_no_intervals_without_degrees_of_freedom():
+    assert interval_bounds(np.array([1.0]), np.array([0.5]), df=0) == {}
+
+
+def test_linear_95_percent_interval_covers_95_percent_of_new_prices():
+    # Many short noisy histories: the interval 10 days after the last price
+    # should contain the real price about 95 times out of 100
+    rng = np.random.default_rng(8)
+    x = np.arange(15, dtype=np.float64)
+    future = np.array([x[-1] + 10])
+    covered = 0
+    runs = 2000
+    for _ in range(runs):
+        y = 1000 + 3 * x + rng.normal(0, 20, len(x))
+        model = LinearTrendModel().fit(x, y)
+        bounds = interval_bounds(model.predict(future), model.std_error(future), model.df_, (95,))["95"]
+        actual = 1000 + 3 * future[0] + rng.normal(0, 20)
+        covered += bounds["lower"][0] <= actual <= bounds["upper"][0]
+
+    assert 0.93 <= covered / runs <= 0.97
+
+
+def test_holt_std_error_matches_a_simulation():
+    # Forecast errors of Holt's state-space model, h days ahead:
+    # y = level + trend + e, level += trend + α·e, trend += α·β·e
+    model = HoltTrendModel()
+    model.alpha, model.beta, model.sigma_, model.last_x = 0.5, 0.3, 1.0, 0.0
+
+    rng = np.random.default_rng(4)
+    runs, h = 200_000, 10
+    errors = rng.normal(0, 1, (runs, h))
+    level = np.zeros(runs)
+    trend = np.zeros(runs)
+    for day in range(h):
+        value = level + trend + errors[:, day]
+        level, trend = level + trend + model.alpha * errors[:, day], trend + model.alpha * model.beta * errors[:, day]
+
+    # The point forecast from day 0 is 0 (level and trend start at 0)
+    assert model.std_error([h])[0] == pytest.approx(value.std(), rel=0.01)
+    assert model.std_error([1])[0] == pytest.approx(1.0)
+
+
+def test_forecast_intervals_contain_the_price_and_widen():
+    rng = np.random.default_rng(2)
+    days = np.datetime64("2024-01-01").astype(np.int64) + np.arange(30)
+    model = PricePredictionModel()
+    X, Y, _ = model.prepare_arrays(days, 25000 - 20 * np.arange(30) + rng.normal(0, 150, 30))
+    model.train(X, Y)
+
+    horizon = model.predict_horizon(60)
+    prices = np.array(horizon["prices"])
+    inner, outer = horizon["intervals"]["80"], horizon["intervals"]["95"]
+
+    assert np.all(np.array(outer["lower"]) <= np.array(inner["lower"]))
+    assert np.all(np.array(inner["lower"]) <= prices)
+    assert np.all(prices <= np.array(inner["upper"]))
+    assert np.all(np.array(inner["upper"]) <= np.array(outer["upper"]))
+    assert np.all(np.diff(np.array(outer["upper"]) - prices) > 0)
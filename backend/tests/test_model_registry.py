@@ -0,0 +1,82 @@
+"""
+Choosing and fitting forecasting models (modules/model_registry.py)
+"""
+
+import numpy as np
+import pytest
+
+from modules import model_registry
+from modules.ml_predictor import PricePredictionModel
+from modules.model_registry import FORECAST_MODELS, fit_model, make_model, restore_model, select_model
+
+
+def seasonal_prices(days=400, seed=5):
+    # A falling trend with a monthly sale cycle, one price per day
+    rng = np.random.default_rng(seed)
+    x = np.arange(days, dtype=np.float64)
+    y = 20000 - 5 * x + 1500 * np.sin(2 * np.pi * x / 30.4375) + rng.normal(0, 50, days)
+    return x, y
+
+
+def test_seasonal_history_picks_the_seasonal_model():
+    x, y = seasonal_prices()
+    name, report = select_model(x, y, budget_ms=10_000)
+
+    assert name == "seasonal"
+    assert set(report) == set(FORECAST_MODELS)
+    assert report["seasonal"]["mae"] < report["linear"]["mae"]
+
+
+def test_short_history_uses_the_linear_model():
+    x, y = seasonal_prices(days=model_registry.BACKTEST_MIN_POINTS - 1)
+    assert select_model(x, y) == ("linear", {})
+
+    model, info = fit_model(x, y, "auto")
+    assert model.name == info["model"] == "linear"
+
+
+def test_models_over_the_latency_budget_fall_back_to_linear():
+    x, y = seasonal_prices()
+
+    name, report = select_model(x, y, budget_ms=0)
+    assert name == "linear"
+    assert not any(result["within_budget"] for result in report.values())
+
+    model, info = fit_model(x, y, "seasonal", budget_ms=0)
+    assert model.name == info["model"] == "linear"
+    assert "budget" in info["fallback"]
+
+
+def test_model_that_does_not_apply_falls_back_to_linear():
+    x, y = seasonal_prices(days=40)  # not two monthly cycles yet
+    model, info = fit_model(x, y, "seasonal", budget_ms=10_000)
+    assert model.name == "linear"
+    assert "fallback" in info
+
+
+def test_coefficients_are_the_trend_per_day():
+    x, y = seasonal_prices()
+    days = np.datetime64("2024-01-01").astype(np.int64) + x.astype(np.int64)
+
+    model = PricePredictionModel(model_type="seasonal")
+    X, Y, _ = model.prepare_arrays(days, y)
+    model.train(X, Y)
+    coefficients = model.get_model_coefficients()
+
+    assert coefficients["model"] == "seasonal"
+    assert coefficients["slope"] == pytest.approx(-5, abs=0.1)
+    assert coefficients["intercept"] == pytest.approx(20000, abs=100)
+    assert coefficients["seasonality"]["monthly"]["amplitude"] == pytest.approx(1500, rel=0.05)
+
+
+@pytest.mark.parametrize("name", ["linear", "seasonal", "holt"])
+def test_restored_model_predicts_the_same(name):
+    x, y = seasonal_prices()
+    model = make_model(name).fit(x, y)
+    restored = restore_model(name, model.get_state())
+
+    future = np.arange(400, 460)
+    assert restored.predict(future) == pytest.approx(model.predict(future), abs=1e-6)
+    assert restored.std_error(future) == pytest.approx(model.std_error(future), abs=1e-6)
+    assert restored.predict(x) == pytest.approx(model.predict(x), abs=0.01)
+    assert (restored.slope, restored.intercept) == pytest.approx((model.slope, model.intercept))
@@ -0,0 +1,82 @@
+"""
+Running model sums: they give the same line as training on all prices
+again, however the prices arrive (modules/database.py, modules/forecasting.py)
+"""
+
+import numpy as np
+import pytest
+
+from modules.database import get_product_prices
+from modules.forecasting import get_online_prediction, train_product_model
+from test_ingest import csv_rows, write_csv
+
+
+def all_stats(db, product_ids):
+    return {product_id: db.get_model_stats(product_id) for product_id in product_ids}
+
+
+def assert_same_stats(online, rebuilt):
+    assert online.keys() == rebuilt.keys()
+    for product_id, stats in online.items():
+        for key, value in stats.items():
+            assert value == pytest.approx(rebuilt[product_id][key], rel=1e-9, abs=1e-6), (product_id, key)
+
+
+def assert_online_matches_refit(product_id, days_ahead=30):
+    # Prediction from the running sums vs. PricePredictionModel trained on every price
+    online, online_evaluation = get_online_prediction(product_id, days_ahead)
+    model, evaluation = train_product_model(product_id, get_product_prices(product_id), "linear")
+    refit = model.predict_future_price(days_ahead)
+
+    assert online["predicted_date"] == refit["predicted_date"]
+    assert online["predicted_price"] == pytest.approx(refit["predicted_price"], abs=0.01)
+    assert online_evaluation["R2_Score"] == pytest.approx(evaluation["R2_Score"], abs=1e-4)
+    assert online_evaluation["RMSE"] == pytest.approx(evaluation["RMSE"], abs=0.01)
+
+
+def test_price_by_price_updates_match_a_refit(db):
+    db.add_product(7, "Phone", "Phones")
+    rng = np.random.default_rng(3)
+    for day in range(1, 21):
+        for website in ("Amazon", "Flipkart", "Snapdeal"):
+            if rng.random() < 0.7:
+                price = round(30000 - 35 * day + rng.normal(0, 200), 2)
+                db.add_price(7, website, price, f"2024-03-{day:02d}")
+    # Corrections of prices already saved (same product, website and day)
+    db.add_price(7, "Amazon", 26000, "2024-03-05")
+    db.add_price(7, "Amazon", 31000, "2024-03-05")
+    db.add_price(7, "Flipkart", 29000, "2024-03-20")
+
+    assert_online_matches_refit(7)
+
+    online = all_stats(db, [7])
+    db.rebuild_model_stats()
+    assert_same_stats(online, all_stats(db, [7]))
+
+
+def test_bulk_ingest_stats_match_a_refit(db, tmp_path):
+    rows = csv_rows(1, "Phone A", 12, 20000, -50) + csv_rows(2, "Phone B", 9, 9000, 25)
+    path = write_csv(tmp_path / "prices.csv", rows)
+    db.bulk_ingest_csv(path)
+
+    # A price added between two loads, then more rows appended to the file
+    db.add_price(2, "Snapdeal", 9100, "2024-01-04")
+    write_csv(tmp_path / "prices.csv", rows + csv_rows(3, "Phone C", 5, 500, 5))
+    assert db.bulk_ingest_csv(path)["mode"] == "append"
+
+    for product_id in (1, 2, 3):
+        assert_online_matches_refit(product_id)
+
+    online = all_stats(db, [1, 2, 3])
+    db.rebuild_model_stats()
+    assert_same_stats(online, all_stats(db, [1, 2, 3]))
+
+
+def test_loading_the_same_file_again_keeps_the_sums(db, tmp_path):
+    path = write_csv(tmp_path / "prices.csv", csv_rows(1, "Phone A", 10, 20000, -50) + csv_rows(2, "Phone B", 8, 9000, 25))
+    db.bulk_ingest_csv(path)
+    stats = all_stats(db, [1, 2])
+
+    db.bulk_ingest_csv(path, force=True)
+    assert all_stats(db, [1, 2]) == stats
+    assert db.get_connection().execute("SELECT COUNT(*) FROM price_model_stats").fetchone()[0] == 2
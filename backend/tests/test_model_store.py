@@ -0,0 +1,51 @@
+"""
+Stored models: artifacts rebuild the same model without fitting
+(modules/ml_predictor.py, modules/model_store.py)
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from modules.ml_predictor import PricePredictionModel
+from modules.model_store import load_model, save_model
+
+EVALUATION = {"MAE": 12.5, "RMSE": 20.1, "R2_Score": 0.91}
+
+
+def trained_model(model_type, days=200, seed=9):
+    rng = np.random.default_rng(seed)
+    x = np.arange(days)
+    prices = 18000 - 4 * x + 900 * np.sin(2 * np.pi * x / 30.4375) + rng.normal(0, 60, days)
+    model = PricePredictionModel(model_type=model_type)
+    X, Y, _ = model.prepare_arrays(np.datetime64("2024-02-01").astype(np.int64) + x, prices)
+    model.train(X, Y)
+    return model
+
+
+@pytest.mark.parametrize("model_type", ["linear", "seasonal", "holt", "auto"])
+def test_artifact_rebuilds_the_same_forecast(model_type):
+    model = trained_model(model_type)
+    # The artifact goes through JSON in the model store
+    rebuilt = PricePredictionModel.from_artifact(json.loads(json.dumps(model.to_artifact())))
+
+    assert rebuilt.model_info["model"] == model.model_info["model"]
+    assert rebuilt.predict_horizon(90) == model.predict_horizon(90)
+    assert rebuilt.get_model_coefficients() == model.get_model_coefficients()
+
+
+def test_model_store_round_trip_and_stale_versions(db):
+    model = trained_model("auto")
+    version = (200, 200, 3_500_000.0)
+    save_model(7, "auto", version, model, EVALUATION)
+
+    loaded = load_model(7, "auto", version)
+    assert loaded["evaluation"] == EVALUATION
+    assert loaded["model_info"] == model.model_info
+    assert loaded["model"].predict_future_price(30) == model.predict_future_price(30)
+
+    # New prices since training: the stored model is not used
+    assert load_model(7, "auto", (201, 201, 3_517_000.0)) is None
+    assert load_model(7, "linear", version) is None
+    assert load_model(8, "auto", version) is None
@@ -0,0 +1,27 @@
+"""
+The process-parallel training (parallel_training.py) gives the same lines
+as PricePredictionModel trained on one product at a time
+"""
+
+from modules.batch_forecast import forecast_all_products
+from modules.parallel_training import train_all_products
+from test_batch_forecast import assert_same_as_reference, price_records, reference_fits, store_records
+
+
+def test_parallel_training_matches_price_prediction_model():
+    records = price_records()
+    fits = train_all_products(*records, workers=2)
+    assert fits["timings"]["workers"] == 2
+    assert_same_as_reference(fits, reference_fits(*records))
+
+
+def test_batch_forecast_saves_the_same_predictions_either_way(db):
+    store_records(db, price_records())
+
+    vectorized = forecast_all_products(days_ahead=14)
+    saved = {product_id: db.get_predictions(product_id) for product_id in range(1, 7)}
+    parallel = forecast_all_products(days_ahead=14, workers=2)
+
+    assert vectorized["products"] == parallel["products"] > 0
+    for product_id, predictions in saved.items():
+        assert db.get_predictions(product_id) == predictions
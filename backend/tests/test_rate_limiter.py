@@ -0,0 +1,133 @@
+"""
+Outbound scheduler: rate limits, priority lanes, shedding, expiry and
+cancelling (modules/rate_limiter.py)
+"""
+
+import threading
+import time
+
+import pytest
+
+from modules import rate_limiter
+from modules.rate_limiter import OutboundScheduler, RequestShed, INTERACTIVE, BACKGROUND
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = OutboundScheduler(global_rate=0, global_burst=1, max_workers=4)
+    yield scheduler
+    scheduler.stop()
+
+
+def blocked_host(scheduler, host="Shop"):
+    """
+    Configures a host whose only token is used by a request that waits
+    for the returned event; everything submitted after it has to queue
+    """
+    scheduler.configure(host, rate=0.01, burst=1)
+    release = threading.Event()
+    first = scheduler.submit(host, release.wait, 5)
+    deadline = time.monotonic() + 2
+    while scheduler.stats()["in_flight"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return release, first
+
+
+def test_requests_keep_to_the_host_rate(scheduler):
+    scheduler.configure("Shop", rate=20, burst=1)
+
+    start = time.monotonic()
+    futures = [scheduler.submit("Shop", time.monotonic) for _ in range(5)]
+    sent = [future.result(5) for future in futures]
+
+    # One token every 0.05 s: the 5th request cannot go before 0.2 s
+    assert sent[-1] - start >= 0.19
+    assert scheduler.stats()["hosts"]["Shop"]["sent"][INTERACTIVE] == 5
+
+
+def test_interactive_requests_go_before_background(scheduler):
+    scheduler.configure("Shop", rate=10, burst=1)
+    order = []
+    first = scheduler.submit("Shop", order.append, "first")
+    background = scheduler.submit("Shop", order.append, "background", priority=BACKGROUND)
+    interactive = scheduler.submit("Shop", order.append, "interactive")
+
+    for future in (first, background, interactive):
+        future.result(5)
+    assert order == ["first", "interactive", "background"]
+
+
+def test_full_lane_is_shed_right_away(scheduler, monkeypatch):
+    monkeypatch.setitem(rate_limiter.MAX_QUEUE, BACKGROUND, 2)
+    release, first = blocked_host(scheduler)
+
+    waiting = [scheduler.submit("Shop", lambda: "ok", priority=BACKGROUND) for _ in range(2)]
+    shed = scheduler.submit("Shop", lambda: "ok", priority=BACKGROUND)
+
+    with pytest.raises(RequestShed):
+        shed.result(0)
+    assert scheduler.stats()["hosts"]["Shop"]["shed"]["queue_full"] == 1
+    assert not any(future.done() for future in waiting)
+    release.set()
+
+
+def test_request_waiting_too_long_expires(scheduler):
+    release, first = blocked_host(scheduler)
+
+    start = time.monotonic()
+    late = scheduler.submit("Shop", lambda: "ok", max_wait=0.1)
+    with pytest.raises(RequestShed):
+        late.result(2)
+
+    assert time.monotonic() - start < 1
+    assert scheduler.stats()["hosts"]["Shop"]["shed"]["expired"] == 1
+    release.set()
+    assert first.result(5)
+
+
+def test_cancelled_request_is_never_sent(scheduler):
+    release, first = blocked_host(scheduler)
+    calls = []
+
+    queued = scheduler.submit("Shop", calls.append, "sent")
+    assert queued.cancel()
+
+    deadline = time.monotonic() + 2
+    while scheduler.stats()["hosts"]["Shop"]["cancelled"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    stats = scheduler.stats()["hosts"]["Shop"]
+    assert stats["cancelled"] == 1
+    assert stats["queued"][INTERACTIVE] == 0
+    release.set()
+    first.result(5)
+    assert calls == []
+
+
+def test_cancel_racing_with_expiry_keeps_the_dispatcher_alive(scheduler):
+    scheduler.configure("Shop", rate=0.01, burst=1)
+    scheduler.submit("Shop", lambda: None).result(5)  # use up the token
+
+    for _ in range(20):
+        futures = [scheduler.submit("Shop", lambda: None, max_wait=0.005) for _ in range(10)]
+        time.sleep(0.005)
+        for future in futures:
+            future.cancel()
+
+    scheduler.configure("Shop", rate=0, burst=1)
+    assert scheduler.submit("Shop", lambda: "still running").result(2) == "still running"
+
+
+def test_stop_refuses_waiting_requests(scheduler):
+    release, first = blocked_host(scheduler)
+    waiting = scheduler.submit("Shop", lambda: "ok")
+    cancelled = scheduler.submit("Shop", lambda: "ok")
+    cancelled.cancel()
+
+    release.set()
+    scheduler.stop()
+
+    with pytest.raises(RequestShed):
+        waiting.result(0)
+    assert cancelled.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.submit("Shop", lambda: "ok")
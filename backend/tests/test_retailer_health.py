@@ -0,0 +1,181 @@
+"""
+Circuit breaker states and adaptive timeouts (modules/retailer_health.py)
+"""
+
+import time
+
+import pytest
+
+from modules import retailer_health, scraper
+from modules.retailer_health import RetailerHealth, CLOSED, OPEN, HALF_OPEN
+from modules.scraper import RetailerUnavailable
+
+
+def open_circuit(health):
+    for _ in range(retailer_health.FAILURE_THRESHOLD):
+        assert health.allow_request()
+        health.record_failure("HTTP 503")
+
+
+def end_cooldown(health):
+    health.opened_until = time.monotonic() - 1
+
+
+def test_failures_in_a_row_open_the_circuit():
+    health = RetailerHealth("Shop")
+
+    for _ in range(retailer_health.FAILURE_THRESHOLD - 1):
+        health.allow_request()
+        health.record_failure("HTTP 503")
+    assert health.state == CLOSED
+
+    health.allow_request()
+    health.record_failure("HTTP 503")
+    assert health.state == OPEN
+    assert not health.allow_request()
+    assert health.should_skip()
+    assert health.stats()["skipped"] == 2
+
+
+def test_success_resets_the_failure_count():
+    health = RetailerHealth("Shop")
+
+    for _ in range(5):
+        health.allow_request()
+        health.record_failure("HTTP 503")
+        health.allow_request()
+        health.record_success(0.1)
+
+    assert health.state == CLOSED
+    assert health.consecutive_failures == 0
+
+
+def test_half_open_lets_one_probe_through():
+    health = RetailerHealth("Shop")
+    open_circuit(health)
+    end_cooldown(health)
+
+    assert health.allow_request()
+    assert health.state == HALF_OPEN
+    assert not health.allow_request()  # only one probe at a time
+
+    health.record_success(0.2)
+    assert health.state == CLOSED
+    assert health.cooldown == retailer_health.COOLDOWN
+
+
+def test_failed_probe_doubles_the_cooldown():
+    health = RetailerHealth("Shop")
+    open_circuit(health)
+    end_cooldown(health)
+
+    assert health.allow_request()
+    health.record_failure("timeout")
+
+    assert health.state == OPEN
+    assert health.cooldown == 2 * retailer_health.COOLDOWN
+    assert health.times_opened == 2
+
+
+def test_timeout_adapts_to_response_times():
+    health = RetailerHealth("Shop", max_timeout=10)
+    assert health.timeout() == 10  # too few samples yet
+
+    for _ in range(retailer_health.MIN_LATENCY_SAMPLES):
+        health.record_success(0.4)
+    assert health.timeout() == retailer_health.TIMEOUT_MULTIPLIER * 0.4
+
+
+def test_timeouts_let_the_timeout_grow_again():
+    health = RetailerHealth("Shop", max_timeout=10)
+    for _ in range(retailer_health.LATENCY_WINDOW):
+        health.record_success(0.4)
+    short = health.timeout()
+
+    # The website slowed down: requests time out after the short timeout,
+    # success and failure alternate so the circuit stays closed
+    for _ in range(retailer_health.LATENCY_WINDOW):
+        health.record_failure("timeout", latency=health.timeout())
+        health.record_success(0.4)
+
+    assert health.state == CLOSED
+    assert health.timeout() > short
+
+
+def test_probe_gets_the_full_timeout_and_history_is_forgotten():
+    health = RetailerHealth("Shop", max_timeout=10)
+    for _ in range(retailer_health.LATENCY_WINDOW):
+        health.record_success(0.4)
+    assert health.timeout() < 10
+
+    open_circuit(health)
+    assert health.stats()["latency"]["samples"] == 0
+    end_cooldown(health)
+    health.allow_request()
+    assert health.state == HALF_OPEN
+    assert health.timeout() == 10
+
+    # A slow but successful probe closes the circuit; the timeout then
+    # stays at the full value until enough new samples arrive
+    health.record_success(6.0)
+    assert health.state == CLOSED
+    assert health.timeout() == 10
+
+
+# ============================================================================
+# A real adapter against the fake retailer server
+# ============================================================================
+
+def test_failing_retailer_opens_the_circuit_and_a_probe_closes_it(fake_retailers):
+    adapter = scraper.RETAILERS["Amazon"]
+    fake_retailers.mode["amazon"] = "error"
+
+    for _ in range(retailer_health.FAILURE_THRESHOLD):
+        with pytest.raises(RetailerUnavailable):
+            adapter.search("iPhone 15 128GB")
+    assert adapter.health.state == OPEN
+    assert fake_retailers.requests["amazon"] == retailer_health.FAILURE_THRESHOLD
+
+    # Open circuit: the retailer is not asked at all
+    with pytest.raises(RetailerUnavailable):
+        adapter.search("iPhone 15 128GB")
+    assert fake_retailers.requests["amazon"] == retailer_health.FAILURE_THRESHOLD
+
+    # After the cooldown one probe goes out; it succeeds and closes the circuit
+    end_cooldown(adapter.health)
+    fake_retailers.mode["amazon"] = "ok"
+    item = adapter.search("iPhone 15 128GB")
+    assert item["price"] == 70000.0
+    assert adapter.health.state == CLOSED
+    assert fake_retailers.requests["amazon"] == retailer_health.FAILURE_THRESHOLD + 1
+
+
+def test_failed_probe_keeps_the_circuit_open(fake_retailers):
+    adapter = scraper.RETAILERS["Flipkart"]
+    fake_retailers.mode["flipkart"] = "error"
+    for _ in range(retailer_health.FAILURE_THRESHOLD):
+        with pytest.raises(RetailerUnavailable):
+            adapter.search("iPhone 15 128GB")
+
+    end_cooldown(adapter.health)
+    with pytest.raises(RetailerUnavailable):
+        adapter.search("iPhone 15 128GB")
+    assert adapter.health.state == OPEN
+    assert adapter.health.cooldown == 2 * retailer_health.COOLDOWN
+
+
+def test_not_found_is_an_answer_and_a_timeout_is_not(fake_retailers):
+    adapter = scraper.RETAILERS["Snapdeal"]
+    fake_retailers.mode["snapdeal"] = "empty"
+    assert adapter.search("iPhone 15 128GB") is None
+    assert adapter.health.consecutive_failures == 0
+
+    slow = scraper.SnapdealAdapter(timeout=0.2)
+    slow.search_url = adapter.search_url
+    fake_retailers.delay["snapdeal"] = 0.5
+    try:
+        with pytest.raises(RetailerUnavailable):
+            slow.search("iPhone 15 128GB")
+        assert slow.health.consecutive_failures == 1
+    finally:
+        slow.close()
@@ -0,0 +1,64 @@
+"""
+Products created by live searches and stored scrape answers (modules/database.py)
+"""
+
+from modules.database import SEARCHED_PRODUCT_ID_START
+
+AMAZON = {"price": 69999.0, "link": "https://amazon.example/p", "available": True}
+FLIPKART = {"price": None, "link": "https://flipkart.example/s", "available": False}
+SNAPDEAL = {"price": None, "link": "https://snapdeal.example/s", "available": False, "skipped": True}
+
+
+def test_searched_products_are_keyed_by_the_normalized_query(db):
+    first = db.find_or_create_product("iphone 15", "The iPhone 15")
+    again = db.find_or_create_product("iphone 15", "iphone 15")
+    other = db.find_or_create_product("galaxy s24", "Galaxy S24")
+
+    assert first == again == SEARCHED_PRODUCT_ID_START
+    assert other == SEARCHED_PRODUCT_ID_START + 1
+
+
+def test_a_later_csv_does_not_overwrite_searched_products(db, tmp_path):
+    product_id = db.find_or_create_product("iphone 15", "The iPhone 15")
+
+    path = tmp_path / "prices.csv"
+    path.write_text(
+        "product_id,product_name,website,price,date,category,website_link\n"
+        "1,Catalogue Phone,Amazon,15000,2024-01-01,Phones,https://amazon.example/1\n"
+    )
+    db.bulk_ingest_csv(str(path))
+
+    connection = db.get_connection()
+    names = dict(connection.execute("SELECT product_id, product_name FROM products").fetchall())
+    assert names == {1: "Catalogue Phone", product_id: "The iPhone 15"}
+    assert db.find_or_create_product("iphone 15", "iPhone 15") == product_id
+
+
+def test_scrape_results_round_trip(db):
+    db.save_scrape_results("iphone 15", "iPhone 15", {"Amazon": AMAZON, "Flipkart": FLIPKART})
+
+    stored = db.get_scrape_results("iphone 15", ["Amazon", "Flipkart", "Snapdeal"])
+    assert set(stored) == {"Amazon", "Flipkart"}
+    assert stored["Amazon"][0] == AMAZON
+    assert stored["Flipkart"][0] == FLIPKART
+    assert all(0 <= age < 5 for entry, age in stored.values())
+
+
+def test_skipped_and_estimated_answers_are_not_saved(db):
+    estimated = {"price": 70000.0, "link": "", "available": True, "estimated": True}
+    assert db.save_scrape_results("iphone 15", "iPhone 15", {"Snapdeal": SNAPDEAL, "Amazon": estimated}) is None
+
+    assert db.get_scrape_results("iphone 15", ["Amazon", "Snapdeal"]) == {}
+    assert db.get_connection().execute("SELECT COUNT(*) FROM products").fetchone()[0] == 0
+
+
+def test_found_prices_feed_the_price_history(db):
+    results = {"Amazon": AMAZON, "Flipkart": FLIPKART, "Snapdeal": SNAPDEAL}
+    product_id = db.save_scrape_results("iphone 15", "iPhone 15", results)
+    # Searching again the same day keeps one price per website and day
+    db.save_scrape_results("iphone 15", "iPhone 15", dict(results, Amazon=dict(AMAZON, price=68999.0)))
+
+    prices = db.get_connection().execute(
+        "SELECT website, price FROM prices WHERE product_id = ?", (product_id,)
+    ).fetchall()
+    assert prices == [("Amazon", 68999.0)]
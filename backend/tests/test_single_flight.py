@@ -0,0 +1,106 @@
+"""
+Shared scrapes and stale-while-revalidate (modules/cache.py, modules/comparison.py)
+"""
+
+import threading
+import time
+
+from modules import comparison
+from modules.cache import SingleFlight, TTLCache
+from modules.comparison import get_comparison
+
+QUERY = "iPhone 15 128GB"
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow, 21))) for _ in range(5)]
+    threads[0].start()
+    while not flight.in_flight("key"):
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [21]
+    assert results == [42] * 5
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 4}
+
+
+def test_waiting_callers_get_the_same_error():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("retailer down")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    threads[0].start()
+    while not flight.in_flight("key"):
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while flight.stats()["coalesced"] < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["retailer down"] * 3
+    assert not flight.in_flight("key")  # the next call runs again
+
+
+def test_expired_entry_is_served_stale_inside_the_window():
+    cache = TTLCache(default_ttl=60, stale_ttl=600)
+    cache.set("recent", 1, age=100)
+    cache.set("ancient", 2, age=1000)
+
+    assert cache.get("recent") is None
+    assert cache.get_entry("recent", allow_stale=True)[::2] == (1, True)
+    assert cache.get_entry("ancient", allow_stale=True) is None
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_stale_prices_are_served_and_refreshed_in_the_background(fake_retailers, db, monkeypatch):
+    get_comparison(QUERY)
+    assert fake_retailers.requests == {"amazon": 1, "flipkart": 1, "snapdeal": 1}
+
+    # Make the cached Amazon price stale
+    key = comparison.normalize_query(QUERY)
+    entry = comparison.comparison_cache.get((key, "Amazon"))
+    comparison.comparison_cache.set((key, "Amazon"), entry, ttl=300, age=400)
+
+    result, age, stale = get_comparison(QUERY)
+    assert stale
+    assert age >= 400
+    assert result["Amazon"] == entry
+
+    # Only Amazon is scraped again, without the user waiting for it
+    deadline = time.monotonic() + 5
+    while comparison.comparison_cache.get((key, "Amazon")) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fake_retailers.requests == {"amazon": 2, "flipkart": 1, "snapdeal": 1}
+    assert not get_comparison(QUERY)[2]
+
@@ -1,7 +1,14 @@
 import React from 'react'
 
+// Turn an age in seconds into "45s", "3 min" or "2 h"
+function formatAge(seconds) {
+  if (seconds < 60) return `${Math.round(seconds)}s`
+  if (seconds < 3600) return `${Math.round(seconds / 60)} min`
+  return `${Math.round(seconds / 3600)} h`
+}
+
 function ComparisonResults({ data }) {
-  const { product, comparison, cheapest, note, available_count, total_checked } = data
+  const { product, comparison, cheapest, note, available_count, total_checked, age, stale } = data
 
   console.log('ComparisonResults received:', data) // Debug log
 
@@ -69,6 +76,12 @@ function ComparisonResults({ data }) {
       <div className="bg-white rounded-2xl shadow-lg p-6 border border-gray-100">
         <h2 className="text-3xl font-bold text-gray-900 mb-2">Price Comparison Results</h2>
         <p className="text-gray-500">Comparing prices for: <span className="font-semibold text-gray-900">{product}</span></p>
+        {age !== undefined && (
+          <p className="text-sm text-gray-400 mt-1">
+            {age < 1 ? 'Prices just updated' : `Prices updated ${formatAge(age)} ago`}
+            {stale && ' · refreshing in the background'}
+          </p>
+        )}
       </div>
 
       {/* Best Deal Highlight */}
@@ -150,6 +150,11 @@ function PricePrediction() {
               <div className="bg-white/10 backdrop-blur-lg rounded-xl p-6 border border-white/20">
                 <p className="text-purple-100 text-sm font-medium mb-2">Predicted Price</p>
                 <p className="text-5xl font-bold">₹{prediction.predicted_price?.toLocaleString()}</p>
+                {prediction.intervals?.['95'] && (
+                  <p className="text-purple-100 text-sm mt-2">
+                    95% range: ₹{prediction.intervals['95'].lower.toLocaleString()} – ₹{prediction.intervals['95'].upper.toLocaleString()}
+                  </p>
+                )}
               </div>
               
               <div className="bg-white/10 backdrop-blur-lg rounded-xl p-6 border border-white/20">
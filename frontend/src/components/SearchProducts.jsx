@@ -19,8 +19,10 @@ function SearchProducts({ onSearch }) {
     setError('')
 
     try {
+      // Streamed comparison: one JSON line per retailer as it answers,
+      // then a summary line with the full answer
       const response = await fetch(
-        `${API_URL}/api/compare-prices?product_name=${encodeURIComponent(
+        `${API_URL}/api/compare-prices/stream?format=ndjson&product_name=${encodeURIComponent(
           productName
         )}`
       )
@@ -29,8 +31,43 @@ function SearchProducts({ onSearch }) {
         throw new Error('Product not found')
       }
 
-      const data = await response.json()
-      onSearch(data)
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      const comparison = {}
+      let buffer = ''
+
+      const handleEvent = (event) => {
+        if (event.type === 'retailer') {
+          comparison[event.website] = event.result
+          const results = Object.values(comparison)
+          onSearch({
+            product: productName,
+            comparison: { ...comparison },
+            cheapest: null,
+            available_count: results.filter((r) => r.available).length,
+            total_checked: results.length,
+            partial: true,
+          })
+        } else if (event.type === 'summary') {
+          const { type, ...data } = event
+          onSearch(data)
+        } else if (event.type === 'error') {
+          throw new Error(event.detail || 'Something went wrong')
+        }
+      }
+
+      while (true) {
+        const { value, done } = await reader.read()
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done })
+
+        const lines = buffer.split('\n')
+        buffer = lines.pop()
+        for (const line of lines) {
+          if (line.trim()) handleEvent(JSON.parse(line))
+        }
+
+        if (done) break
+      }
     } catch (err) {
       setError(err.message || 'Something went wrong')
     } finally {